@@ -31,6 +31,13 @@ except Exception:
 from app.models import Base
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # `migration_progress` (app.online_migrations) se crea al primer uso; autogenerate no debe borrarla
+    if type_ == "table" and name == "migration_progress":
+        return False
+    return True
+
 # allow DATABASE_URL from environment
 # Nota: Puede cargar DATABASE_URL desde .env (env var) o desde app.db. Al usar Alembic en CI/producción
 # asegúrate de que la variable de entorno esté definida antes de ejecutar comandos como `alembic upgrade head`.
@@ -69,6 +76,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -90,7 +98,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
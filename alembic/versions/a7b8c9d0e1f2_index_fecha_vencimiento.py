@@ -0,0 +1,26 @@
+"""index productos.Fecha_Vencimiento
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-19 00:00:04.000000
+
+Nota: "Eliminar vencidos" (`delete_products_where(expired_before=...)`) filtra por rango sobre
+`Fecha_Vencimiento`; sin índice el DELETE recorría (y bloqueaba) toda la tabla. En MySQL 8 el
+índice se crea en línea (ALGORITHM=INPLACE) sin bloquear las escrituras.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f6a7b8c9d0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_productos_Fecha_Vencimiento', 'productos', ['Fecha_Vencimiento'])
+
+
+def downgrade():
+    op.drop_index('ix_productos_Fecha_Vencimiento', table_name='productos')
@@ -0,0 +1,38 @@
+"""add sync_tokens table (entradas de réplicas locales ya aplicadas)
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-19 00:00:05.000000
+
+Nota: antes `app.local_replica` creaba la tabla al primer lote sincronizado (`checkfirst`); en las
+bases donde ya existe solo se asegura el índice de `created_at` (lo usa la purga periódica).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_sync_tokens_created_at'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('sync_tokens'):
+        op.create_table(
+            'sync_tokens',
+            sa.Column('token', sa.String(32), primary_key=True),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+        )
+    elif INDEX in {ix['name'] for ix in inspector.get_indexes('sync_tokens')}:
+        return
+    op.create_index(INDEX, 'sync_tokens', ['created_at'])
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name='sync_tokens')
+    op.drop_table('sync_tokens')
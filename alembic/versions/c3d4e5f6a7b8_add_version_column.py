@@ -0,0 +1,26 @@
+"""add version column to productos (optimistic concurrency)
+
+Revision ID: c3d4e5f6a7b8
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19 00:00:00.000000
+
+Nota: `version` lo usa SQLAlchemy como `version_id_col`; las filas existentes empiezan en 1.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3d4e5f6a7b8'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Add 'version' with server_default so existing rows start at 1, then remove the default
+    op.add_column('productos', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.alter_column('productos', 'version', existing_type=sa.Integer(), existing_nullable=False, server_default=None)
+
+
+def downgrade():
+    op.drop_column('productos', 'version')
@@ -0,0 +1,94 @@
+"""add categorias table and replace productos.tipo with tipo_id
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-19 00:00:01.000000
+
+Nota: las categorías se siembran desde `config/tipos.txt` (más cualquier `tipo` ya usado en
+`productos`). Los productos con `tipo` vacío pasan a la categoría 'Otros'.
+"""
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd4e5f6a7b8c9'
+down_revision = 'c3d4e5f6a7b8'
+branch_labels = None
+depends_on = None
+
+TIPOS_FILE = Path(__file__).resolve().parents[2] / 'config' / 'tipos.txt'
+FALLBACK = 'Otros'
+
+
+def _normalize(value):
+    s = (value or '').strip()
+    return s[0].upper() + s[1:] if s else s
+
+
+def _seed_names(bind):
+    names = []
+    if TIPOS_FILE.exists():
+        names = [_normalize(line) for line in TIPOS_FILE.read_text(encoding='utf-8').splitlines() if line.strip()]
+    used = [_normalize(r[0]) for r in bind.execute(sa.text("SELECT DISTINCT tipo FROM productos"))]
+    seen = set()
+    out = []
+    # Comparación sin distinguir mayúsculas (igual que la collation de MySQL en la columna única)
+    for n in names + [u for u in used if u] + [FALLBACK]:
+        if n.lower() not in seen:
+            seen.add(n.lower())
+            out.append(n)
+    return out
+
+
+def _assign_tipo_ids(bind):
+    """Fill `productos.tipo_id` from the raw `tipo` text.
+
+    The categories were seeded from the normalized names, so the raw value can differ from
+    `categorias.nombre` ('bebida', ' Bebida'): map each distinct raw value in Python with the
+    same normalization and update tipo by tipo. Only empty values go to 'Otros'.
+    """
+    ids = {nombre.lower(): cid for cid, nombre in bind.execute(sa.text("SELECT id, nombre FROM categorias"))}
+    fallback = ids[FALLBACK.lower()]
+    assign = sa.text("UPDATE productos SET tipo_id = :cid WHERE tipo = :tipo AND tipo_id IS NULL")
+    for (raw,) in bind.execute(sa.text("SELECT DISTINCT tipo FROM productos")).all():
+        nombre = _normalize(raw)
+        bind.execute(assign, {'cid': ids[nombre.lower()] if nombre else fallback, 'tipo': raw})
+    bind.execute(sa.text("UPDATE productos SET tipo_id = :cid WHERE tipo_id IS NULL"), {'cid': fallback})
+
+
+def upgrade():
+    """Upgrade schema.
+
+    Steps:
+      1) Create `categorias` and seed it from config/tipos.txt and the tipos already in use.
+      2) Add nullable `productos.tipo_id` and fill it from the text column.
+      3) Make `tipo_id` NOT NULL, index it, add the foreign key and drop the old `tipo` column.
+    """
+    categorias = op.create_table(
+        'categorias',
+        sa.Column('id', sa.SmallInteger(), primary_key=True, autoincrement=True),
+        sa.Column('nombre', sa.String(length=255), nullable=False),
+        sa.UniqueConstraint('nombre', name='uq_categorias_nombre'),
+    )
+    bind = op.get_bind()
+    op.bulk_insert(categorias, [{'nombre': n} for n in _seed_names(bind)])
+
+    op.add_column('productos', sa.Column('tipo_id', sa.SmallInteger(), nullable=True))
+    _assign_tipo_ids(bind)
+    op.alter_column('productos', 'tipo_id', existing_type=sa.SmallInteger(), nullable=False)
+    op.create_index('ix_productos_tipo_id', 'productos', ['tipo_id'])
+    op.create_foreign_key('fk_productos_tipo_id', 'productos', 'categorias', ['tipo_id'], ['id'])
+    op.drop_column('productos', 'tipo')
+
+
+def downgrade():
+    """Downgrade schema."""
+    op.add_column('productos', sa.Column('tipo', sa.String(length=255), nullable=False, server_default=''))
+    op.execute("UPDATE productos SET tipo = (SELECT c.nombre FROM categorias c WHERE c.id = productos.tipo_id)")
+    op.alter_column('productos', 'tipo', existing_type=sa.String(length=255), existing_nullable=False, server_default=None)
+    op.drop_constraint('fk_productos_tipo_id', 'productos', type_='foreignkey')
+    op.drop_index('ix_productos_tipo_id', table_name='productos')
+    op.drop_column('productos', 'tipo_id')
+    op.drop_table('categorias')
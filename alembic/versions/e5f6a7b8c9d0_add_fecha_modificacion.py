@@ -0,0 +1,29 @@
+"""add Fecha_Modificacion column to productos
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-19 00:00:02.000000
+
+Nota: las filas existentes toman la fecha de la migración; a partir de ahí la columna la
+mantiene la aplicación con `now()` del servidor en cada INSERT/UPDATE.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd4e5f6a7b8c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Add with a server_default so existing rows get a timestamp, then remove the default
+    op.add_column('productos', sa.Column('Fecha_Modificacion', sa.DateTime(), nullable=True, server_default=sa.func.now()))
+    op.alter_column('productos', 'Fecha_Modificacion', existing_type=sa.DateTime(), existing_nullable=True, server_default=None)
+    op.create_index('ix_productos_Fecha_Modificacion', 'productos', ['Fecha_Modificacion'])
+
+
+def downgrade():
+    op.drop_index('ix_productos_Fecha_Modificacion', table_name='productos')
+    op.drop_column('productos', 'Fecha_Modificacion')
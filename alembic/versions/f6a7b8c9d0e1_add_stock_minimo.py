@@ -0,0 +1,35 @@
+"""add stock_minimo (reorder threshold) to productos and categorias
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-19 00:00:03.000000
+
+Nota: las columnas se añaden nullable y sin default (cambio INSTANT en MySQL 8), así que no hace
+falta rellenar filas. El índice (tipo_id, cantidad) sustituye a ix_productos_tipo_id: sirve
+igual para la clave foránea y para buscar productos con poco stock por categoría.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f6a7b8c9d0e1'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('categorias', sa.Column('stock_minimo', sa.Integer(), nullable=True))
+    op.add_column('productos', sa.Column('stock_minimo', sa.Integer(), nullable=True))
+    # Crear el índice compuesto antes de quitar el simple (la FK necesita siempre uno)
+    op.create_index('ix_productos_tipo_id_cantidad', 'productos', ['tipo_id', 'cantidad'])
+    op.drop_index('ix_productos_tipo_id', table_name='productos')
+    op.create_index('ix_productos_stock_minimo_cantidad', 'productos', ['stock_minimo', 'cantidad'])
+
+
+def downgrade():
+    op.drop_index('ix_productos_stock_minimo_cantidad', table_name='productos')
+    op.create_index('ix_productos_tipo_id', 'productos', ['tipo_id'])
+    op.drop_index('ix_productos_tipo_id_cantidad', table_name='productos')
+    op.drop_column('productos', 'stock_minimo')
+    op.drop_column('categorias', 'stock_minimo')
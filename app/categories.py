@@ -0,0 +1,190 @@
+"""Categorías (tipos) de producto: opciones del archivo de configuración y caché de ids.
+
+- `load_tipo_options()` devuelve las opciones de `config/tipos.txt` (o `resources/tipos.txt`).
+  El archivo se lee una vez y solo se vuelve a leer si cambia su `mtime`, así abrir un
+  `ProductDialog` no implica leer ni parsear el archivo.
+- `category_id(session, nombre)` traduce un nombre a `categorias.id` usando una caché en proceso
+  (por engine) y crea la categoría si no existe.
+- `category(session, nombre)` hace lo mismo pero devuelve la fila `Category` de la sesión (para
+  asignar la relación `Product.categoria` sin otro SELECT); con el id en caché no consulta la base.
+"""
+
+from pathlib import Path
+import threading
+import traceback
+import weakref
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+try:
+    from app.models import Category
+except ModuleNotFoundError:
+    try:
+        from models import Category
+    except Exception:
+        traceback.print_exc()
+        raise
+
+ROOT = Path(__file__).resolve().parent.parent
+TIPOS_CANDIDATES = [ROOT / 'config' / 'tipos.txt', ROOT / 'resources' / 'tipos.txt']
+
+DEFAULT_TIPOS = ["Bebida", "Condimento", "Enlatados", "Galletas", "Piqueos", "Limpieza",
+"Utiles", "Aseo personal", "Bebida alcoholica", "Lacteos", "Fideos", "Salsas",
+"Dulces", "Reposteria", "Detergentes", "Helados", "Descartables", "Cuadernos",
+"Cocina", "Velas", "Medicina", "Otros"
+]
+
+
+def normalize_tipo(value):
+    """Quita espacios y asegura que el nombre empiece con mayúscula."""
+    s = str(value).strip() if value is not None else ''
+    return s[0].upper() + s[1:] if s else s
+
+
+def parse_tipos(text):
+    """Parsea el contenido de un archivo de tipos (una categoría por línea)."""
+    return [normalize_tipo(line) for line in text.splitlines() if line.strip()]
+
+
+class TipoOptionsCache:
+    """Caché de las opciones de tipo que se recarga cuando cambia el `mtime` del archivo."""
+
+    def __init__(self, candidates, on_reload=None):
+        self.candidates = [Path(p) for p in candidates]
+        self.on_reload = on_reload
+        self._lock = threading.Lock()
+        self._key = None
+        self._options = None
+
+    def _current_key(self):
+        for p in self.candidates:
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            return (str(p), st.st_mtime_ns, st.st_size)
+        return None
+
+    def get(self):
+        key = self._current_key()
+        with self._lock:
+            if self._options is None or key != self._key:
+                self._options = self._load()
+                self._key = key
+                if self.on_reload is not None:
+                    self.on_reload()
+            return list(self._options)
+
+    def _load(self):
+        for p in self.candidates:
+            if not p.exists():
+                continue
+            try:
+                opts = parse_tipos(p.read_text(encoding='utf-8'))
+            except Exception:
+                continue
+            if opts:
+                return opts
+        # Fallback por defecto
+        return list(DEFAULT_TIPOS)
+
+
+# nombre -> id por engine (los ids de una base no valen para otra, p. ej. la réplica local)
+_id_cache = weakref.WeakKeyDictionary()
+_id_lock = threading.Lock()
+
+
+def clear_category_cache():
+    with _id_lock:
+        _id_cache.clear()
+
+
+_tipo_cache = TipoOptionsCache(TIPOS_CANDIDATES, on_reload=clear_category_cache)
+
+
+def load_tipo_options():
+    """Carga opciones de tipos desde 'config/tipos.txt' (project root) o 'resources/tipos.txt'.
+    Devuelve lista de opciones; si el archivo no existe retorna una lista por defecto.
+    Cada entrada asegura que comienza con mayúscula."""
+    return _tipo_cache.get()
+
+
+def _normalized(nombre):
+    nombre = normalize_tipo(nombre)
+    if not nombre:
+        raise ValueError("El campo 'tipo' es obligatorio")
+    return nombre
+
+
+def _cached_id(session, nombre):
+    with _id_lock:
+        return _id_cache.get(session.get_bind(), {}).get(nombre)
+
+
+def _remember(session, nombre, cid):
+    with _id_lock:
+        _id_cache.setdefault(session.get_bind(), {})[nombre] = cid
+
+
+def _create(session, nombre):
+    """Inserta la categoría en un savepoint; None si otro terminal la creó a la vez."""
+    try:
+        with session.begin_nested():
+            cat = Category(nombre=nombre)
+            session.add(cat)
+        # No se cachea hasta que el alta se confirme: la transacción aún puede deshacerse
+        return cat
+    except IntegrityError:
+        return None
+
+
+def category_id(session, nombre, create=True):
+    """Devuelve el id de la categoría `nombre` (normalizado).
+
+    Si no existe y `create` es True se inserta (en un savepoint, tolerando que otro terminal la
+    cree a la vez); con `create=False` devuelve None.
+    """
+    nombre = _normalized(nombre)
+    cached = _cached_id(session, nombre)
+    if cached is not None:
+        return cached
+    cid = session.execute(select(Category.id).where(Category.nombre == nombre)).scalar()
+    if cid is None:
+        if not create:
+            return None
+        cat = _create(session, nombre)
+        if cat is not None:
+            return cat.id
+        cid = session.execute(select(Category.id).where(Category.nombre == nombre)).scalar_one()
+    _remember(session, nombre, cid)
+    return cid
+
+
+def category(session, nombre, create=True):
+    """Igual que `category_id` pero devuelve la `Category` asociada a `session` (o None).
+
+    Con el id en caché no hay consulta: se usa la del identity map o se asocia a la sesión como
+    fila ya existente con `id` y `nombre` (el resto de columnas se lee al acceder).
+    """
+    nombre = _normalized(nombre)
+    cached = _cached_id(session, nombre)
+    if cached is not None:
+        cat = session.identity_map.get(identity_key(Category, cached))
+        if cat is None:
+            cat = Category(id=cached, nombre=nombre)
+            make_transient_to_detached(cat)
+            session.add(cat)
+        return cat
+    cat = session.execute(select(Category).where(Category.nombre == nombre)).scalar()
+    if cat is None:
+        if not create:
+            return None
+        created = _create(session, nombre)
+        if created is not None:
+            return created
+        cat = session.execute(select(Category).where(Category.nombre == nombre)).scalar_one()
+    _remember(session, nombre, cat.id)
+    return cat
@@ -0,0 +1,185 @@
+"""Exportación incremental (delta) del inventario a CSV con un manifiesto.
+
+Junto al CSV completo (`inventario.csv`) se guarda `inventario.csv.manifest.json` con:
+- `watermark`: hora del servidor al inicio de la última exportación.
+- `rows`: `{id: version}` de todas las filas exportadas (para detectar cambios y bajas).
+- `deltas`: archivos delta pendientes de compactar.
+
+`export_delta()` solo lee las filas con `Fecha_Modificacion >= watermark` (columna indexada) y los
+ids actuales, y escribe altas/cambios (`_op=upsert`) y bajas (`_op=delete`) en un CSV delta
+(`inventario.delta-0001.csv`, ...) o, con `mode='append'`, al final de `inventario.delta.csv`.
+`compact()` aplica los deltas sobre el CSV completo y deja un snapshot nuevo.
+
+Notas:
+- Se restan `overlap_seconds` a la marca de agua para cubrir transacciones que confirmaron tarde;
+  las filas repetidas se descartan comparando `version` con el manifiesto.
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import csv
+import json
+import os
+import traceback
+
+from sqlalchemy import func, or_, select
+
+try:
+    from app.models import Product
+    from app.exporter import FIELDNAMES, ExportError, export_csv, product_row
+    from app.metrics import registry as metrics
+except ModuleNotFoundError:
+    try:
+        from models import Product
+        from exporter import FIELDNAMES, ExportError, export_csv, product_row
+        from metrics import registry as metrics
+    except Exception:
+        traceback.print_exc()
+        raise
+
+MANIFEST_FORMAT = 1
+OP_FIELD = '_op'
+
+
+def manifest_path(path):
+    return Path(str(path) + '.manifest.json')
+
+
+def read_manifest(path):
+    """Devuelve el manifiesto de `path` o None si no existe."""
+    mp = manifest_path(path)
+    if not mp.exists():
+        return None
+    manifest = json.loads(mp.read_text(encoding='utf-8'))
+    if manifest.get('format') != MANIFEST_FORMAT:
+        raise ExportError(f"Formato de manifiesto no soportado: {manifest.get('format')}")
+    return manifest
+
+
+def _write_manifest(path, manifest):
+    mp = manifest_path(path)
+    manifest['updated_at'] = datetime.now(timezone.utc).isoformat()
+    tmp = mp.with_name(mp.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp, mp)
+
+
+def _db_now(session):
+    # Misma fuente de tiempo que `Fecha_Modificacion` (now() del servidor)
+    return session.execute(select(func.now())).scalar()
+
+
+def export_full(session, path):
+    """Exporta el inventario completo a `path` y crea un manifiesto nuevo."""
+    with metrics.timer("export.fetch", mode='full'):
+        watermark = _db_now(session)
+        products = session.query(Product).order_by(Product.id).all()
+    with metrics.timer("export.convert", mode='full', rows=len(products)):
+        data = [product_row(p) for p in products]
+    export_csv(str(path), data, FIELDNAMES)
+    old = read_manifest(path)
+    for name in (old or {}).get('deltas', []):
+        Path(path).with_name(name).unlink(missing_ok=True)
+    _write_manifest(path, {
+        'format': MANIFEST_FORMAT,
+        'snapshot': Path(path).name,
+        'fieldnames': list(FIELDNAMES),
+        'watermark': watermark.isoformat(),
+        'rows': {str(p.id): p.version for p in products},
+        'deltas': [],
+    })
+    return {'full': True, 'rows': len(data), 'upserts': len(data), 'deletes': 0, 'file': str(path)}
+
+
+def _delta_file(path, manifest, mode):
+    p = Path(path)
+    if mode == 'append':
+        return p.with_name(f"{p.stem}.delta{p.suffix}")
+    return p.with_name(f"{p.stem}.delta-{len(manifest['deltas']) + 1:04d}{p.suffix}")
+
+
+def export_delta(session, path, mode='files', overlap_seconds=60):
+    """Exporta solo los cambios desde la última exportación registrada en el manifiesto.
+
+    Si no hay manifiesto o snapshot previo hace una exportación completa. Devuelve un dict con
+    `upserts`, `deletes` y `file` (None si no hubo cambios).
+    """
+    if mode not in ('files', 'append'):
+        raise ValueError(f"Modo de exportación delta desconocido: {mode}")
+    manifest = read_manifest(path)
+    if manifest is None or not Path(path).exists():
+        return export_full(session, path)
+
+    known = manifest['rows']
+    since = datetime.fromisoformat(manifest['watermark']) - timedelta(seconds=overlap_seconds)
+    with metrics.timer("export.fetch", mode='delta'):
+        watermark = _db_now(session)
+        # Sin ORDER BY: ordenar por id hace que el planificador recorra toda la tabla por la clave
+        # primaria en lugar de usar el índice de Fecha_Modificacion; se ordena en memoria
+        candidates = (session.query(Product)
+                      .filter(or_(Product.Fecha_Modificacion >= since, Product.Fecha_Modificacion.is_(None)))
+                      .all())
+        candidates.sort(key=lambda p: p.id)
+        current_ids = set(session.execute(select(Product.id)).scalars())
+    upserts = [p for p in candidates if known.get(str(p.id)) != p.version]
+    deletes = sorted(int(i) for i in known if int(i) not in current_ids)
+
+    delta_file = None
+    if upserts or deletes:
+        fieldnames = manifest['fieldnames'] + [OP_FIELD]
+        rows = [dict(product_row(p), **{OP_FIELD: 'upsert'}) for p in upserts]
+        rows += [{'id': i, OP_FIELD: 'delete'} for i in deletes]
+        delta_file = _delta_file(path, manifest, mode)
+        try:
+            with metrics.timer("export.write", format='csv-delta', rows=len(rows)):
+                new_file = not delta_file.exists()
+                with open(delta_file, 'a' if mode == 'append' else 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=fieldnames)
+                    if new_file or mode != 'append':
+                        writer.writeheader()
+                    writer.writerows(rows)
+        except Exception as e:
+            raise ExportError(str(e)) from e
+        if delta_file.name not in manifest['deltas']:
+            manifest['deltas'].append(delta_file.name)
+
+    for p in upserts:
+        known[str(p.id)] = p.version
+    for i in deletes:
+        known.pop(str(i), None)
+    manifest['watermark'] = watermark.isoformat()
+    _write_manifest(path, manifest)
+    return {'full': False, 'upserts': len(upserts), 'deletes': len(deletes),
+            'file': str(delta_file) if delta_file else None}
+
+
+def compact(path):
+    """Aplica los deltas pendientes sobre el CSV completo y los elimina.
+
+    Devuelve el número de filas del snapshot resultante.
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ExportError(f"No hay manifiesto para {path}")
+    fieldnames = manifest['fieldnames']
+    base = Path(path)
+    with metrics.timer("export.compact", deltas=len(manifest['deltas'])):
+        with open(base, newline='', encoding='utf-8') as f:
+            rows = {r['id']: r for r in csv.DictReader(f)}
+        for name in manifest['deltas']:
+            with open(base.with_name(name), newline='', encoding='utf-8') as f:
+                for r in csv.DictReader(f):
+                    op = r.pop(OP_FIELD)
+                    if op == 'delete':
+                        rows.pop(r['id'], None)
+                    else:
+                        rows[r['id']] = r
+        ordered = [rows[k] for k in sorted(rows, key=int)]
+        tmp = base.with_name(base.name + '.tmp')
+        export_csv(str(tmp), ordered, fieldnames)
+        os.replace(tmp, base)
+    for name in manifest['deltas']:
+        base.with_name(name).unlink(missing_ok=True)
+    manifest['deltas'] = []
+    _write_manifest(path, manifest)
+    return len(ordered)
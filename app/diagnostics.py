@@ -0,0 +1,362 @@
+"""Diagnóstico de la base: tamaños, índices, planes de ejecución y sentencias más lentas.
+
+- `table_stats(engine)`: filas y bytes de datos/índices por tabla (MySQL: `information_schema`;
+  SQLite: la tabla virtual `dbstat` si está compilada, si no solo las filas).
+- `index_report(engine)`: índices existentes por tabla (vía el inspector) con su tamaño si se conoce.
+- `explain_queries(engine)`: ejecuta una muestra de lecturas del repositorio, la exportación
+  delta y las alertas de stock (`sample_reads()`), captura el SQL que emiten con los hooks de
+  `instrument_engine` y hace EXPLAIN de cada sentencia; las escrituras (`write_statements()`) se
+  construyen con los constructores del repositorio y solo se analizan. Marca los recorridos
+  completos de tabla (MySQL `type=ALL`, SQLite `SCAN <tabla>` sin índice). Las consultas que leen
+  toda la tabla por diseño (listado completo) y los recorridos de tablas pequeñas
+  (`SMALL_TABLES`) se marcan como esperados.
+- `profile_reads(engine)`: ejecuta una muestra de lecturas del repositorio con las métricas
+  habilitadas y devuelve las sentencias más lentas (`metrics.slowest_statements`).
+
+Notas:
+- Se analiza el SQL real, no una copia escrita a mano: las lecturas se capturan al ejecutarse y
+  las escrituras salen de `app.repository.*_statement`, las mismas que ejecuta el repositorio.
+- No se modifica ni bloquea ninguna fila: los UPDATE/DELETE nunca se ejecutan (EXPLAIN no los
+  ejecuta en MySQL 5.6+ ni en SQLite). `profile_reads()` solo lee.
+- Los parámetros de ejemplo (ids, categoría) se toman de los datos existentes para que el
+  plan sea el que verá la aplicación.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import json
+import random
+import tempfile
+import traceback
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.orm import Session, sessionmaker
+
+try:
+    from app.models import Product, Category
+    from app.metrics import MemorySink, registry as metrics
+    from app.repository import (
+        list_products, get_product, iter_products, update_products_statement, adjust_prices_statement,
+        adjust_stock_statement, delete_products_statement, delete_where_statement,
+    )
+    from app.categories import category_id
+    from app.delta_export import MANIFEST_FORMAT, export_delta, manifest_path
+    from app.exporter import FIELDNAMES
+    from app.stock_alerts import changed_since, low_stock_products
+except ModuleNotFoundError:
+    try:
+        from models import Product, Category
+        from metrics import MemorySink, registry as metrics
+        from repository import (
+            list_products, get_product, iter_products, update_products_statement, adjust_prices_statement,
+            adjust_stock_statement, delete_products_statement, delete_where_statement,
+        )
+        from categories import category_id
+        from delta_export import MANIFEST_FORMAT, export_delta, manifest_path
+        from exporter import FIELDNAMES
+        from stock_alerts import changed_since, low_stock_products
+    except Exception:
+        traceback.print_exc()
+        raise
+
+TableStats = namedtuple('TableStats', ['table', 'rows', 'data_bytes', 'index_bytes'])
+IndexInfo = namedtuple('IndexInfo', ['table', 'name', 'columns', 'unique', 'bytes'])
+# plan: líneas legibles del EXPLAIN; full_scans: tablas recorridas completas
+QueryPlan = namedtuple('QueryPlan', ['name', 'sql', 'plan', 'full_scans', 'expected_full_scan'])
+
+
+def _is_mysql(conn):
+    return conn.dialect.name in ('mysql', 'mariadb')
+
+
+def _sqlite_sizes(conn):
+    """`{tabla_o_indice: bytes}` desde `dbstat`, o None si SQLite no la incluye."""
+    try:
+        rows = conn.exec_driver_sql("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").all()
+    except Exception:
+        conn.rollback()
+        return None
+    return {name: int(size) for name, size in rows}
+
+
+def _mysql_index_sizes(conn):
+    # Requiere permiso de lectura sobre `mysql.innodb_index_stats`
+    try:
+        rows = conn.execute(text(
+            "SELECT table_name, index_name, stat_value * @@innodb_page_size FROM mysql.innodb_index_stats "
+            "WHERE database_name = DATABASE() AND stat_name = 'size'")).all()
+    except Exception:
+        conn.rollback()
+        return {}
+    return {(t, i): int(size) for t, i, size in rows}
+
+
+def table_stats(engine, exact=True):
+    """Devuelve un TableStats por tabla (ordenadas por nombre).
+
+    `exact=True` cuenta las filas con COUNT(*); en MySQL `exact=False` usa la estimación
+    (aproximada) de `information_schema`, instantánea en tablas InnoDB grandes.
+    """
+    stats = []
+    with engine.connect() as conn:
+        names = sorted(inspect(conn).get_table_names())
+        if _is_mysql(conn):
+            info = {r[0]: r[1:] for r in conn.execute(text(
+                "SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE()"))}
+            for name in names:
+                estimate, data, index = info.get(name, (None, None, None))
+                rows = conn.execute(text(f"SELECT COUNT(*) FROM `{name}`")).scalar() if exact else estimate
+                stats.append(TableStats(name, rows, data, index))
+            return stats
+        sizes = _sqlite_sizes(conn) if conn.dialect.name == 'sqlite' else None
+        insp = inspect(conn)
+        for name in names:
+            rows = conn.execute(select(func.count()).select_from(text(f'"{name}"'))).scalar()
+            data = index = None
+            if sizes is not None:
+                data = sizes.get(name)
+                index = sum(sizes.get(i['name'], 0) for i in insp.get_indexes(name))
+            stats.append(TableStats(name, rows, data, index))
+    return stats
+
+
+def index_report(engine):
+    """Devuelve un IndexInfo por índice (las claves primarias como `PRIMARY`)."""
+    report = []
+    with engine.connect() as conn:
+        insp = inspect(conn)
+        mysql = _is_mysql(conn)
+        sizes = _mysql_index_sizes(conn) if mysql else (_sqlite_sizes(conn) or {})
+        for name in sorted(insp.get_table_names()):
+            pk = insp.get_pk_constraint(name).get('constrained_columns') or []
+            if pk:
+                size = sizes.get((name, 'PRIMARY')) if mysql else None
+                report.append(IndexInfo(name, 'PRIMARY', pk, True, size))
+            for ix in insp.get_indexes(name):
+                size = sizes.get((name, ix['name'])) if mysql else sizes.get(ix['name'])
+                report.append(IndexInfo(name, ix['name'], ix['column_names'], bool(ix.get('unique')), size))
+    return report
+
+
+# Tablas pequeñas (catálogos): recorrerlas completas es lo normal y no se marca como problema
+SMALL_TABLES = {'categorias'}
+def _write_sample_manifest(path, since):
+    # Manifiesto mínimo para que `export_delta()` haga la consulta incremental (sin exportación
+    # completa previa); el snapshot vacío y los deltas quedan en un directorio temporal
+    Path(path).write_text('', encoding='utf-8')
+    manifest_path(path).write_text(json.dumps({
+        'format': MANIFEST_FORMAT, 'snapshot': Path(path).name, 'fieldnames': list(FIELDNAMES),
+        'watermark': since.isoformat(), 'rows': {}, 'deltas': [],
+    }), encoding='utf-8')
+
+
+def _sample_values(conn):
+    row = conn.execute(select(Product.id, Product.version).order_by(Product.id.desc()).limit(1)).first()
+    pid, version = row if row is not None else (1, 1)
+    tipo_id, nombre = conn.execute(
+        select(Category.id, Category.nombre).order_by(Category.id).limit(1)).first() or (1, 'Otros')
+    return pid, version, tipo_id, nombre
+
+
+def sample_reads(session, workdir):
+    """Lecturas de la capa de datos que se ejecutan para capturar su SQL.
+
+    Devuelve `(nombre, función, recorrido_completo_esperado)`. Solo leen: la exportación delta
+    escribe sus archivos en `workdir`.
+    """
+    pid, _version, _tipo_id, nombre = _sample_values(session.connection())
+    since = datetime.now() - timedelta(days=1)
+    export_path = Path(workdir) / 'inventario.csv'
+
+    def _first_chunk():
+        # `list_products` emite la misma consulta; basta el primer bloque para capturarla
+        products = iter_products(session, chunk_size=100)
+        next(products, None)
+        products.close()
+
+    def _export_delta():
+        _write_sample_manifest(export_path, since)
+        export_delta(session, export_path)
+
+    return [
+        ('repository.list_products / iter_products', _first_chunk, True),
+        ('repository.get_product', lambda: get_product(pid, session), False),
+        ('categories.category_id', lambda: category_id(session, nombre, create=False), False),
+        ('stock_alerts.low_stock_products', lambda: low_stock_products(session), False),
+        ('stock_alerts.changed_since', lambda: changed_since(session, since), False),
+        ('delta_export.export_delta', _export_delta, False),
+    ]
+
+
+def write_statements(conn):
+    """Sentencias de escritura del repositorio, como `(nombre, sentencia, recorrido_esperado)`.
+
+    No se ejecutan: se construyen con los mismos constructores que usa el repositorio
+    (`app.repository.*_statement`) y solo se analizan con EXPLAIN, así que no bloquean filas.
+    """
+    pid, version, tipo_id, _nombre = _sample_values(conn)
+    ids = list(range(max(1, pid - 9), pid + 1))
+    return [
+        # el UPDATE que emite el flush de `update_product` (version_id_col: WHERE id AND version)
+        ('repository.update_product', update(Product)
+         .where(Product.id == pid, Product.version == version)
+         .values(Marca='diag', Fecha_Modificacion=func.now(), version=version + 1), False),
+        ('repository.update_products', update_products_statement(ids, {'stock_minimo': None}), False),
+        ('repository.adjust_prices(tipo)', adjust_prices_statement(1.0, tipo_id=tipo_id), False),
+        ('repository.adjust_stock', adjust_stock_statement(pid, -1), False),
+        ('repository.delete_products', delete_products_statement(ids), False),
+        ('repository.delete_products_where(tipo)', delete_where_statement(tipo_id=tipo_id), False),
+        ('repository.delete_products_where(expired_before)',
+         delete_where_statement(expired_before=date.today()), False),
+    ]
+
+
+def capture_statements(conn, workdir):
+    """Ejecuta `sample_reads()` sobre `conn` y devuelve el SQL que emitieron.
+
+    Devuelve `(nombre, sentencia, parámetros, recorrido_esperado)`, uno por SELECT distinto
+    (el resto se descarta). Las sentencias salen de los hooks de `instrument_engine`, así que el
+    engine de `conn` debe estar instrumentado.
+    """
+    session = Session(bind=conn, expire_on_commit=False)
+    statements, seen = [], set()
+    with _metrics_enabled():
+        for name, operation, expected in sample_reads(session, workdir):
+            with metrics.capture_sql() as captured:
+                operation()
+            for _operation, sql, parameters in captured:
+                verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+                if verb not in ('SELECT', 'WITH') or (name, sql) in seen:
+                    continue
+                seen.add((name, sql))
+                statements.append((name, sql, parameters, expected))
+    session.close()
+    if not statements:
+        raise RuntimeError("No se capturó ninguna sentencia: el engine debe estar instrumentado "
+                           "con app.metrics.instrument_engine")
+    return statements
+
+
+def _mysql_plan(conn, sql, parameters=None):
+    lines, scans = [], []
+    for row in conn.exec_driver_sql(f"EXPLAIN {sql}", parameters or ()).mappings():
+        lines.append(f"{row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                     f"rows={row.get('rows')} {row.get('Extra') or ''}".rstrip())
+        if row.get('type') == 'ALL' and row.get('table') and not str(row['table']).startswith('<'):
+            scans.append(row['table'])
+    return lines, scans
+
+
+def _sqlite_plan(conn, sql, parameters=None):
+    lines, scans = [], []
+    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters or ()):
+        detail = str(row[-1])
+        lines.append(detail)
+        words = detail.split()
+        # "SCAN productos" recorre la tabla; "SCAN productos USING [COVERING] INDEX ..." no es
+        # un recorrido de la tabla (aunque sí de todo el índice)
+        if (len(words) >= 2 and words[0] == 'SCAN' and 'INDEX' not in words and not words[1].startswith('(')
+                and words[1:3] != ['CONSTANT', 'ROW']):
+            scans.append(words[1])
+    return lines, scans
+
+
+def explain_sql(conn, name, sql, parameters=None, expected_full_scan=False):
+    """EXPLAIN del SQL `sql` (con sus `parameters` del driver) en `conn`; devuelve un QueryPlan.
+
+    Los recorridos completos que solo afectan a `SMALL_TABLES` se consideran esperados.
+    """
+    if _is_mysql(conn):
+        lines, scans = _mysql_plan(conn, sql, parameters)
+    else:
+        lines, scans = _sqlite_plan(conn, sql, parameters)
+    expected = expected_full_scan or bool(scans) and all(t in SMALL_TABLES for t in scans)
+    return QueryPlan(name, sql, lines, scans, expected)
+
+
+def explain_statement(conn, name, stmt, expected_full_scan=False):
+    """EXPLAIN de una sentencia SQLAlchemy (valores en línea) en `conn`; devuelve un QueryPlan.
+
+    EXPLAIN no ejecuta los UPDATE/DELETE (MySQL 5.6+ y SQLite).
+    """
+    sql = str(stmt.compile(dialect=conn.dialect,
+                           compile_kwargs={'literal_binds': True, 'render_postcompile': True}))
+    return explain_sql(conn, name, sql, None, expected_full_scan)
+
+
+def _explain_safely(plans, explain, name, sql, expected):
+    try:
+        plans.append(explain())
+    except Exception as e:
+        plans.append(QueryPlan(name, sql, [f"error: {e}"], [], expected))
+
+
+def explain_queries(engine):
+    """EXPLAIN de las lecturas capturadas y de las escrituras del repositorio (sin ejecutarlas).
+
+    Devuelve una lista de QueryPlan. `engine` debe estar instrumentado (ver `capture_statements`).
+    """
+    plans = []
+    with engine.connect() as conn, tempfile.TemporaryDirectory() as workdir:
+        try:
+            for name, sql, parameters, expected in capture_statements(conn, workdir):
+                _explain_safely(plans, lambda: explain_sql(conn, name, sql, parameters, expected),
+                                name, sql, expected)
+            for name, stmt, expected in write_statements(conn):
+                _explain_safely(plans, lambda: explain_statement(conn, name, stmt, expected),
+                                name, str(stmt), expected)
+        finally:
+            conn.rollback()
+    return plans
+
+
+@contextmanager
+def _metrics_enabled(reset=False):
+    # Habilita el registro global con un MemorySink durante el bloque y deja el estado anterior
+    previous = (metrics.sink, metrics.enabled)
+    if reset:
+        metrics.reset()
+    metrics.configure(MemorySink())
+    try:
+        yield
+    finally:
+        sink, enabled = previous
+        if enabled:
+            metrics.configure(sink)
+        else:
+            metrics.disable()
+
+
+def unexpected_full_scans(plans):
+    return [p for p in plans if p.full_scans and not p.expected_full_scan]
+
+
+def profile_reads(engine, rounds=3, sample=20, limit=10, seed=None):
+    """Ejecuta una muestra de lecturas del repositorio con las métricas habilitadas.
+
+    `engine` debe estar instrumentado con `app.metrics.instrument_engine` (`app.db.engine` lo está).
+    Devuelve `(lentas, operaciones)`: `metrics.slowest_statements(limit)` y las estadísticas por
+    operación (`metrics.snapshot()`). El registro global se reinicia y al final se restaura su sink.
+    """
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    rng = random.Random(seed)
+    with factory() as session:
+        ids = list(session.execute(select(Product.id)).scalars())
+        nombres = list(session.execute(select(Category.nombre)).scalars())
+    with _metrics_enabled(reset=True):
+        for _ in range(rounds):
+            with factory() as session:
+                list_products(session)
+                for pid in rng.sample(ids, min(sample, len(ids))):
+                    get_product(pid, session)
+                for _p in iter_products(session):
+                    pass
+                for nombre in nombres:
+                    category_id(session, nombre, create=False)
+                low_stock_products(session)
+                changed_since(session, datetime.now() - timedelta(days=1))
+                session.rollback()
+        return metrics.slowest_statements(limit), metrics.snapshot()
@@ -1,18 +1,54 @@
 """Export utilities: CSV, XLSX and PDF exporters used by the UI.
 
 Functions:
+- product_row(product) / FIELDNAMES: conversión estándar de un Product a fila exportable
 - export_csv(path, data, fieldnames)
 - export_xlsx(path, data, fieldnames)
 - export_pdf(path, data, fieldnames)
-- MissingDependencyError
+- export_csv_compressed(path, data, fieldnames, codec='gzip'|'zstd')
+- export_parquet(path, data, fieldnames)
+- MissingDependencyError / ExportError / ExportCancelled
+- CancelToken / ExportProgress
 
 Notas:
 - `fieldnames` define el orden de las columnas en CSV/XLSX/PDF; manténgalo consistente con la UI.
 - Las funciones lanzan `MissingDependencyError` cuando faltan librerías opcionales y
   `ExportError` para otros fallos (de modo que la UI pueda decidir volver a CSV, etc.).
+- Cada fase (`export.convert`, `export.render`, `export.write`) se mide con `app.metrics`.
+- CSV comprimido y Parquet aceptan cualquier iterable de filas (p. ej. `repository.iter_products`)
+  y escriben por bloques sin materializar la lista completa. Parquet usa tipos reales: enteros para
+  `id`/`cantidad`, float para `precio` y fechas para `Fecha_*`.
+- Todas las funciones aceptan `progress` (callable que recibe un `ExportProgress` por bloque de
+  `CHUNK_SIZE` filas), `cancel` (un `CancelToken`) y `total` (filas esperadas, si `data` no tiene
+  `len`). Al cancelar o fallar se elimina el archivo parcial y se lanza `ExportCancelled` /
+  `ExportError`.
 """
-from typing import List, Dict
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
+from typing import List, Dict, Iterable
 import csv
+import gzip
+import io
+import os
+import threading
+import time
+
+try:
+    from app.metrics import registry as metrics
+except ModuleNotFoundError:
+    from metrics import registry as metrics
+
+FIELDNAMES = ['id','name','tipo','descripcion','cantidad','Marca','precio','Fecha_Vencimiento','Fecha_Registro']
+# Tipos de columna para formatos tipados (Parquet); el resto se exporta como texto
+COLUMN_TYPES = {'id': 'int', 'cantidad': 'int', 'precio': 'float', 'Fecha_Vencimiento': 'date', 'Fecha_Registro': 'date'}
+PARQUET_ROW_GROUP_SIZE = 10000
+# Filas por bloque entre avisos de progreso / comprobaciones de cancelación
+CHUNK_SIZE = 500
+# Estimación de filas por página en el PDF (carta, fuente por defecto) para el progreso de `build`
+PDF_ROWS_PER_PAGE = 38
+
 
 class MissingDependencyError(RuntimeError):
     pass
@@ -20,20 +56,113 @@ class MissingDependencyError(RuntimeError):
 class ExportError(RuntimeError):
     pass
 
+class ExportCancelled(ExportError):
+    pass
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared between the UI and an export running in a worker."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
 
-def export_csv(path: str, data: List[Dict], fieldnames: List[str]):
-    """Export data (list of dicts) to CSV at `path`."""
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ExportCancelled("Exportación cancelada")
+
+
+# done: filas procesadas; total: filas esperadas (None si se desconoce); phase: 'convert'/'render'/'write'
+ExportProgress = namedtuple('ExportProgress', ['done', 'total', 'rows_per_sec', 'phase'])
+
+
+class _Progress:
+    def __init__(self, callback, cancel, total, data=None):
+        if total is None and data is not None:
+            try:
+                total = len(data)
+            except TypeError:
+                total = None
+        self.callback = callback
+        self.cancel = cancel
+        self.total = total
+        self.started = time.perf_counter()
+
+    def step(self, done, phase='write'):
+        """Comprueba la cancelación y notifica el avance."""
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+        if self.callback is not None:
+            elapsed = time.perf_counter() - self.started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            self.callback(ExportProgress(done, self.total, rate, phase))
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def _removing_partial(path):
+    """Elimina `path` si el bloque falla o se cancela, para no dejar archivos a medias."""
+    try:
+        yield
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+
+
+def product_row(p) -> Dict:
+    """Convert a Product into the dict used by every exporter (columns in FIELDNAMES)."""
+    return {
+        'id': p.id,
+        'name': p.name or '',
+        'tipo': p.tipo or '',
+        'descripcion': p.descripcion or '',
+        'cantidad': p.cantidad,
+        'Marca': p.Marca or '',
+        'precio': float(getattr(p, 'precio', 0.0) or 0.0),
+        'Fecha_Vencimiento': p.Fecha_Vencimiento.isoformat() if p.Fecha_Vencimiento else '',
+        'Fecha_Registro': p.Fecha_Registro.isoformat() if p.Fecha_Registro else ''
+    }
+
+
+def export_csv(path: str, data: Iterable[Dict], fieldnames: List[str], progress=None, cancel: CancelToken = None, total: int = None):
+    """Export data (iterable of dicts) to CSV at `path`."""
+    tracker = _Progress(progress, cancel, total, data)
     try:
-        with open(path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in data:
-                writer.writerow(row)
+        with metrics.timer("export.write", format='csv') as span, _removing_partial(path):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                rows = 0
+                for chunk in _chunks(data, CHUNK_SIZE):
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+                    tracker.step(rows)
+            if span is not None:
+                span['rows'] = rows
+    except ExportError:
+        raise
     except Exception as e:
         raise ExportError(str(e)) from e
 
 
-def export_xlsx(path: str, data: List[Dict], fieldnames: List[str]):
+def export_xlsx(path: str, data: Iterable[Dict], fieldnames: List[str], progress=None, cancel: CancelToken = None, total: int = None):
     """Export data to an Excel .xlsx file using pandas + openpyxl.
 
     Raises MissingDependencyError if pandas or openpyxl are not available.
@@ -47,20 +176,43 @@ def export_xlsx(path: str, data: List[Dict], fieldnames: List[str]):
     except Exception as e:
         raise MissingDependencyError("openpyxl is required to export to .xlsx (pip install openpyxl)") from e
 
+    tracker = _Progress(progress, cancel, total, data)
     try:
-        df = pd.DataFrame(data, columns=fieldnames)
-        df.to_excel(path, index=False, engine='openpyxl')
+        with metrics.timer("export.write", format='xlsx') as span, _removing_partial(path):
+            convert_ms = 0.0
+            with pd.ExcelWriter(path, engine='openpyxl') as writer:
+                # cabecera aunque no haya filas; cada bloque se escribe a continuación del anterior
+                pd.DataFrame(columns=fieldnames).to_excel(writer, index=False)
+                rows = 0
+                for chunk in _chunks(data, CHUNK_SIZE):
+                    t0 = time.perf_counter()
+                    df = pd.DataFrame(chunk, columns=fieldnames)
+                    convert_ms += (time.perf_counter() - t0) * 1000.0
+                    df.to_excel(writer, index=False, header=False, startrow=rows + 1)
+                    rows += len(chunk)
+                    tracker.step(rows)
+            if span is not None:
+                span['rows'] = rows
+                # la conversión va intercalada con la escritura: se registra como una sola
+                # medición `export.convert` con el tiempo acumulado de todos los bloques
+                metrics.record({'metric': 'export.convert', 'format': 'xlsx', 'rows': rows,
+                                'duration_ms': round(convert_ms, 3)})
+    except ExportError:
+        raise
     except Exception as e:
         raise ExportError(str(e)) from e
 
 
-def export_pdf(path: str, data: List[Dict], fieldnames: List[str], logo_path: str = None, logo_width: float = 80, logo_height: float = None, margin_top: float = 20):
+def export_pdf(path: str, data: Iterable[Dict], fieldnames: List[str], logo_path: str = None, logo_width: float = 80, logo_height: float = None, margin_top: float = 20,
+               progress=None, cancel: CancelToken = None, total: int = None):
     """Export data to PDF using reportlab.
 
     Optional parameters:
       - logo_path: path to an image file to place at the top-left of each page.
       - logo_width / logo_height: dimensions in points (defaults scale preserving aspect ratio)
       - margin_top: distance from the top edge in points.
+      - progress / cancel / total: see the module notes. Rows are reported while the table is
+        rendered ('render') and, estimated per page, while the document is written ('write').
 
     Raises MissingDependencyError if reportlab is not available.
     """
@@ -72,6 +224,14 @@ def export_pdf(path: str, data: List[Dict], fieldnames: List[str], logo_path: st
     except Exception as e:
         raise MissingDependencyError("reportlab is required to export to PDF (pip install reportlab)") from e
 
+    tracker = _Progress(progress, cancel, total, data)
+
+    def _on_page(c, doc):
+        # reportlab llama a este callback por cada página: sirve para avisar y para cancelar
+        done = doc.page * PDF_ROWS_PER_PAGE
+        tracker.step(min(done, rows) if rows else done, phase='write')
+        _draw_logo(c, doc)
+
     def _draw_logo(c, doc):
         if not logo_path:
             return
@@ -92,29 +252,39 @@ def export_pdf(path: str, data: List[Dict], fieldnames: List[str], logo_path: st
             # Raise an ExportError so UI can handle it gracefully
             raise ExportError(f"Error dibujando el logo: {e}") from e
 
+    rows = 0
     try:
-        doc = SimpleDocTemplate(path, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-        elements.append(Paragraph("Inventario", styles['Title']))
-        elements.append(Spacer(1, 12))
-
-        table_data = [fieldnames]
-        for r in data:
-            table_data.append([r.get(col, '') for col in fieldnames])
-
-        t = RLTable(table_data, repeatRows=1, hAlign='LEFT')
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR',(0,0),(-1,0), colors.whitesmoke),
-            ('ALIGN',(0,0),(-1,-1),'LEFT'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ]))
-
-        elements.append(t)
-        # pass the drawing callback to ensure logo appears on every page
-        doc.build(elements, onFirstPage=_draw_logo, onLaterPages=_draw_logo)
+        with metrics.timer("export.render", format='pdf') as span:
+            doc = SimpleDocTemplate(path, pagesize=letter)
+            elements = []
+            styles = getSampleStyleSheet()
+            elements.append(Paragraph("Inventario", styles['Title']))
+            elements.append(Spacer(1, 12))
+
+            table_data = [fieldnames]
+            for chunk in _chunks(data, CHUNK_SIZE):
+                for r in chunk:
+                    table_data.append([r.get(col, '') for col in fieldnames])
+                rows += len(chunk)
+                tracker.step(rows, phase='render')
+            tracker.total = rows
+            if span is not None:
+                span['rows'] = rows
+
+            t = RLTable(table_data, repeatRows=1, hAlign='LEFT')
+            t.setStyle(TableStyle([
+                ('BACKGROUND', (0,0), (-1,0), colors.grey),
+                ('TEXTCOLOR',(0,0),(-1,0), colors.whitesmoke),
+                ('ALIGN',(0,0),(-1,-1),'LEFT'),
+                ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ]))
+
+            elements.append(t)
+        # pass the page callback to ensure logo appears on every page
+        with metrics.timer("export.write", format='pdf', rows=rows), _removing_partial(path):
+            doc.build(elements, onFirstPage=_on_page, onLaterPages=_on_page)
+        tracker.step(rows, phase='write')
     except MissingDependencyError:
         raise
     except ExportError:
@@ -123,12 +293,117 @@ def export_pdf(path: str, data: List[Dict], fieldnames: List[str], logo_path: st
         raise ExportError(str(e)) from e
 
 
-def export_to(fmt: str, path: str, data: List[Dict], fieldnames: List[str], **kwargs):
+def _open_compressed(path: str, codec: str, level: int = None):
+    """Open `path` for streaming text writes through the given compression codec."""
+    if codec == 'gzip':
+        return gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=6 if level is None else level)
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except Exception as e:
+            raise MissingDependencyError("zstandard is required to export .csv.zst (pip install zstandard)") from e
+        raw = open(path, 'wb')
+        cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+        # closefd: al cerrar el wrapper se cierran también el compresor y el archivo
+        return io.TextIOWrapper(cctx.stream_writer(raw, closefd=True), encoding='utf-8', newline='')
+    raise ValueError(f"Compresión desconocida: {codec}")
+
+
+def export_csv_compressed(path: str, data: Iterable[Dict], fieldnames: List[str], codec: str = 'gzip', level: int = None,
+                          progress=None, cancel: CancelToken = None, total: int = None):
+    """Export data to a gzip (.csv.gz) or zstd (.csv.zst) compressed CSV, streaming row by row.
+
+    Raises MissingDependencyError if zstd is requested and `zstandard` is not installed.
+    """
+    tracker = _Progress(progress, cancel, total, data)
+    f = _open_compressed(path, codec, level)
+    try:
+        with metrics.timer("export.write", format=f'csv.{codec}') as span, _removing_partial(path):
+            with f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                rows = 0
+                for chunk in _chunks(data, CHUNK_SIZE):
+                    writer.writerows(chunk)
+                    rows += len(chunk)
+                    tracker.step(rows)
+            if span is not None:
+                span['rows'] = rows
+    except ExportError:
+        raise
+    except Exception as e:
+        raise ExportError(str(e)) from e
+
+
+def _typed(value, kind):
+    if value is None or value == '':
+        return None
+    if kind == 'int':
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if kind == 'date':
+        return value if isinstance(value, date) else date.fromisoformat(str(value))
+    return str(value)
+
+
+def export_parquet(path: str, data: Iterable[Dict], fieldnames: List[str], row_group_size: int = PARQUET_ROW_GROUP_SIZE, compression: str = 'zstd',
+                   progress=None, cancel: CancelToken = None, total: int = None):
+    """Export data to Parquet using pyarrow, one row group per `row_group_size` rows.
+
+    Raises MissingDependencyError if pyarrow is not available.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except Exception as e:
+        raise MissingDependencyError("pyarrow is required to export to Parquet (pip install pyarrow)") from e
+
+    arrow_types = {'int': pa.int64(), 'float': pa.float64(), 'date': pa.date32()}
+    kinds = [COLUMN_TYPES.get(col, 'str') for col in fieldnames]
+    schema = pa.schema([(col, arrow_types.get(kind, pa.string())) for col, kind in zip(fieldnames, kinds)])
+
+    tracker = _Progress(progress, cancel, total, data)
+
+    def _write(writer, batch):
+        columns = {col: [_typed(r.get(col), kind) for r in batch] for col, kind in zip(fieldnames, kinds)}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+    try:
+        with metrics.timer("export.write", format='parquet') as span, _removing_partial(path):
+            rows = 0
+            with pq.ParquetWriter(path, schema, compression=compression) as writer:
+                batch = []
+                for chunk in _chunks(data, CHUNK_SIZE):
+                    batch.extend(chunk)
+                    tracker.step(rows + len(batch))
+                    while len(batch) >= row_group_size:
+                        _write(writer, batch[:row_group_size])
+                        rows += row_group_size
+                        batch = batch[row_group_size:]
+                if batch or rows == 0:
+                    _write(writer, batch)
+                    rows += len(batch)
+            if span is not None:
+                span['rows'] = rows
+    except ExportError:
+        raise
+    except Exception as e:
+        raise ExportError(str(e)) from e
+
+
+def export_to(fmt: str, path: str, data: Iterable[Dict], fieldnames: List[str], **kwargs):
     fmt = fmt.lower()
     if fmt == 'csv':
-        return export_csv(path, data, fieldnames)
+        return export_csv(path, data, fieldnames, **kwargs)
+    if fmt in ('csv.gz', 'gzip'):
+        return export_csv_compressed(path, data, fieldnames, codec='gzip', **kwargs)
+    if fmt in ('csv.zst', 'zstd'):
+        return export_csv_compressed(path, data, fieldnames, codec='zstd', **kwargs)
+    if fmt == 'parquet':
+        return export_parquet(path, data, fieldnames, **kwargs)
     if fmt == 'xlsx' or fmt == 'excel':
-        return export_xlsx(path, data, fieldnames)
+        return export_xlsx(path, data, fieldnames, **kwargs)
     if fmt == 'pdf':
         return export_pdf(path, data, fieldnames, **kwargs)
     raise ValueError(f"Formato desconocido: {fmt}")
\ No newline at end of file
@@ -0,0 +1,627 @@
+"""Réplica local (SQLite en modo WAL) de `productos` con sincronización en segundo plano.
+
+Funcionamiento:
+- Las lecturas y escrituras del repositorio usan la réplica local cuando `LOCAL_REPLICA_PATH`
+  está definido (ver `get_local_replica()`), de modo que la UI trabaja a latencia de disco.
+- Cada flush de `Product` en una sesión de la réplica registra, en la misma transacción local,
+  una entrada en la tabla `outbox` (insert/update/delete con los valores previos). Los UPDATE/DELETE
+  masivos del repositorio se desglosan en una entrada por fila afectada; los ajustes de stock se
+  registran como incrementos (`adjust`) que se suman en el central sin comprobar el estado previo;
+  como en `adjust_stock`, un incremento que dejaría la cantidad del central bajo cero es un conflicto.
+- `SyncWorker` envía el outbox al MySQL central por lotes (una transacción por lote). Un update o
+  delete cuyo estado previo ya no coincide con el central se marca como `conflict` y no se aplica.
+- Los updates incluyen `version` en el estado previo, así que cualquier guardado intermedio en el
+  central se detecta como conflicto.
+- Cuando no quedan entradas pendientes, `refresh_from_primary()` trae del central solo las filas
+  con `Fecha_Modificacion` posterior a la última actualización (marca de agua: la mayor
+  `Fecha_Modificacion` del central, menos `overlap_seconds`). Las bajas se concilian aparte: solo si el número de filas
+  local y central difiere se comparan los ids.
+- Las escrituras locales dejan `Fecha_Modificacion` a NULL hasta que el refresco trae la fila del
+  central; así todas las marcas de la réplica salen del reloj del central (el SQLite local usa UTC
+  y el MySQL central su hora local) y las consultas por marca de agua no mezclan relojes.
+
+Notas:
+- La entrega es "al menos una vez": si el proceso muere entre el commit central y el marcado local,
+  el lote se reintenta. Cada entrada lleva un `token` que el central guarda en `sync_tokens` en la
+  misma transacción, así que una entrada ya aplicada no se aplica dos veces (p. ej. un alta
+  duplicada). La tabla la crea la migración de Alembic; `SyncWorker` purga los tokens antiguos
+  cada `token_purge_interval` segundos, fuera de las transacciones de los lotes.
+- Una entrada que falla por un error que no es de conexión (p. ej. `IntegrityError`) se marca
+  `failed` con el error y no bloquea el resto del outbox (ver `failures()`); los errores de
+  conexión o de bloqueo (`OperationalError`) interrumpen el lote para reintentarlo más tarde.
+- Las altas locales reciben ids negativos hasta sincronizarse; luego se reasignan al id que
+  devuelve el central.
+"""
+
+from datetime import date, datetime, timedelta
+import json
+import logging
+import math
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, create_engine, event, func,
+    inspect as sa_inspect, null, or_, select, delete as sa_delete, update as sa_update,
+)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+try:
+    from app.models import Base, Product, Category, SyncToken
+    from app.db import engine as primary_engine, LOCAL_REPLICA_PATH
+    from app.categories import clear_category_cache
+except ModuleNotFoundError:
+    try:
+        from models import Base, Product, Category, SyncToken
+        from db import engine as primary_engine, LOCAL_REPLICA_PATH
+        from categories import clear_category_cache
+    except Exception:
+        traceback.print_exc()
+        raise
+
+logger = logging.getLogger("inventory.replica")
+
+# Metadata propia: el outbox solo existe en la réplica local, nunca en el central
+ReplicaBase = declarative_base()
+
+
+class OutboxEntry(ReplicaBase):
+    __tablename__ = 'outbox'
+    id = Column(Integer, primary_key=True)
+    # 'insert' | 'update' | 'delete' | 'adjust' (incremento de cantidad)
+    op = Column(String(10), nullable=False)
+    product_id = Column(Integer, nullable=False, index=True)
+    # Valores nuevos (JSON) y valores previos de las columnas modificadas (JSON)
+    payload = Column(Text, nullable=True)
+    before = Column(Text, nullable=True)
+    # 'pending' | 'done' | 'conflict' | 'failed'
+    status = Column(String(10), nullable=False, default='pending', index=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    # Identificador de la entrada en el central (`sync_tokens`) para no aplicarla dos veces
+    token = Column(String(32), nullable=True)
+
+
+class ReplicaState(ReplicaBase):
+    # Pares clave/valor de la réplica (`watermark`: marca de agua del último refresco)
+    __tablename__ = 'replica_state'
+    key = Column(String(50), primary_key=True)
+    value = Column(Text, nullable=True)
+
+
+class ResyncEntry(ReplicaBase):
+    # Productos a volver a copiar del central en el próximo refresco (entradas en conflicto o
+    # fallidas: la copia local tiene cambios que el central no aceptó)
+    __tablename__ = 'replica_resync'
+    product_id = Column(Integer, primary_key=True)
+
+
+# Tokens de las entradas ya aplicadas (solo en el central)
+sync_tokens = SyncToken.__table__
+# Un reintento ocurre como mucho unos minutos después; los tokens antiguos se purgan
+TOKEN_RETENTION_DAYS = 7
+TOKEN_PURGE_INTERVAL_SECONDS = 3600
+REFRESH_OVERLAP_SECONDS = 60
+_CHUNK = 500
+
+
+class SyncConflict(Exception):
+    pass
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def _chunks(items, size=_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _columns():
+    return list(Product.__table__.columns)
+
+
+def _dump(values, conn=None):
+    """Serializa un dict de valores de columnas a JSON (fechas en ISO).
+
+    Con `conn`, `tipo_id` se sustituye por el nombre de la categoría (`tipo`): los ids de
+    `categorias` de la réplica no tienen por qué coincidir con los del central.
+    """
+    out = {}
+    for k, v in values.items():
+        if k == 'Fecha_Modificacion':
+            # La fija el servidor central al aplicar el cambio (no el reloj de este terminal)
+            continue
+        if k == 'tipo_id' and conn is not None:
+            out['tipo'] = conn.execute(select(Category.nombre).where(Category.id == v)).scalar()
+            continue
+        out[k] = v.isoformat() if isinstance(v, (date, datetime)) else v
+    return json.dumps(out, ensure_ascii=False)
+
+
+def _central_category_id(conn, nombre):
+    cat = Category.__table__
+    cid = conn.execute(select(cat.c.id).where(cat.c.nombre == nombre)).scalar()
+    if cid is None:
+        cid = conn.execute(cat.insert().values(nombre=nombre)).inserted_primary_key[0]
+    return cid
+
+
+def _load(text):
+    """Inverso de `_dump`: convierte las fechas de vuelta según el tipo de la columna."""
+    if not text:
+        return {}
+    values = json.loads(text)
+    cols = Product.__table__.columns
+    for k, v in list(values.items()):
+        if v is None or k not in cols:
+            continue
+        py_type = getattr(cols[k].type, 'python_type', None)
+        if py_type is datetime:
+            values[k] = datetime.fromisoformat(v)
+        elif py_type is date:
+            values[k] = date.fromisoformat(v)
+    return values
+
+
+def _same(a, b):
+    # FLOAT en MySQL es de precisión simple: comparar con tolerancia
+    if isinstance(a, float) or isinstance(b, float):
+        try:
+            return math.isclose(float(a), float(b), rel_tol=1e-6, abs_tol=1e-6)
+        except (TypeError, ValueError):
+            return False
+    return a == b
+
+
+def _row_values(obj):
+    return {c.key: getattr(obj, c.key) for c in _columns()}
+
+
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+
+class LocalReplica:
+    """Réplica SQLite de `productos` con outbox durable hacia el engine central."""
+
+    def __init__(self, path, primary=None, batch_size=200, overlap_seconds=REFRESH_OVERLAP_SECONDS):
+        self.path = path
+        self.primary = primary if primary is not None else primary_engine
+        self.batch_size = batch_size
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        event.listen(self.engine, "connect", _set_sqlite_pragmas)
+        # Solo las tablas replicadas: `sync_tokens` vive en el central
+        Base.metadata.create_all(bind=self.engine, tables=[Category.__table__, Product.__table__])
+        ReplicaBase.metadata.create_all(bind=self.engine)
+        if 'token' not in {c['name'] for c in sa_inspect(self.engine).get_columns('outbox')}:
+            # Réplicas creadas antes de los tokens: las entradas antiguas se aplican sin token
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("ALTER TABLE outbox ADD COLUMN token VARCHAR(32)")
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        event.listen(self.SessionLocal, "before_flush", self._before_flush)
+        event.listen(self.SessionLocal, "after_flush", self._capture_flush)
+        event.listen(self.SessionLocal, "do_orm_execute", self._capture_bulk)
+
+    # --- Captura de cambios -------------------------------------------------
+    def _before_flush(self, session, flush_context, instances):
+        # `version` se incrementa durante el flush y su historial no conserva el valor previo:
+        # se guarda aquí para usarlo como estado previo en el outbox.
+        session.info['replica_versions'] = {
+            o.id: o.version for o in session.dirty if isinstance(o, Product) and o.id is not None
+        }
+        # Las escrituras locales dejan `Fecha_Modificacion` a NULL (pendiente del central): así en
+        # la réplica todas las marcas son del reloj del central, y las filas NULL las recogen
+        # siempre el refresco y las consultas incrementales (`stock_alerts`).
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Product) and (obj in session.new or session.is_modified(obj)):
+                obj.Fecha_Modificacion = null()
+        # Las altas locales usan ids negativos para no chocar nunca con ids del central;
+        # al sincronizar se reasignan al id definitivo.
+        new = [o for o in session.new if isinstance(o, Product) and o.id is None]
+        if not new:
+            return
+        lowest = session.connection().execute(select(func.min(Product.__table__.c.id))).scalar()
+        next_id = min(lowest or 0, 0) - 1
+        for obj in new:
+            obj.id = next_id
+            next_id -= 1
+
+    def _capture_flush(self, session, flush_context):
+        entries = []
+        conn = session.connection()
+        new_ids = [obj.id for obj in session.new if isinstance(obj, Product)]
+        if new_ids:
+            # Releer las filas insertadas para incluir los defaults aplicados en el INSERT
+            table = Product.__table__
+            rows = conn.execute(select(table).where(table.c.id.in_(new_ids))).mappings()
+            for row in rows:
+                entries.append({'op': 'insert', 'product_id': row['id'], 'payload': _dump(dict(row), conn), 'before': None,
+                                'token': _new_token()})
+        for obj in session.dirty:
+            if not isinstance(obj, Product) or obj in session.deleted:
+                continue
+            state = sa_inspect(obj)
+            changed, before = {}, {}
+            for col in _columns():
+                hist = state.attrs[col.key].history
+                if not hist.added:
+                    continue
+                changed[col.key] = hist.added[0]
+                # Solo se conoce el valor previo si estaba cargado en la sesión
+                if hist.deleted:
+                    before[col.key] = hist.deleted[0]
+            if changed:
+                versions = session.info.get('replica_versions', {})
+                if obj.id in versions:
+                    before['version'] = versions[obj.id]
+                    changed['version'] = obj.version
+                entries.append({'op': 'update', 'product_id': obj.id, 'payload': _dump(changed, conn), 'before': _dump(before, conn),
+                                'token': _new_token()})
+        for obj in session.deleted:
+            if isinstance(obj, Product):
+                entries.append({'op': 'delete', 'product_id': obj.id, 'payload': None, 'before': _dump(_row_values(obj), conn),
+                                'token': _new_token()})
+        if entries:
+            conn.execute(OutboxEntry.__table__.insert(), entries)
+
+    def _capture_bulk(self, orm_execute_state):
+        # UPDATE/DELETE masivos no pasan por el flush: se capturan las filas afectadas antes y
+        # después de la sentencia y se registran como entradas individuales del outbox.
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return None
+        mapper = orm_execute_state.bind_mapper
+        if mapper is None or mapper.class_ is not Product:
+            return None
+        table = Product.__table__
+        stmt = orm_execute_state.statement
+        query = select(table)
+        if stmt.whereclause is not None:
+            query = query.where(stmt.whereclause)
+        conn = orm_execute_state.session.connection()
+        before_rows = {r['id']: dict(r) for r in conn.execute(query, orm_execute_state.parameters or {}).mappings()}
+        if orm_execute_state.is_update:
+            # Igual que en el flush: NULL en lugar de now() local (ver `_before_flush`)
+            result = orm_execute_state.invoke_statement(statement=stmt.values(Fecha_Modificacion=null()))
+        else:
+            result = orm_execute_state.invoke_statement()
+        if not before_rows:
+            return result
+        entries = []
+        if orm_execute_state.is_delete:
+            for pid, row in before_rows.items():
+                entries.append({'op': 'delete', 'product_id': pid, 'payload': None, 'before': _dump(row, conn),
+                                'token': _new_token()})
+        elif orm_execute_state.execution_options.get('stock_adjustment'):
+            # Ajustes de stock: se envía el incremento, no el valor final, para que las ventas
+            # de varios terminales se sumen en el central sin generar conflictos.
+            allow_negative = bool(orm_execute_state.execution_options.get('allow_negative'))
+            after = conn.execute(select(table.c.id, table.c.cantidad).where(table.c.id.in_(list(before_rows)))).mappings()
+            for row in after:
+                delta = (row['cantidad'] or 0) - (before_rows[row['id']]['cantidad'] or 0)
+                if delta:
+                    payload = {'cantidad': delta, 'allow_negative': True} if allow_negative else {'cantidad': delta}
+                    entries.append({'op': 'adjust', 'product_id': row['id'], 'payload': json.dumps(payload),
+                                    'before': None, 'token': _new_token()})
+        else:
+            after = conn.execute(select(table).where(table.c.id.in_(list(before_rows)))).mappings()
+            for row in after:
+                old = before_rows[row['id']]
+                changed = {k: v for k, v in row.items() if not _same(old[k], v)}
+                if changed:
+                    entries.append({'op': 'update', 'product_id': row['id'], 'payload': _dump(changed, conn),
+                                    'before': _dump({k: old[k] for k in changed}, conn), 'token': _new_token()})
+        if entries:
+            conn.execute(OutboxEntry.__table__.insert(), entries)
+        return result
+
+    # --- Consultas sobre el outbox ------------------------------------------
+    def pending_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(OutboxEntry.__table__).where(OutboxEntry.status == 'pending')
+            ).scalar_one()
+
+    def conflicts(self):
+        """Entradas que no pudieron aplicarse en el central (para revisión manual)."""
+        with self.SessionLocal() as session:
+            return session.query(OutboxEntry).filter_by(status='conflict').order_by(OutboxEntry.id).all()
+
+    def failures(self):
+        """Entradas que fallaron en el central por un error inesperado (con el error en `error`)."""
+        with self.SessionLocal() as session:
+            return session.query(OutboxEntry).filter_by(status='failed').order_by(OutboxEntry.id).all()
+
+    # --- Sincronización -----------------------------------------------------
+    def _apply(self, conn, entry, id_map):
+        table = Product.__table__
+        pid = id_map.get(entry.product_id, entry.product_id)
+        if entry.op == 'insert':
+            values = _load(entry.payload)
+            values.pop('id', None)
+            if 'tipo' in values:
+                values['tipo_id'] = _central_category_id(conn, values.pop('tipo'))
+            result = conn.execute(table.insert().values(**values))
+            return result.inserted_primary_key[0]
+
+        cat = Category.__table__
+        current = conn.execute(
+            select(table, cat.c.nombre.label('tipo'))
+            .select_from(table.outerjoin(cat, cat.c.id == table.c.tipo_id))
+            .where(table.c.id == pid)
+        ).mappings().first()
+        before = _load(entry.before)
+        if entry.op == 'update':
+            if current is None:
+                raise SyncConflict(f"Producto {pid} eliminado en el servidor central")
+            stale = [k for k, v in before.items() if k in current and not _same(current[k], v)]
+            if stale:
+                raise SyncConflict(f"Producto {pid} modificado en el servidor central: {', '.join(stale)}")
+            changes = _load(entry.payload)
+            changes.pop('id', None)
+            if 'tipo' in changes:
+                changes['tipo_id'] = _central_category_id(conn, changes.pop('tipo'))
+            conn.execute(table.update().where(table.c.id == pid).values(**changes))
+            return pid
+        if entry.op == 'adjust':
+            if current is None:
+                raise SyncConflict(f"Producto {pid} eliminado en el servidor central")
+            payload = json.loads(entry.payload)
+            delta = payload['cantidad']
+            new_qty = func.coalesce(table.c.cantidad, 0) + delta
+            stmt = table.update().where(table.c.id == pid).values(cantidad=new_qty, version=table.c.version + 1)
+            if delta < 0 and not payload.get('allow_negative'):
+                # Mismo predicado que `adjust_stock`: dos terminales no pueden vender de más
+                stmt = stmt.where(new_qty >= 0)
+            if not conn.execute(stmt).rowcount:
+                raise SyncConflict(f"Stock insuficiente en el servidor central para el producto {pid} "
+                                   f"(incremento {delta})")
+            return pid
+        if entry.op == 'delete':
+            if current is None:
+                return pid
+            stale = [k for k, v in before.items() if k in current and not _same(current[k], v)]
+            if stale:
+                raise SyncConflict(f"Producto {pid} modificado en el servidor central antes de eliminarlo: {', '.join(stale)}")
+            conn.execute(table.delete().where(table.c.id == pid))
+            return pid
+        raise ValueError(f"Operación de outbox desconocida: {entry.op}")
+
+    def sync_once(self):
+        """Envía un lote del outbox al central. Devuelve el número de entradas procesadas."""
+        with self.SessionLocal() as session:
+            entries = (session.query(OutboxEntry)
+                       .filter_by(status='pending')
+                       .order_by(OutboxEntry.id)
+                       .limit(self.batch_size)
+                       .all())
+        if not entries:
+            return 0
+
+        id_map = {}
+        results = []
+        with self.primary.begin() as conn:
+            for entry in entries:
+                # Un savepoint por entrada: un conflicto o un fallo no invalida el resto del lote
+                sp = conn.begin_nested()
+                try:
+                    new_id = self._apply_once(conn, entry, id_map)
+                    sp.commit()
+                except SyncConflict as e:
+                    sp.rollback()
+                    results.append((entry, 'conflict', str(e)))
+                    continue
+                except OperationalError:
+                    # Conexión perdida, bloqueo o deadlock: reintentar el lote completo más tarde
+                    sp.rollback()
+                    raise
+                except Exception as e:
+                    sp.rollback()
+                    results.append((entry, 'failed', f"{type(e).__name__}: {e}"))
+                    continue
+                if entry.op == 'insert' and new_id != entry.product_id:
+                    id_map[entry.product_id] = new_id
+                results.append((entry, 'done', None))
+
+        outbox = OutboxEntry.__table__
+        products = Product.__table__
+        with self.engine.begin() as conn:
+            for old_id, new_id in id_map.items():
+                conn.execute(sa_update(products).where(products.c.id == old_id).values(id=new_id))
+                conn.execute(sa_update(outbox).where(outbox.c.product_id == old_id).values(product_id=new_id))
+            for entry, status, error in results:
+                conn.execute(sa_update(outbox).where(outbox.c.id == entry.id).values(status=status, error=error))
+                if status != 'done':
+                    product_id = id_map.get(entry.product_id, entry.product_id)
+                    conn.execute(sa_delete(ResyncEntry).where(ResyncEntry.product_id == product_id))
+                    conn.execute(ResyncEntry.__table__.insert().values(product_id=product_id))
+        for entry, status, error in results:
+            if status == 'conflict':
+                logger.warning("Conflicto de sincronización (outbox %s): %s", entry.id, error)
+            elif status == 'failed':
+                logger.error("Entrada del outbox %s no aplicada en el central: %s", entry.id, error)
+        return len(results)
+
+    def purge_tokens(self, retention_days=TOKEN_RETENTION_DAYS):
+        """Borra del central los tokens con más de `retention_days` días. Devuelve cuántos."""
+        with self.primary.begin() as conn:
+            # Fecha de corte con el reloj del central (el mismo que fija `created_at`)
+            cutoff = conn.execute(select(func.now())).scalar() - timedelta(days=retention_days)
+            return conn.execute(sa_delete(sync_tokens).where(sync_tokens.c.created_at < cutoff)).rowcount
+
+    def _apply_once(self, conn, entry, id_map):
+        """Aplica `entry` salvo que su token ya esté registrado en el central."""
+        if entry.token is None:
+            return self._apply(conn, entry, id_map)
+        done = conn.execute(select(sync_tokens.c.product_id).where(sync_tokens.c.token == entry.token)).scalar()
+        if done is not None:
+            return done
+        pid = self._apply(conn, entry, id_map)
+        conn.execute(sync_tokens.insert().values(token=entry.token, product_id=pid))
+        return pid
+
+    def refresh_from_primary(self):
+        """Trae del central los cambios desde el último refresco si no hay cambios pendientes.
+
+        El primer refresco copia las tablas completas; los siguientes solo las filas con
+        `Fecha_Modificacion` posterior a la marca de agua (y las marcadas para resincronizar).
+        Devuelve True si se refrescó, False si quedaban entradas pendientes en el outbox.
+        """
+        table = Product.__table__
+        cat = Category.__table__
+        with self.engine.connect() as conn:
+            watermark = conn.execute(select(ReplicaState.value).where(ReplicaState.key == 'watermark')).scalar()
+            resync = list(conn.execute(select(ResyncEntry.product_id)).scalars())
+        with self.primary.connect() as conn:
+            # Marca de agua: la mayor `Fecha_Modificacion` del central (misma fuente que las filas),
+            # leída antes que las filas para que lo confirmado después quede por encima
+            latest = conn.execute(select(func.max(table.c.Fecha_Modificacion))).scalar()
+            categories = [dict(r) for r in conn.execute(select(cat)).mappings()]
+            query = select(table)
+            if watermark is not None:
+                since = datetime.fromisoformat(watermark) - self.overlap
+                cond = or_(table.c.Fecha_Modificacion >= since, table.c.Fecha_Modificacion.is_(None))
+                if resync:
+                    cond = or_(cond, table.c.id.in_(resync))
+                query = query.where(cond)
+            rows = [dict(r) for r in conn.execute(query).mappings()]
+            central_count = conn.execute(select(func.count()).select_from(table)).scalar()
+        with self.engine.connect() as conn:
+            trans = conn.begin()
+            # El DELETE toma el bloqueo de escritura; a partir de aquí el conteo no puede cambiar
+            conn.execute(sa_delete(ReplicaState).where(ReplicaState.key == 'watermark'))
+            pending = conn.execute(
+                select(func.count()).select_from(OutboxEntry.__table__).where(OutboxEntry.status == 'pending')
+            ).scalar_one()
+            if pending:
+                trans.rollback()
+                return False
+            if watermark is None:
+                conn.execute(sa_delete(table))
+            # Las categorías (tabla pequeña) se copian completas con los ids del central
+            conn.execute(sa_delete(cat))
+            if categories:
+                conn.execute(cat.insert(), categories)
+            self._upsert(conn, rows)
+            if watermark is not None:
+                self._reconcile(conn, central_count)
+            if resync:
+                conn.execute(sa_delete(ResyncEntry).where(ResyncEntry.product_id.in_(resync)))
+            if latest is None and watermark is not None:
+                latest = datetime.fromisoformat(watermark)
+            if latest is not None:
+                conn.execute(ReplicaState.__table__.insert().values(key='watermark', value=latest.isoformat()))
+            trans.commit()
+        clear_category_cache()
+        return True
+
+    def _upsert(self, conn, rows):
+        table = Product.__table__
+        for chunk in _chunks(rows):
+            conn.execute(sa_delete(table).where(table.c.id.in_([r['id'] for r in chunk])))
+            conn.execute(table.insert(), chunk)
+
+    def _reconcile(self, conn, central_count):
+        # Sin pendientes la copia local contiene todas las filas del central: si el número de
+        # filas coincide no hubo bajas; si no, comparar ids (solo la columna id del central)
+        table = Product.__table__
+        if conn.execute(select(func.count()).select_from(table)).scalar() == central_count:
+            return
+        local_ids = set(conn.execute(select(table.c.id)).scalars())
+        with self.primary.connect() as central:
+            central_ids = set(central.execute(select(table.c.id)).scalars())
+            missing = central_ids - local_ids
+            rows = []
+            for chunk in _chunks(missing):
+                rows += [dict(r) for r in central.execute(select(table).where(table.c.id.in_(chunk))).mappings()]
+        for chunk in _chunks(local_ids - central_ids):
+            conn.execute(sa_delete(table).where(table.c.id.in_(chunk)))
+        self._upsert(conn, rows)
+
+    def sync(self):
+        """Vacía el outbox y, si no quedan pendientes, refresca desde el central."""
+        while self.sync_once() >= self.batch_size:
+            pass
+        return self.refresh_from_primary()
+
+
+class SyncWorker(threading.Thread):
+    """Hilo en segundo plano que sincroniza periódicamente la réplica con el central."""
+
+    def __init__(self, replica, interval=5.0, max_backoff=60.0,
+                 token_purge_interval=TOKEN_PURGE_INTERVAL_SECONDS):
+        super().__init__(name="inventory-sync", daemon=True)
+        self.replica = replica
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.token_purge_interval = token_purge_interval
+        self._next_purge = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        wait = self.interval
+        while not self._stop_event.is_set():
+            try:
+                self.replica.sync()
+                self._purge_tokens_if_due()
+                wait = self.interval
+            except Exception:
+                # Central no disponible: seguir trabajando en local y reintentar con backoff
+                logger.warning("Sincronización fallida; reintento en %.0fs", wait, exc_info=True)
+                wait = min(wait * 2, self.max_backoff)
+            self._stop_event.wait(wait)
+
+    def _purge_tokens_if_due(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.token_purge_interval
+        removed = self.replica.purge_tokens()
+        if removed:
+            logger.info("Purgados %d tokens de sincronización antiguos", removed)
+
+
+_replica = None
+_worker = None
+_replica_lock = threading.Lock()
+
+
+def get_local_replica():
+    """Devuelve la réplica configurada por `LOCAL_REPLICA_PATH` o None si no hay réplica."""
+    global _replica
+    if not LOCAL_REPLICA_PATH:
+        return None
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = LocalReplica(LOCAL_REPLICA_PATH,
+                                        batch_size=int(os.getenv("LOCAL_REPLICA_BATCH", "200")))
+    return _replica
+
+
+def start_sync_worker(interval=None):
+    """Arranca (una sola vez) el hilo de sincronización si hay réplica configurada."""
+    global _worker
+    replica = get_local_replica()
+    if replica is None:
+        return None
+    if _worker is None:
+        if interval is None:
+            interval = float(os.getenv("LOCAL_REPLICA_SYNC_INTERVAL", "5"))
+        _worker = SyncWorker(replica, interval=interval)
+        _worker.start()
+    return _worker
@@ -0,0 +1,271 @@
+"""Instrumentación ligera: temporizadores, conteo de SQL y sinks intercambiables.
+
+Uso típico:
+- `timed("repository.list_products")` como decorador o `registry.timer("export.write")` como
+  context manager para medir una operación.
+- `instrument_engine(engine)` registra eventos del Engine para contar sentencias SQL y su
+  duración; los conteos se atribuyen a la operación (timer) activa en ese momento.
+- `registry.capture_sql()` recoge además el texto y los parámetros de cada sentencia ejecutada
+  dentro del bloque (p. ej. para hacer EXPLAIN de lo que de verdad emite la aplicación).
+
+Notas:
+- Por defecto el registro está deshabilitado y los timers devuelven un context manager nulo,
+  por lo que el coste en el camino caliente es una comprobación de atributo.
+- Se habilita con la variable de entorno `INVENTORY_METRICS` (`log`, `memory` o
+  `jsonl:/ruta/metricas.jsonl`) o llamando a `registry.configure(sink)`.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("inventory.metrics")
+
+# Operación activa (un dict con contadores SQL) para atribuir las sentencias al timer actual
+_current_span = ContextVar("inventory_metrics_span", default=None)
+# Lista activa de `registry.capture_sql()` (solo en el contexto que la abrió)
+_current_capture = ContextVar("inventory_metrics_capture", default=None)
+
+
+class MemorySink:
+    """Guarda los registros en una lista (útil en tests)."""
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def clear(self):
+        self.records.clear()
+
+
+class LogSink:
+    """Envía cada registro al logger `inventory.metrics` con nivel INFO."""
+
+    def __init__(self, log=None):
+        self.log = log or logger
+
+    def emit(self, record):
+        self.log.info("metric %s", json.dumps(record, default=str, ensure_ascii=False))
+
+
+class JsonLinesSink:
+    """Añade cada registro como una línea JSON al archivo `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+class _NullTimer:
+    """Context manager que no hace nada; se usa cuando las métricas están deshabilitadas."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, name, fields):
+        self.registry = registry
+        self.span = {'metric': name, 'sql_count': 0, 'sql_ms': 0.0}
+        self.span.update(fields)
+        self._token = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span)
+        self._start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = (time.perf_counter() - self._start) * 1000.0
+        _current_span.reset(self._token)
+        self.span['duration_ms'] = round(elapsed, 3)
+        self.span['sql_ms'] = round(self.span['sql_ms'], 3)
+        if exc_type is not None:
+            self.span['error'] = exc_type.__name__
+        parent = _current_span.get()
+        if parent is not None:
+            # Las sentencias de una operación anidada también cuentan para la operación padre
+            parent['sql_count'] += self.span['sql_count']
+            parent['sql_ms'] += self.span['sql_ms']
+        self.registry.record(self.span)
+        return False
+
+
+class MetricsRegistry:
+    """Registro de métricas con estadísticas agregadas y un sink opcional.
+
+    `stats` agrega por nombre de métrica (count/total_ms/max_ms) y `sql_stats` por texto de
+    sentencia SQL, lo que permite localizar las sentencias más lentas de una ejecución.
+    """
+
+    def __init__(self, sink=None):
+        self._lock = threading.Lock()
+        self.sink = None
+        self.enabled = False
+        self.stats = {}
+        self.sql_stats = {}
+        if sink is not None:
+            self.configure(sink)
+
+    def configure(self, sink):
+        """Habilita el registro enviando cada medición a `sink` (objeto con `emit(record)`)."""
+        self.sink = sink
+        self.enabled = True
+
+    def disable(self):
+        self.sink = None
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.sql_stats = {}
+
+    def timer(self, name, **fields):
+        """Context manager que mide la operación `name`; devuelve el dict del registro."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, fields)
+
+    def record(self, record):
+        name = record['metric']
+        duration = record.get('duration_ms', 0.0)
+        with self._lock:
+            st = self.stats.get(name)
+            if st is None:
+                st = self.stats[name] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'sql_count': 0}
+            st['count'] += 1
+            st['total_ms'] += duration
+            st['max_ms'] = max(st['max_ms'], duration)
+            st['sql_count'] += record.get('sql_count', 0)
+        sink = self.sink
+        if sink is not None:
+            try:
+                sink.emit(record)
+            except Exception:
+                # Un sink defectuoso nunca debe romper la operación medida
+                logger.exception("Error emitiendo métrica %s", name)
+
+    @contextmanager
+    def capture_sql(self):
+        """Recoge `(operación, sentencia, parámetros)` de cada sentencia instrumentada del bloque.
+
+        `operación` es el timer activo (o None). Como los contadores SQL, solo funciona con el
+        registro habilitado; las sentencias `executemany` se recogen sin parámetros.
+        """
+        captured = []
+        token = _current_capture.set(captured)
+        try:
+            yield captured
+        finally:
+            _current_capture.reset(token)
+
+    def record_sql(self, statement, duration_ms, parameters=None):
+        captured = _current_capture.get()
+        span = _current_span.get()
+        if captured is not None:
+            captured.append((span['metric'] if span is not None else None, statement, parameters))
+        if span is not None:
+            span['sql_count'] += 1
+            span['sql_ms'] += duration_ms
+        with self._lock:
+            st = self.sql_stats.get(statement)
+            if st is None:
+                st = self.sql_stats[statement] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            st['count'] += 1
+            st['total_ms'] += duration_ms
+            st['max_ms'] = max(st['max_ms'], duration_ms)
+
+    def snapshot(self):
+        """Copia de las estadísticas agregadas por métrica."""
+        with self._lock:
+            return {k: dict(v) for k, v in self.stats.items()}
+
+    def slowest_statements(self, limit=10):
+        """Devuelve las sentencias SQL con mayor tiempo máximo como lista de (sql, stats)."""
+        with self._lock:
+            items = [(k, dict(v)) for k, v in self.sql_stats.items()]
+        items.sort(key=lambda kv: kv[1]['max_ms'], reverse=True)
+        return items[:limit]
+
+
+def sink_from_spec(spec):
+    """Crea un sink a partir de una especificación de texto (`log`, `memory`, `jsonl:<ruta>`)."""
+    if not spec:
+        return None
+    spec = spec.strip()
+    if spec.lower() in ('0', 'off', 'false', 'none'):
+        return None
+    if spec.lower() in ('1', 'log', 'true', 'on'):
+        return LogSink()
+    if spec.lower() == 'memory':
+        return MemorySink()
+    if spec.lower().startswith('jsonl:'):
+        return JsonLinesSink(spec[len('jsonl:'):])
+    raise ValueError(f"Sink de métricas desconocido: {spec}")
+
+
+registry = MetricsRegistry(sink_from_spec(os.getenv("INVENTORY_METRICS")))
+
+
+def timed(name):
+    """Decorador que mide cada llamada a la función con `registry.timer(name)`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            with registry.timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine, metrics=None):
+    """Registra listeners en `engine` para contar y cronometrar cada sentencia SQL."""
+    from sqlalchemy import event
+
+    metrics = metrics or registry
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if metrics.enabled:
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        elapsed = (time.perf_counter() - starts.pop()) * 1000.0
+        metrics.record_sql(statement, elapsed, None if executemany else parameters)
+
+    def _error(exception_context):
+        # Descartar el inicio pendiente si la sentencia falló
+        conn = exception_context.connection
+        starts = conn.info.get('metrics_query_start') if conn is not None else None
+        if starts:
+            starts.pop()
+
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _error)
+    return engine
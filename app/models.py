@@ -1,17 +1,43 @@
 """Modelos de datos (SQLAlchemy).
 
-Contiene la clase Product que refleja la tabla `productos`.
+Contiene la clase Product que refleja la tabla `productos`, Category (`categorias`) y SyncToken
+(`sync_tokens`, entradas de réplicas locales ya aplicadas en el central).
 Notas:
-- `tipo` es NOT NULL y debe contener una categoría válida (capturada por la UI).
+- La categoría se guarda en `categorias` y `productos.tipo_id` la referencia con un entero pequeño.
+  `Product.tipo` sigue devolviendo el nombre (también usable en consultas); para asignarla use
+  `tipo_id` (el repositorio resuelve nombres con `app.categories.category_id`).
 - `Fecha_Vencimiento` es obligatoria (Date), `Fecha_Registro` usa `date.today` por defecto.
+- `Fecha_Modificacion` la fija la base de datos (`now()`) en cada INSERT/UPDATE, también en los
+  UPDATE masivos; está indexada para consultar solo las filas cambiadas.
+- `version` es el contador de control de concurrencia optimista (`version_id_col`): cada UPDATE
+  lo incrementa y falla con `StaleDataError` si otro terminal guardó antes.
+- `stock_minimo` (umbral de reposición) puede fijarse por categoría y, con prioridad, por
+  producto; NULL en el producto usa el de su categoría. Los índices (tipo_id, cantidad) y
+  (stock_minimo, cantidad) permiten buscar productos por debajo del umbral sin recorrer la tabla
+  (ver `app.stock_alerts`).
+- `sync_tokens` solo se usa en el central (ver `app.local_replica`); la réplica local no la crea.
 - Cambios de esquema deben manejarse mediante Alembic para mantener historial de migraciones.
 """
 
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Date, DateTime, Float
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DateTime, Float, ForeignKey, Index, func, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
+
+# SMALLINT en MySQL; en SQLite debe ser INTEGER para que la clave primaria sea autoincremental
+CategoryId = SmallInteger().with_variant(Integer(), 'sqlite')
+
+
+class Category(Base):
+    __tablename__ = 'categorias'
+    id = Column(CategoryId, primary_key=True)
+    nombre = Column(String(255), nullable=False, unique=True)
+    # Umbral de reposición para los productos de la categoría (NULL = sin alerta)
+    stock_minimo = Column(Integer, nullable=True)
+
+
 class Product(Base):
     __tablename__ = 'productos'
     id = Column(Integer, primary_key=True)
@@ -20,11 +46,47 @@ class Product(Base):
     descripcion = Column(String(100), nullable=True)
     cantidad = Column(Integer, default=0)
     Marca= Column(String(15), nullable=True)
-    # `tipo` es requerido; la UI debe garantizar su presencia
-    tipo = Column(String(255), nullable=False, default='')
+    # Categoría (requerida); se carga junto al producto con un JOIN a la tabla pequeña `categorias`
+    # (indexada junto a `cantidad` por ix_productos_tipo_id_cantidad)
+    tipo_id = Column(CategoryId, ForeignKey('categorias.id'), nullable=False)
+    categoria = relationship(Category, lazy='joined', innerjoin=True)
     # Precio en unidades monetarias (float)
     precio = Column(Float, default=0.0)
-    # Fecha de vencimiento (obligatoria)
-    Fecha_Vencimiento = Column(Date, nullable=False)
+    # Fecha de vencimiento (obligatoria); indexada para "Eliminar vencidos" (rango `< hoy`)
+    Fecha_Vencimiento = Column(Date, nullable=False, index=True)
     # Fecha de registro (solo fecha, sin hora)
     Fecha_Registro = Column(Date, default=date.today)
+    # Última modificación según el reloj del servidor (marca de agua para exportaciones delta)
+    Fecha_Modificacion = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)
+    # Contador de versión para concurrencia optimista (lo gestiona SQLAlchemy)
+    version = Column(Integer, nullable=False, default=1)
+    # Umbral de reposición propio (NULL = usar el de la categoría)
+    stock_minimo = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('ix_productos_tipo_id_cantidad', 'tipo_id', 'cantidad'),
+        Index('ix_productos_stock_minimo_cantidad', 'stock_minimo', 'cantidad'),
+    )
+    # Sin eager_defaults: `Fecha_Modificacion` (now() del servidor) queda sin cargar tras un UPDATE
+    # y se lee solo si se accede a ella; las escrituras no pagan un SELECT extra por fila
+    __mapper_args__ = {"version_id_col": version}
+
+    @hybrid_property
+    def tipo(self):
+        """Nombre de la categoría del producto."""
+        return self.categoria.nombre if self.categoria is not None else ''
+
+    @tipo.inplace.expression
+    @classmethod
+    def _tipo_expression(cls):
+        return select(Category.nombre).where(Category.id == cls.tipo_id).scalar_subquery()
+
+
+class SyncToken(Base):
+    # Token de cada entrada del outbox de una réplica local ya aplicada en el central: un reintento
+    # del mismo lote no la aplica dos veces. `SyncWorker` purga periódicamente los antiguos.
+    __tablename__ = 'sync_tokens'
+    token = Column(String(32), primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    # Reloj del servidor central (misma fuente que la fecha de corte de la purga)
+    created_at = Column(DateTime, nullable=False, default=func.now(), index=True)
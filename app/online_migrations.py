@@ -0,0 +1,176 @@
+"""Migraciones de datos en línea: rellenos (backfills) por lotes sobre tablas grandes.
+
+Añadir una columna con `server_default` y luego alterarla (como en `a1b2c3d4e5f6`) reescribe o
+bloquea `productos` en una sola transacción larga. Para tablas grandes el patrón es:
+
+1) Migración A: añadir la columna *nullable* y sin default (en MySQL 8 es un cambio INSTANT).
+2) Rellenarla con `backfill()`: UPDATEs por rangos de `id`, cada lote en su propia transacción
+   corta, con pausas entre lotes y progreso guardado en `migration_progress`, de modo que se
+   puede interrumpir y reanudar sin repetir el trabajo hecho.
+3) Migración B (cuando no queden NULL): `NOT NULL`, índices, etc.
+
+Desde una revisión de Alembic::
+
+    from app.online_migrations import backfill
+
+    def upgrade():
+        op.add_column('productos', sa.Column('stock_minimo', sa.Integer(), nullable=True))
+        productos = sa.table('productos', sa.column('id'), sa.column('stock_minimo'))
+        with op.get_context().autocommit_block():
+            backfill(op.get_bind(), productos, {'stock_minimo': 0},
+                     where=productos.c.stock_minimo.is_(None), job='productos.stock_minimo')
+
+Notas:
+- El UPDATE debe ser idempotente (p. ej. filtrar por `IS NULL`): si el proceso muere entre el
+  UPDATE de un lote y el registro del progreso, ese lote se vuelve a aplicar.
+- Con un `Engine` cada lote va en `engine.begin()`; con una `Connection` esta no debe tener una
+  transacción abierta (en Alembic, usar `autocommit_block()`).
+- `migration_progress` no forma parte de `Base.metadata`; se crea al primer uso.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import time
+import traceback
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Integer, MetaData, String, Table, func, select, update,
+)
+from sqlalchemy.engine import Engine
+
+try:
+    from app.metrics import registry as metrics
+except ModuleNotFoundError:
+    try:
+        from metrics import registry as metrics
+    except Exception:
+        traceback.print_exc()
+        raise
+
+PROGRESS_TABLE = 'migration_progress'
+
+_progress_metadata = MetaData()
+migration_progress = Table(
+    PROGRESS_TABLE, _progress_metadata,
+    Column('job', String(128), primary_key=True),
+    Column('last_id', Integer, nullable=False, default=0),
+    Column('max_id', Integer, nullable=True),
+    Column('rows_done', Integer, nullable=False, default=0),
+    Column('done', Boolean, nullable=False, default=False),
+    Column('updated_at', DateTime, nullable=True),
+)
+
+# job, last_id (último id procesado), max_id, rows (filas actualizadas en total), batches y
+# rows_per_sec (de esta ejecución), done
+BackfillProgress = namedtuple('BackfillProgress', ['job', 'last_id', 'max_id', 'rows', 'batches', 'rows_per_sec', 'done'])
+
+
+@contextmanager
+def _transaction(bind):
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            yield conn
+        return
+    if bind.in_transaction():
+        raise ValueError("backfill necesita confirmar cada lote: use un Engine o una conexión sin "
+                         "transacción abierta (en Alembic, op.get_context().autocommit_block())")
+    with bind.begin():
+        yield bind
+
+
+def _load_state(bind, job, reset):
+    with _transaction(bind) as conn:
+        migration_progress.create(conn, checkfirst=True)
+        if reset:
+            conn.execute(migration_progress.delete().where(migration_progress.c.job == job))
+        row = conn.execute(select(migration_progress).where(migration_progress.c.job == job)).first()
+        if row is None:
+            conn.execute(migration_progress.insert().values(job=job, last_id=0, rows_done=0, done=False))
+            return {'last_id': 0, 'max_id': None, 'rows_done': 0, 'done': False}
+        return dict(row._mapping)
+
+
+def job_status(bind, job):
+    """Devuelve el estado guardado de `job` (dict) o None si nunca se ejecutó."""
+    with _transaction(bind) as conn:
+        migration_progress.create(conn, checkfirst=True)
+        row = conn.execute(select(migration_progress).where(migration_progress.c.job == job)).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def backfill(bind, table, values, where=None, job=None, key='id', batch_size=1000, pause=0.1,
+             max_batch_seconds=None, progress=None, reset=False):
+    """Apply ``UPDATE table SET values`` in id-ranged batches, each in its own short transaction.
+
+    - table: a Table, a lightweight ``sa.table(...)`` or a mapped class.
+    - values: dict of column -> value or SQL expression.
+    - where: optional extra condition (keep it idempotent, e.g. ``col IS NULL``).
+    - job: name under which progress is stored; an interrupted job resumes after its
+      last committed batch and a finished one returns immediately (``reset=True`` starts over).
+    - pause: seconds to sleep between batches so replicas and other sessions catch up.
+    - max_batch_seconds: if a batch takes longer, the batch size is halved (and grown back
+      towards ``batch_size`` while batches stay fast).
+    - progress: callable receiving a ``BackfillProgress`` after every batch.
+
+    Returns the final ``BackfillProgress``.
+    """
+    table = getattr(table, '__table__', table)
+    job = job or f"{table.name}.backfill"
+    id_col = table.c[key]
+    state = _load_state(bind, job, reset)
+    last_id, rows, max_id = state['last_id'], state['rows_done'], state['max_id']
+    if state['done']:
+        return BackfillProgress(job, last_id, max_id, rows, 0, 0.0, True)
+
+    if max_id is None:
+        # Las filas insertadas después del inicio ya las escribe la aplicación con el valor nuevo
+        with _transaction(bind) as conn:
+            max_id = conn.execute(select(func.max(id_col))).scalar() or 0
+            conn.execute(update(migration_progress).where(migration_progress.c.job == job)
+                         .values(max_id=max_id))
+
+    size = batch_size
+    batches = 0
+    resumed_rows = rows
+    started = time.perf_counter()
+    while last_id < max_id:
+        upper = min(last_id + size, max_id)
+        cond = (id_col > last_id) & (id_col <= upper)
+        if where is not None:
+            cond = cond & where
+        t0 = time.perf_counter()
+        with metrics.timer("migration.batch", job=job, batch_size=size) as span:
+            with _transaction(bind) as conn:
+                count = conn.execute(update(table).where(cond).values(values)).rowcount
+                rows += max(count or 0, 0)
+                conn.execute(update(migration_progress).where(migration_progress.c.job == job)
+                             .values(last_id=upper, rows_done=rows, done=upper >= max_id,
+                                     updated_at=datetime.now()))
+            if span is not None:
+                span['rows'] = count
+        elapsed = time.perf_counter() - t0
+        last_id = upper
+        batches += 1
+
+        if max_batch_seconds is not None:
+            if elapsed > max_batch_seconds and size > 1:
+                size = max(1, size // 2)
+            elif elapsed < max_batch_seconds / 4 and size < batch_size:
+                size = min(batch_size, size * 2)
+
+        if progress is not None:
+            total = time.perf_counter() - started
+            progress(BackfillProgress(job, last_id, max_id, rows, batches,
+                                      (rows - resumed_rows) / total if total > 0 else 0.0, last_id >= max_id))
+        if pause and last_id < max_id:
+            time.sleep(pause)
+
+    if batches == 0:
+        # tabla vacía: marcar como terminado
+        with _transaction(bind) as conn:
+            conn.execute(update(migration_progress).where(migration_progress.c.job == job)
+                         .values(done=True, updated_at=datetime.now()))
+    total = time.perf_counter() - started
+    rate = (rows - resumed_rows) / total if total > 0 else 0.0
+    return BackfillProgress(job, last_id, max_id, rows, batches, rate, True)
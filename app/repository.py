@@ -2,26 +2,110 @@
 
 Esta capa encapsula sesiones y transacciones. Use las funciones `*_safe` cuando quiera que
 el wrapper maneje la apertura/cierre de sesiones automáticamente.
+Las sesiones propias se obtienen con `new_session()`, que usa la réplica local si está
+configurada (`LOCAL_REPLICA_PATH`) y el servidor central en caso contrario.
+Las lecturas (`list_products`, `get_product`, `iter_products`, `count_products`) usan `new_read_session()`, que
+con `DATABASE_REPLICA_URLS` va a una réplica de lectura (ver `app.db.read_session`); si la
+réplica no responde se repite la consulta en el primario.
+Para agrupar varias altas, cambios y bajas en una sola transacción use `UnitOfWork`.
+Tras `commit()` no se vuelve a leer la fila (`refresh`) si la sesión no expira sus objetos
+(`expire_on_commit=False`, como en los wrappers `*_safe` y en `UnitOfWork`); solo
+`Fecha_Modificacion`, que fija la base, queda sin cargar tras un UPDATE (y tras un INSERT en
+backends sin RETURNING, como MySQL).
 """
 
 from datetime import date
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import update, delete, func, case, select, event
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
 import traceback
 # Import Product and SessionLocal, support running module directly whether executed as package or script
 try:
-    from app.models import Product
-    from app.db import SessionLocal
+    from app.models import Product, Category
+    from app.db import SessionLocal, read_session
+    from app.metrics import timed, registry as metrics
+    from app.local_replica import get_local_replica
+    from app.categories import category, category_id
 except ModuleNotFoundError:
     try:
-        from models import Product
-        from db import SessionLocal
+        from models import Product, Category
+        from db import SessionLocal, read_session
+        from metrics import timed, registry as metrics
+        from local_replica import get_local_replica
+        from categories import category, category_id
     except Exception:
         traceback.print_exc()
         raise
 
+
+class InsufficientStockError(ValueError):
+    """Raised when a stock adjustment would leave `cantidad` below zero."""
+
+
+class StaleProductError(RuntimeError):
+    """Raised when a product was saved by someone else since it was read.
+
+    `current` holds the latest stored Product (None if it was deleted) so the caller can
+    reload or merge the user's changes.
+    """
+
+    def __init__(self, product_id, current=None):
+        if product_id is None:
+            super().__init__("Uno o más productos fueron modificados por otro usuario")
+        else:
+            super().__init__(f"El producto {product_id} fue modificado por otro usuario")
+        self.product_id = product_id
+        self.current = current
+
+
+def new_session():
+    """Open a session on the local replica when configured, otherwise on the central database."""
+    replica = get_local_replica()
+    if replica is not None:
+        return replica.SessionLocal()
+    return SessionLocal()
+
+
+def _write_session():
+    # Los wrappers devuelven objetos ya desconectados: que no expiren al confirmar evita el refresh
+    session = new_session()
+    session.expire_on_commit = False
+    return session
+
+
+def new_read_session():
+    """Open a session for read-only queries: the local replica when configured, otherwise a
+    read replica (or the primary right after a local write, see `app.db.read_session`)."""
+    replica = get_local_replica()
+    if replica is not None:
+        return replica.SessionLocal()
+    return read_session()
+
+
+def _read(query, session=None):
+    """Run `query(session)` on `session` or on a temporary read session.
+
+    If a read replica is unreachable the query is retried once on the primary.
+    """
+    if session is not None:
+        return query(session)
+    session = new_read_session()
+    try:
+        return query(session)
+    except OperationalError:
+        if not session.info.get('read_replica'):
+            raise
+        traceback.print_exc()
+    finally:
+        session.close()
+    session = SessionLocal()
+    try:
+        return query(session)
+    finally:
+        session.close()
+
 # Insertar productos
-def insert_product(session, name, tipo, descripcion=None, cantidad=0, Marca=None, Fecha_Vencimiento=None, precio=0.0):
-    """Insert a product. `tipo` is required. `precio` is a numeric value (default 0.0)."""
+def _new_product(session, name, tipo, descripcion=None, cantidad=0, Marca=None, Fecha_Vencimiento=None, precio=0.0):
     # Validación sencilla del campo 'tipo'
     if tipo is None or str(tipo).strip() == "":
         raise ValueError("El campo 'tipo' es obligatorio")
@@ -33,20 +117,31 @@ def insert_product(session, name, tipo, descripcion=None, cantidad=0, Marca=None
         precio = float(precio)
     except Exception:
         precio = 0.0
-    # Nota: la llamada a session.commit() sigue el patrón explícito; en caso de error se realiza rollback
-    prod = Product(
+    # la categoría como objeto (sin SELECT si su id está en caché): los productos devueltos
+    # sin refresh deben poder leer `tipo`
+    cat = category(session, tipo)
+    return Product(
         name=name,
-        tipo=tipo,
+        tipo_id=cat.id,
+        categoria=cat,
         descripcion=descripcion,
         cantidad=cantidad,
         Marca=Marca,
         precio=precio,
         Fecha_Vencimiento=Fecha_Vencimiento
     )
+
+
+@timed("repository.insert_product")
+def insert_product(session, name, tipo, descripcion=None, cantidad=0, Marca=None, Fecha_Vencimiento=None, precio=0.0):
+    """Insert a product. `tipo` (category name) is required. `precio` is a numeric value (default 0.0)."""
+    prod = _new_product(session, name, tipo, descripcion, cantidad, Marca, Fecha_Vencimiento, precio)
+    # Nota: la llamada a session.commit() sigue el patrón explícito; en caso de error se realiza rollback
     try:
         session.add(prod)
         session.commit()
-        session.refresh(prod)
+        if session.expire_on_commit:
+            session.refresh(prod)
         return prod
     except IntegrityError:
         session.rollback()
@@ -56,35 +151,50 @@ def insert_product(session, name, tipo, descripcion=None, cantidad=0, Marca=None
         raise
 
 def insert_product_safe(**kwargs):
-    session = SessionLocal()
+    session = _write_session()
     try:
         return insert_product(session, **kwargs)
     finally:
         session.close()
 
 # Listar productos
+@timed("repository.list_products")
 def list_products(session=None):
-    """Return all products ordered by id. If session is None a temporary session is used."""
-    own = False
-    if session is None:
-        session = SessionLocal()
-        own = True
-    try:
-        return session.query(Product).order_by(Product.id).all()
-    finally:
-        if own:
-            session.close()
+    """Return all products ordered by id. If session is None a temporary read session is used."""
+    return _read(lambda s: s.query(Product).order_by(Product.id).all(), session)
 
 # Editar producto
-def update_product(session, product_id, **fields):
+@timed("repository.update_product")
+def update_product(session, product_id, expected_version=None, **fields):
     """Update a product by id.
 
     `fields` can include any attribute present on the model. Only attributes that
     exist on the mapped `Product` are set; this prevents accidental creation of new attributes.
+    If `expected_version` is given (the `version` the caller read) and the stored row has moved on,
+    StaleProductError is raised instead of overwriting the other user's changes.
     """
     prod = session.get(Product, product_id)
     if not prod:
         return None
+    _apply_fields(session, prod, expected_version, fields)
+    try:
+        session.commit()
+        if session.expire_on_commit:
+            session.refresh(prod)
+        return prod
+    except StaleDataError:
+        # Otro terminal guardó entre nuestra lectura y el UPDATE (la versión ya no coincide)
+        session.rollback()
+        current = session.get(Product, product_id, populate_existing=True)
+        raise StaleProductError(product_id, current)
+    except Exception:
+        session.rollback()
+        raise
+
+
+def _apply_fields(session, prod, expected_version, fields):
+    if expected_version is not None and prod.version != expected_version:
+        raise StaleProductError(prod.id, prod)
     if 'Fecha_Vencimiento' in fields and isinstance(fields['Fecha_Vencimiento'], str):
         fields['Fecha_Vencimiento'] = date.fromisoformat(fields['Fecha_Vencimiento'])
     if 'precio' in fields:
@@ -92,32 +202,37 @@ def update_product(session, product_id, **fields):
             fields['precio'] = float(fields['precio'])
         except Exception:
             fields['precio'] = prod.precio or 0.0
+    if 'tipo' in fields:
+        # `tipo` es el nombre de la categoría; se guarda como referencia a `categorias` y se
+        # asigna también la relación (si no, `categoria` y `tipo` seguirían con la anterior)
+        cat = category(session, fields.pop('tipo'))
+        fields['tipo_id'] = cat.id
+        prod.categoria = cat
+    elif 'tipo_id' in fields and fields['tipo_id'] != prod.tipo_id:
+        # Cambiar solo `tipo_id` dejaría cargada la categoría anterior en `categoria` (y en `tipo`)
+        prod.categoria = session.get(Category, fields['tipo_id'])
     for k, v in fields.items():
-        # Solo asignar si existe el atributo en el modelo
+        # Solo asignar si existe el atributo en el modelo; `id` y `version` no se asignan a mano
+        if k in ('id', 'version', 'categoria'):
+            continue
         if hasattr(prod, k):
             setattr(prod, k, v)
-    try:
-        session.commit()
-        session.refresh(prod)
-        return prod
-    except Exception:
-        session.rollback()
-        raise
 
 def update_product_safe(product_id, **fields):
-    session = SessionLocal()
+    session = _write_session()
     try:
         return update_product(session, product_id, **fields)
     finally:
         session.close()
 
 # Eliminar producto
+@timed("repository.delete_product")
 def delete_product(product_id, session=None):
     """Delete product by id. If session is None, opens and closes a session automatically.
     Returns True if deleted, False if not found."""
     own_session = False
     if session is None:
-        session = SessionLocal()
+        session = new_session()
         own_session = True
     try:
         prod = session.get(Product, product_id)
@@ -134,19 +249,435 @@ def delete_product(product_id, session=None):
             session.close()
 
 
+@timed("repository.list_products")
 def list_products(session=None):
-    """Return list of Product objects. Opens/closes session automatically if none provided."""
+    """Return list of Product objects. Opens/closes a read session automatically if none provided."""
+    return _read(lambda s: s.query(Product).order_by(Product.id).all(), session)
+
+
+@timed("repository.get_product")
+def get_product(product_id, session=None):
+    """Return the Product with `product_id` or None. Uses a read session if none is provided."""
+    return _read(lambda s: s.get(Product, product_id), session)
+
+
+@timed("repository.count_products")
+def count_products(session=None):
+    """Return the number of products (e.g. the expected total of an export)."""
+    return _read(lambda s: s.query(func.count(Product.id)).scalar(), session)
+
+
+def iter_products(session=None, chunk_size=1000):
+    """Yield products ordered by id, fetching `chunk_size` rows at a time.
+
+    Intended for streaming exports: memory use stays bounded by the chunk size. If session is
+    None a temporary read session is used and closed once the generator is exhausted or closed.
+    """
     own_session = False
     if session is None:
-        session = SessionLocal()
+        session = new_read_session()
         own_session = True
     try:
-        return session.query(Product).order_by(Product.id).all()
+        for prod in session.query(Product).order_by(Product.id).yield_per(chunk_size):
+            yield prod
     finally:
         if own_session:
             session.close()
 
 
+# Operaciones masivas: una sola sentencia SQL por acción (también incrementan `version`)
+def _bulk_values(session, fields):
+    """Normalize `fields` for a set-based UPDATE. Unknown or primary-key columns are rejected."""
+    columns = Product.__table__.columns
+    values = {}
+    for k, v in fields.items():
+        if k == 'tipo':
+            values['tipo_id'] = category_id(session, v)
+            continue
+        if k not in columns or columns[k].primary_key:
+            raise ValueError(f"Campo desconocido para actualización masiva: {k}")
+        if k == 'Fecha_Vencimiento' and isinstance(v, str):
+            v = date.fromisoformat(v)
+        if k == 'precio':
+            v = float(v)
+        values[k] = v
+    return values
+
+
+# Sentencias de las operaciones masivas: las funciones de abajo las ejecutan y
+# `app.diagnostics` las analiza con EXPLAIN sin ejecutarlas
+def update_products_statement(product_ids, values):
+    """UPDATE issued by `update_products` for already normalized `values`."""
+    return (update(Product).where(Product.id.in_(list(product_ids)))
+            .values(**values, version=Product.version + 1))
+
+
+def adjust_prices_statement(factor, product_ids=None, tipo_id=None):
+    """UPDATE issued by `adjust_prices` (`factor` = 1 + percent / 100)."""
+    stmt = update(Product).values(precio=func.round(Product.precio * factor, 2), version=Product.version + 1)
+    if product_ids is not None:
+        stmt = stmt.where(Product.id.in_(list(product_ids)))
+    if tipo_id is not None:
+        stmt = stmt.where(Product.tipo_id == tipo_id)
+    return stmt
+
+
+def delete_products_statement(product_ids):
+    """DELETE issued by `delete_products`."""
+    return delete(Product).where(Product.id.in_(list(product_ids)))
+
+
+def delete_where_statement(tipo_id=None, expired_before=None):
+    """DELETE issued by `delete_products_where` (`expired_before` as a date)."""
+    stmt = delete(Product)
+    if tipo_id is not None:
+        stmt = stmt.where(Product.tipo_id == tipo_id)
+    if expired_before is not None:
+        stmt = stmt.where(Product.Fecha_Vencimiento < expired_before)
+    return stmt
+
+
+def adjust_stock_statement(product_id, delta, allow_negative=False):
+    """UPDATE issued by `adjust_stock`; only matches if the result stays >= 0 (unless allowed)."""
+    new_qty = func.coalesce(Product.cantidad, 0) + delta
+    stmt = (update(Product)
+            .where(Product.id == product_id)
+            .values(cantidad=new_qty, version=Product.version + 1)
+            .execution_options(stock_adjustment=True, allow_negative=allow_negative))
+    if delta < 0 and not allow_negative:
+        stmt = stmt.where(new_qty >= 0)
+    return stmt
+
+
+def _execute_bulk(session, stmt):
+    try:
+        result = session.execute(stmt.execution_options(synchronize_session=False))
+        session.commit()
+        return result.rowcount
+    except Exception:
+        session.rollback()
+        raise
+
+
+@timed("repository.update_products")
+def update_products(session, product_ids, **fields):
+    """Set the same `fields` on every product in `product_ids` with one UPDATE ... WHERE id IN (...).
+
+    Returns the number of affected rows.
+    """
+    ids = list(product_ids)
+    values = _bulk_values(session, fields)
+    if not ids or not values:
+        return 0
+    return _execute_bulk(session, update_products_statement(ids, values))
+
+
+@timed("repository.adjust_prices")
+def adjust_prices(session, percent, product_ids=None, tipo=None):
+    """Change `precio` by `percent` (e.g. 10 = +10%, -5 = -5%) in a single UPDATE.
+
+    Applies to `product_ids` and/or all products of `tipo`; at least one filter is required.
+    Returns the number of affected rows.
+    """
+    if product_ids is None and tipo is None:
+        raise ValueError("Indique productos o un tipo para ajustar precios")
+    factor = 1 + float(percent) / 100.0
+    if factor < 0:
+        raise ValueError("El porcentaje no puede dejar precios negativos")
+    ids = tipo_id = None
+    if product_ids is not None:
+        ids = list(product_ids)
+        if not ids:
+            return 0
+    if tipo is not None:
+        tipo_id = category_id(session, tipo, create=False)
+        if tipo_id is None:
+            return 0
+    return _execute_bulk(session, adjust_prices_statement(factor, ids, tipo_id))
+
+
+@timed("repository.delete_products")
+def delete_products(session, product_ids):
+    """Delete every product in `product_ids` with one DELETE. Returns the number of deleted rows."""
+    ids = list(product_ids)
+    if not ids:
+        return 0
+    return _execute_bulk(session, delete_products_statement(ids))
+
+
+@timed("repository.delete_products_where")
+def delete_products_where(session, tipo=None, expired_before=None):
+    """Delete products matching the filters (all given filters must match).
+
+    - `tipo`: category name.
+    - `expired_before`: `Fecha_Vencimiento` strictly before this date (date or ISO string).
+    At least one filter is required. Returns the number of deleted rows.
+    """
+    if tipo is None and expired_before is None:
+        raise ValueError("Indique al menos un filtro para eliminar productos")
+    tipo_id = None
+    if tipo is not None:
+        tipo_id = category_id(session, tipo, create=False)
+        if tipo_id is None:
+            return 0
+    if isinstance(expired_before, str):
+        expired_before = date.fromisoformat(expired_before)
+    return _execute_bulk(session, delete_where_statement(tipo_id, expired_before))
+
+
+# Ajuste atómico de stock: SET cantidad = cantidad + :delta sin leer la fila antes
+def _aggregate_deltas(deltas):
+    items = deltas.items() if hasattr(deltas, 'items') else deltas
+    totals = {}
+    for pid, delta in items:
+        totals[pid] = totals.get(pid, 0) + int(delta)
+    return totals
+
+
+@timed("repository.adjust_stock")
+def adjust_stock(session, product_id, delta, allow_negative=False):
+    """Add `delta` (negative for a sale) to `cantidad` with a single UPDATE.
+
+    Unless `allow_negative` is True the UPDATE only matches when the result stays >= 0, so two
+    terminals selling the same item can never oversell nor lose each other's update.
+    Returns True if applied, False if the product does not exist.
+    Raises InsufficientStockError if there is not enough stock.
+    """
+    stmt = adjust_stock_statement(product_id, int(delta), allow_negative)
+    if _execute_bulk(session, stmt):
+        return True
+    # Solo en el camino de error: distinguir producto inexistente de stock insuficiente
+    if session.execute(select(Product.id).where(Product.id == product_id)).first() is None:
+        return False
+    raise InsufficientStockError(f"Stock insuficiente para el producto {product_id}")
+
+
+@timed("repository.adjust_stock_many")
+def adjust_stock_many(session, deltas, allow_negative=False):
+    """Apply several stock deltas (`{id: delta}` or `(id, delta)` pairs) in one UPDATE.
+
+    All-or-nothing: if any product is missing or would go below zero nothing is changed.
+    Repeated ids are summed. Returns the number of updated rows.
+    """
+    totals = _aggregate_deltas(deltas)
+    if not totals:
+        return 0
+    ids = list(totals)
+    delta_expr = case(totals, value=Product.id, else_=0)
+    new_qty = func.coalesce(Product.cantidad, 0) + delta_expr
+    stmt = (update(Product)
+            .where(Product.id.in_(ids))
+            .values(cantidad=new_qty, version=Product.version + 1)
+            .execution_options(synchronize_session=False, stock_adjustment=True, allow_negative=allow_negative))
+    if not allow_negative and any(d < 0 for d in totals.values()):
+        stmt = stmt.where(new_qty >= 0)
+    try:
+        rowcount = session.execute(stmt).rowcount
+        if rowcount == len(ids):
+            session.commit()
+            return rowcount
+        session.rollback()
+    except Exception:
+        session.rollback()
+        raise
+    found = set(session.execute(select(Product.id).where(Product.id.in_(ids))).scalars())
+    missing = [pid for pid in ids if pid not in found]
+    if missing:
+        raise ValueError(f"Productos no encontrados: {missing}")
+    raise InsufficientStockError("Stock insuficiente para uno o más productos")
+
+
+@timed("repository.set_tipo_stock_minimo")
+def set_tipo_stock_minimo(session, tipo, stock_minimo):
+    """Set the reorder threshold of category `tipo` (None removes it).
+
+    Products with their own `stock_minimo` keep it; the rest use this value.
+    Returns the number of updated categories (0 if `tipo` does not exist).
+    """
+    cid = category_id(session, tipo, create=False)
+    if cid is None:
+        return 0
+    value = None if stock_minimo is None else int(stock_minimo)
+    if value is not None and value < 0:
+        raise ValueError("El stock mínimo no puede ser negativo")
+    return _execute_bulk(session, update(Category).where(Category.id == cid).values(stock_minimo=value))
+
+
+def _with_session(fn, *args, **kwargs):
+    session = _write_session()
+    try:
+        return fn(session, *args, **kwargs)
+    finally:
+        session.close()
+
+
+def update_products_safe(product_ids, **fields):
+    return _with_session(update_products, product_ids, **fields)
+
+
+def adjust_prices_safe(percent, product_ids=None, tipo=None):
+    return _with_session(adjust_prices, percent, product_ids=product_ids, tipo=tipo)
+
+
+def delete_products_safe(product_ids):
+    return _with_session(delete_products, product_ids)
+
+
+def delete_products_where_safe(tipo=None, expired_before=None):
+    return _with_session(delete_products_where, tipo=tipo, expired_before=expired_before)
+
+
+
+def adjust_stock_safe(product_id, delta, allow_negative=False):
+    return _with_session(adjust_stock, product_id, delta, allow_negative=allow_negative)
+
+
+def adjust_stock_many_safe(deltas, allow_negative=False):
+    return _with_session(adjust_stock_many, deltas, allow_negative=allow_negative)
+
+
+def set_tipo_stock_minimo_safe(tipo, stock_minimo):
+    # Las categorías se administran en el central (el outbox de la réplica local solo lleva
+    # productos); la réplica recibe el cambio en el siguiente refresco.
+    session = SessionLocal()
+    try:
+        return set_tipo_stock_minimo(session, tipo, stock_minimo)
+    finally:
+        session.close()
+
+
+class UnitOfWork:
+    """Agrupa altas, cambios y bajas de productos en una sola sesión y transacción.
+
+    Uso::
+
+        with UnitOfWork() as uow:
+            uow.add(name='Agua', tipo='Bebida', Fecha_Vencimiento='2030-01-01')
+            uow.update(5, expected_version=3, cantidad=10)
+            uow.delete(7)
+        # al salir sin error se confirma todo junto; con error se deshace todo
+
+    - Los cambios se envían en un único flush al confirmar (un INSERT por alta: el id
+      autoincremental se obtiene fila a fila) y los objetos no se releen tras el commit
+      (`expire_on_commit=False`); las categorías ya conocidas no se vuelven a consultar.
+    - `round_trips` cuenta las sentencias enviadas a la base durante la unidad de trabajo y
+      `operations` las operaciones registradas; ambos se emiten en la métrica
+      `repository.unit_of_work`.
+    - `get_many(ids)` carga varios productos con un solo SELECT; `update`/`delete` sobre esos
+      ids ya no vuelven a consultar.
+    """
+
+    def __init__(self, session=None):
+        self._own_session = session is None
+        self.session = session
+        self.round_trips = 0
+        self.operations = 0
+        self._conn = None
+        self._timer = None
+        self._span = None
+        # referencias fuertes: el identity map es débil y `get_many` debe evitar otro SELECT
+        self._loaded = []
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.round_trips += 1
+
+    def __enter__(self):
+        if self.session is None:
+            self.session = new_session()
+        self.session.expire_on_commit = False
+        self._timer = metrics.timer("repository.unit_of_work")
+        self._span = self._timer.__enter__()
+        self._attach()
+        return self
+
+    def _attach(self):
+        # Contar solo las sentencias de la conexión de esta sesión (no las de otros hilos)
+        if self._conn is None:
+            self._conn = self.session.connection()
+            event.listen(self._conn, "after_cursor_execute", self._count)
+
+    def _detach(self):
+        if self._conn is not None:
+            event.remove(self._conn, "after_cursor_execute", self._count)
+            self._conn = None
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.session.rollback()
+        finally:
+            self._close(exc_type, exc, tb)
+        return False
+
+    def _close(self, exc_type=None, exc=None, tb=None):
+        self._detach()
+        if self._span is not None:
+            self._span['round_trips'] = self.round_trips
+            self._span['operations'] = self.operations
+        if self._timer is not None:
+            self._timer.__exit__(exc_type, exc, tb)
+            self._timer = None
+        self._loaded = []
+        if self._own_session:
+            self.session.close()
+
+    def get_many(self, product_ids):
+        """Load several products with one SELECT (into the session's identity map)."""
+        ids = list(product_ids)
+        if not ids:
+            return []
+        self._attach()
+        with self.session.no_autoflush:
+            products = self.session.execute(select(Product).where(Product.id.in_(ids))).scalars().all()
+        self._loaded.extend(products)
+        return products
+
+    def add(self, name, tipo, **fields):
+        """Queue a new product (same arguments as `insert_product`). Its id is set on commit."""
+        self._attach()
+        prod = _new_product(self.session, name, tipo, **fields)
+        self.session.add(prod)
+        self.operations += 1
+        return prod
+
+    def update(self, product_id, expected_version=None, **fields):
+        """Queue changes to a product. Returns the product or None if it does not exist."""
+        self._attach()
+        with self.session.no_autoflush:
+            prod = self.session.get(Product, product_id)
+            if prod is None:
+                return None
+            _apply_fields(self.session, prod, expected_version, fields)
+        self.operations += 1
+        return prod
+
+    def delete(self, product_id):
+        """Queue the deletion of a product. Returns False if it does not exist."""
+        self._attach()
+        with self.session.no_autoflush:
+            prod = self.session.get(Product, product_id)
+            if prod is None:
+                return False
+            self.session.delete(prod)
+        self.operations += 1
+        return True
+
+    def commit(self):
+        """Flush and commit the queued changes (called automatically when the block exits)."""
+        try:
+            self.session.commit()
+        except StaleDataError:
+            self.session.rollback()
+            raise StaleProductError(None)
+        except Exception:
+            self.session.rollback()
+            raise
+        # la siguiente transacción (si la hay) puede usar otra conexión del pool
+        self._detach()
+
+
 if __name__ == "__main__":
 
     print("Repository utilities: insert_product, update_product, delete_product")
@@ -0,0 +1,253 @@
+"""Snapshot binario del inventario (`categorias` + `productos`) y restauración por lotes.
+
+Formato (versión `FORMAT_VERSION`):
+- Cabecera: `MAGIC` (8 bytes), versión del formato (uint16) y longitud (uint32) de un JSON con
+  la revisión de Alembic del esquema, la fecha y las columnas de cada tabla.
+- Bloques: `>BIII` (índice de tabla, filas, bytes, crc32) seguido del bloque comprimido con zlib.
+  Cada bloque es un JSON por columnas (`{columna: [valores...]}`) de hasta `chunk_rows` filas;
+  las fechas van en ISO 8601.
+- Marca de fin: un bloque con índice `END_MARKER`; sin ella el archivo se considera truncado.
+
+Notas:
+- La revisión guardada es la de `alembic_version` en la base de origen (o la cabecera del
+  proyecto si la base se creó con `create_all`). `restore_snapshot()` se niega a cargar un snapshot de otra
+  revisión salvo con `allow_revision_mismatch=True` (solo se cargan las columnas comunes).
+- `restore_snapshot()` carga todo en una transacción con INSERT multi-fila de `batch_size` filas; en MySQL
+  desactiva `foreign_key_checks`/`unique_checks` durante la carga. Los ids se conservan.
+- La base destino puede tener ya las categorías que siembra `alembic upgrade head`: con `productos`
+  vacía se reemplazan por las del snapshot.
+"""
+
+from datetime import date, datetime, timezone
+from pathlib import Path
+import json
+import struct
+import traceback
+import zlib
+
+from sqlalchemy import Date, DateTime, delete, func, inspect, select, text
+from sqlalchemy.engine import Engine
+
+try:
+    from app.models import Product, Category
+    from app.metrics import registry as metrics
+    from app.categories import clear_category_cache
+except ModuleNotFoundError:
+    try:
+        from models import Product, Category
+        from metrics import registry as metrics
+        from categories import clear_category_cache
+    except Exception:
+        traceback.print_exc()
+        raise
+
+MAGIC = b'INVSNAP\x00'
+FORMAT_VERSION = 1
+END_MARKER = 255
+CHUNK_ROWS = 5000
+BATCH_SIZE = 5000
+# Orden de carga (las claves foráneas apuntan a tablas anteriores)
+TABLES = [Category.__table__, Product.__table__]
+
+_HEADER = struct.Struct('>HI')
+_FRAME = struct.Struct('>BIII')
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class SnapshotError(RuntimeError):
+    pass
+
+
+def code_revision():
+    """Revisión cabecera de las migraciones del proyecto (None si Alembic no está disponible)."""
+    try:
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        return ScriptDirectory.from_config(Config(str(ROOT / 'alembic.ini'))).get_current_head()
+    except Exception:
+        return None
+
+
+def database_revision(conn):
+    """Revisión de `alembic_version` en la base; si no existe, la cabecera del proyecto."""
+    if inspect(conn).has_table('alembic_version'):
+        rev = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        if rev:
+            return rev
+    return code_revision()
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decoder(column):
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, Date):
+        return date.fromisoformat
+    return None
+
+
+def create_snapshot(bind, path, chunk_rows=CHUNK_ROWS, level=6):
+    """Write `categorias` and `productos` from `bind` (Engine or Connection) to `path`.
+
+    Returns a dict with the row count per table and the stored Alembic revision.
+    """
+    counts = {}
+    tmp = Path(str(path) + '.tmp')
+    with metrics.timer("snapshot.create") as span:
+        conn = bind.connect() if isinstance(bind, Engine) else bind
+        try:
+            revision = database_revision(conn)
+            header = {
+                'format': FORMAT_VERSION,
+                'alembic_revision': revision,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'codec': 'zlib',
+                'tables': [{'name': t.name, 'columns': [c.name for c in t.columns]} for t in TABLES],
+            }
+            raw_header = json.dumps(header).encode('utf-8')
+            with open(tmp, 'wb') as f:
+                f.write(MAGIC)
+                f.write(_HEADER.pack(FORMAT_VERSION, len(raw_header)))
+                f.write(raw_header)
+                for index, table in enumerate(TABLES):
+                    names = [c.name for c in table.columns]
+                    pk = list(table.primary_key.columns)
+                    result = conn.execution_options(stream_results=True).execute(select(table).order_by(*pk))
+                    counts[table.name] = 0
+                    for rows in result.partitions(chunk_rows):
+                        block = {name: [_encode(r[i]) for r in rows] for i, name in enumerate(names)}
+                        payload = zlib.compress(json.dumps(block, separators=(',', ':')).encode('utf-8'), level)
+                        f.write(_FRAME.pack(index, len(rows), len(payload), zlib.crc32(payload)))
+                        f.write(payload)
+                        counts[table.name] += len(rows)
+                f.write(_FRAME.pack(END_MARKER, 0, 0, 0))
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            if conn is not bind:
+                conn.close()
+        tmp.replace(path)
+        if span is not None:
+            span['rows'] = sum(counts.values())
+    return {'alembic_revision': revision, 'rows': counts}
+
+
+def read_header(f):
+    """Lee y valida la cabecera de un snapshot abierto en modo binario."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("El archivo no es un snapshot del inventario")
+    raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise SnapshotError("Snapshot truncado (cabecera incompleta)")
+    version, length = _HEADER.unpack(raw)
+    if version > FORMAT_VERSION:
+        raise SnapshotError(f"Versión de snapshot no soportada: {version}")
+    return json.loads(f.read(length).decode('utf-8'))
+
+
+def iter_blocks(f, header):
+    """Genera `(tabla, filas)` por bloque; `filas` es una lista de dicts."""
+    tables = header['tables']
+    while True:
+        raw = f.read(_FRAME.size)
+        if len(raw) < _FRAME.size:
+            raise SnapshotError("Snapshot truncado (falta la marca de fin)")
+        index, count, length, crc = _FRAME.unpack(raw)
+        if index == END_MARKER:
+            return
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            raise SnapshotError("Snapshot dañado (bloque incompleto o CRC incorrecto)")
+        block = json.loads(zlib.decompress(payload).decode('utf-8'))
+        columns = tables[index]['columns']
+        rows = [dict(zip(columns, values)) for values in zip(*(block[c] for c in columns))]
+        if len(rows) != count:
+            raise SnapshotError("Snapshot dañado (número de filas incorrecto)")
+        yield tables[index]['name'], rows
+
+
+def snapshot_info(path):
+    """Cabecera y número de filas por tabla de un snapshot (lo recorre completo, validando CRCs)."""
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        counts = {}
+        for name, rows in iter_blocks(f, header):
+            counts[name] = counts.get(name, 0) + len(rows)
+    header['rows'] = counts
+    return header
+
+
+def restore_snapshot(engine, path, replace=False, batch_size=BATCH_SIZE, allow_revision_mismatch=False):
+    """Bulk-load a snapshot into `engine` in one transaction.
+
+    The target tables must exist (run `alembic upgrade head` first) and productos must be empty
+    unless `replace=True`. Existing categorias (e.g. the ones seeded by the migrations) are
+    replaced by the snapshot's, keeping its ids; with `replace=True` productos is deleted too.
+    Returns the number of restored rows per table.
+    """
+    by_name = {t.name: t for t in TABLES}
+    counts = {}
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        with metrics.timer("snapshot.restore") as span, engine.begin() as conn:
+            target = database_revision(conn)
+            source = header.get('alembic_revision')
+            if source and target and source != target and not allow_revision_mismatch:
+                raise SnapshotError(f"El snapshot es de la revisión {source} y la base está en {target}; "
+                                    "migre la base o use allow_revision_mismatch")
+            existing = {t.name: {c['name'] for c in inspect(conn).get_columns(t.name)} for t in TABLES}
+            decoders = {t.name: {c.name: _decoder(c) for c in t.columns} for t in TABLES}
+
+            if not replace and conn.execute(select(func.count()).select_from(Product.__table__)).scalar():
+                raise SnapshotError("La tabla productos no está vacía; use replace=True para reemplazarla")
+            mysql = conn.dialect.name in ('mysql', 'mariadb')
+            if mysql:
+                conn.execute(text("SET foreign_key_checks = 0"))
+                conn.execute(text("SET unique_checks = 0"))
+            try:
+                # Sin productos ninguna fila referencia `categorias`: las sembradas por la migración
+                # se sustituyen por las del snapshot (los `tipo_id` del snapshot usan sus ids)
+                for table in reversed(TABLES):
+                    conn.execute(delete(table))
+
+                batches = {}
+
+                def _flush(name):
+                    if batches.get(name):
+                        conn.execute(by_name[name].insert(), batches[name])
+                        batches[name] = []
+
+                for name, rows in iter_blocks(f, header):
+                    table = by_name.get(name)
+                    if table is None:
+                        continue
+                    decode = decoders[name]
+                    keep = [c for c in rows[0] if c in existing[name] and c in table.c] if rows else []
+                    pending = batches.setdefault(name, [])
+                    for row in rows:
+                        pending.append({c: (decode[c](row[c]) if decode[c] and row[c] is not None else row[c])
+                                        for c in keep})
+                        if len(pending) >= batch_size:
+                            _flush(name)
+                            pending = batches[name]
+                    counts[name] = counts.get(name, 0) + len(rows)
+                    # las tablas van en orden: al pasar a otra, vaciar las anteriores (FKs)
+                    for other in list(batches):
+                        if other != name:
+                            _flush(other)
+                for name in list(batches):
+                    _flush(name)
+            finally:
+                if mysql:
+                    conn.execute(text("SET unique_checks = 1"))
+                    conn.execute(text("SET foreign_key_checks = 1"))
+            if span is not None:
+                span['rows'] = sum(counts.values())
+    clear_category_cache()
+    return counts
@@ -0,0 +1,158 @@
+"""Alertas de reposición: productos cuya `cantidad` está por debajo de su stock mínimo.
+
+- El umbral efectivo es `productos.stock_minimo` o, si es NULL, `categorias.stock_minimo`. Un
+  mínimo propio de 0 (o negativo) desactiva la alerta del producto (no hereda el de la categoría).
+- `low_stock_products(session)` hace la búsqueda completa con dos ramas que usan índices:
+  productos con umbral propio (`ix_productos_stock_minimo_cantidad`) y, por cada categoría con
+  umbral, un rango sobre `ix_productos_tipo_id_cantidad`. Nunca recorre toda la tabla.
+- `LowStockMonitor.poll()` solo consulta las filas con `Fecha_Modificacion` posterior a la
+  última comprobación (columna indexada) y devuelve qué alertas aparecieron, cambiaron o se
+  resolvieron; la UI lo llama periódicamente sin recargar la tabla de productos.
+
+Notas:
+- La marca de agua es el mayor `Fecha_Modificacion` de las propias filas (no `now()` de la
+  sesión): con la réplica local las filas llevan la hora del central y `now()` sería la del SQLite
+  local (UTC). Se resta un solapamiento (`overlap_seconds`) para cubrir transacciones que
+  confirmaron tarde; las filas con `Fecha_Modificacion` NULL (escrituras locales pendientes de la
+  réplica) se revisan siempre.
+- Un cambio de umbral en `categorias` no toca `Fecha_Modificacion` de los productos: el monitor
+  compara los umbrales de categorías (tabla pequeña) en cada `poll()` y, si cambiaron, repite la
+  búsqueda completa indexada.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+import traceback
+
+from sqlalchemy import and_, case, func, or_, select, union_all
+
+try:
+    from app.models import Product, Category
+    from app.repository import new_read_session
+except ModuleNotFoundError:
+    try:
+        from models import Product, Category
+        from repository import new_read_session
+    except Exception:
+        traceback.print_exc()
+        raise
+
+StockAlert = namedtuple('StockAlert', ['id', 'name', 'tipo', 'cantidad', 'umbral'])
+
+
+def is_low(cantidad, umbral):
+    return umbral is not None and (cantidad is None or cantidad < umbral)
+
+
+def _alert_columns(threshold):
+    return (Product.id, Product.name, Category.nombre.label('tipo'), Product.cantidad, threshold.label('umbral'))
+
+
+def _below(threshold):
+    return or_(Product.cantidad < threshold, Product.cantidad.is_(None))
+
+
+def category_thresholds(session):
+    """Devuelve `{categoria_id: stock_minimo}` de las categorías con umbral."""
+    rows = session.execute(select(Category.id, Category.stock_minimo).where(Category.stock_minimo.isnot(None)))
+    return {cid: minimo for cid, minimo in rows}
+
+
+def low_stock_statement(thresholds):
+    """SELECT (UNION ALL) de los productos bajo su umbral, dados los umbrales por categoría."""
+    own = (select(*_alert_columns(Product.stock_minimo))
+           .join(Category, Category.id == Product.tipo_id)
+           # `> 0` (y no `IS NOT NULL`) para que el rango use el índice; un mínimo de 0 no alerta
+           .where(Product.stock_minimo > 0, _below(Product.stock_minimo)))
+    if not thresholds:
+        return own
+    by_tipo = (select(*_alert_columns(Category.stock_minimo))
+               .join(Category, Category.id == Product.tipo_id)
+               .where(Product.stock_minimo.is_(None),
+                      or_(*[and_(Product.tipo_id == cid, _below(minimo)) for cid, minimo in thresholds.items()])))
+    return union_all(own, by_tipo)
+
+
+def low_stock_products(session):
+    """Return every product below its reorder threshold as StockAlert, most urgent first."""
+    rows = session.execute(low_stock_statement(category_thresholds(session))).all()
+    alerts = [StockAlert(*r) for r in rows]
+    alerts.sort(key=lambda a: ((a.cantidad or 0) - a.umbral, a.id))
+    return alerts
+
+
+def changed_since_statement(since):
+    # Misma regla que `low_stock_statement`: el mínimo propio cuenta solo si es > 0 (si no, umbral
+    # NULL y sin alerta); el de la categoría solo cuando el producto no tiene mínimo propio
+    threshold = case((Product.stock_minimo > 0, Product.stock_minimo),
+                     (Product.stock_minimo.is_(None), Category.stock_minimo))
+    return (select(*_alert_columns(threshold))
+            .join(Category, Category.id == Product.tipo_id)
+            .where(or_(Product.Fecha_Modificacion >= since, Product.Fecha_Modificacion.is_(None))))
+
+
+def changed_since(session, since):
+    """Productos modificados desde `since` con su umbral efectivo (tengan alerta o no)."""
+    return [StockAlert(*r) for r in session.execute(changed_since_statement(since))]
+
+
+class LowStockMonitor:
+    """Mantiene el conjunto de alertas actualizado consultando solo las filas cambiadas."""
+
+    def __init__(self, session_factory=None, overlap_seconds=5):
+        self.session_factory = session_factory or new_read_session
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.alerts = {}
+        self._watermark = None
+        self._thresholds = None
+
+    def _diff(self, new):
+        old = self.alerts
+        self.alerts = new
+        changed = [a for pid, a in new.items() if old.get(pid) != a]
+        removed = [pid for pid in old if pid not in new]
+        return changed, removed
+
+    def _latest(self, session):
+        # Se lee antes que las filas: lo que se confirme después queda por encima de la marca
+        latest = session.execute(select(func.max(Product.Fecha_Modificacion))).scalar()
+        if self._watermark is not None and (latest is None or latest < self._watermark):
+            return self._watermark
+        return latest
+
+    def _full(self, session, latest):
+        self._thresholds = category_thresholds(session)
+        rows = session.execute(low_stock_statement(self._thresholds)).all()
+        self._watermark = latest
+        return self._diff({r[0]: StockAlert(*r) for r in rows})
+
+    def refresh(self):
+        """Búsqueda completa (indexada). Devuelve `(cambiadas, resueltas)` como `poll()`."""
+        with self.session_factory() as session:
+            return self._full(session, self._latest(session))
+
+    def poll(self):
+        """Check only rows modified since the last check.
+
+        Returns `(changed, removed)`: StockAlerts that are new or whose quantity/threshold
+        changed, and ids of products that no longer need restocking (or were deleted).
+        """
+        with self.session_factory() as session:
+            latest = self._latest(session)
+            if self._watermark is None or category_thresholds(session) != self._thresholds:
+                return self._full(session, latest)
+            new = dict(self.alerts)
+            for row in changed_since(session, self._watermark - self.overlap):
+                if is_low(row.cantidad, row.umbral):
+                    new[row.id] = row
+                else:
+                    new.pop(row.id, None)
+            if new:
+                # las bajas no dejan fila modificada: comprobar que las alertas siguen existiendo
+                existing = set(session.execute(select(Product.id).where(Product.id.in_(list(new)))).scalars())
+                new = {pid: a for pid, a in new.items() if pid in existing}
+            self._watermark = latest
+            return self._diff(new)
+
+    def sorted_alerts(self):
+        return sorted(self.alerts.values(), key=lambda a: ((a.cantidad or 0) - a.umbral, a.id))
@@ -2,16 +2,21 @@
 
 Contiene `MainWindow` y `ProductDialog`. Este módulo tiene ligeras dependencias
 opcionales (pandas/openpyxl/reportlab) sólo necesarias para exportar.
-- La lista de tipos puede cargarse desde `config/tipos.txt` (archivo plano).
+- La lista de tipos se carga desde `config/tipos.txt` (archivo plano) vía `app.categories`,
+  que la mantiene en caché y solo la relee si cambia el archivo.
 - Evitar operaciones de larga duración en el hilo principal (UI) y moverlas a un hilo/worker.
+- La lista "Reponer" muestra los productos bajo su stock mínimo; un QTimer la actualiza cada
+  `STOCK_ALERT_INTERVAL_MS` consultando solo las filas modificadas (`app.stock_alerts`), en un
+  hilo aparte (`StockAlertWorker`) que devuelve el resultado por señal.
 """
 
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QPushButton, QDialog, QFormLayout, QLineEdit, QSpinBox, QDateEdit, QMessageBox, QApplication,
-    QAbstractItemView, QDialogButtonBox, QFileDialog, QInputDialog, QComboBox, QDoubleSpinBox
+    QAbstractItemView, QDialogButtonBox, QFileDialog, QInputDialog, QComboBox, QDoubleSpinBox,
+    QProgressDialog, QListWidget, QListWidgetItem, QLabel
 )
-from PySide6.QtCore import Qt, QDate
+from PySide6.QtCore import Qt, QDate, QThread, Signal, QEventLoop, QTimer
 from datetime import date
 from pathlib import Path
 import traceback
@@ -41,45 +46,106 @@ except Exception:
     HAS_REPORTLAB = False
 
 
-def load_tipo_options():
-    """Carga opciones de tipos desde 'config/tipos.txt' (project root) o 'resources/tipos.txt'.
-    Devuelve lista de opciones; si el archivo no existe retorna una lista por defecto.
-    Cada entrada asegura que comienza con mayúscula."""
-    root = Path(__file__).resolve().parent.parent
-    candidates = [root / 'config' / 'tipos.txt', root / 'resources' / 'tipos.txt']
-    for p in candidates:
-        if p.exists():
-            opts = []
-            try:
-                text = p.read_text(encoding='utf-8')
-            except Exception:
-                continue
-            for line in text.splitlines():
-                s = line.strip()
-                if not s:
-                    continue
-                s = s[0].upper() + s[1:] if s else s
-                opts.append(s)
-            if opts:
-                return opts
-    # Fallback por defecto
-    return ["Bebida", "Condimento", "Enlatados", "Galletas", "Piqueos", "Limpieza",
-"Utiles", "Aseo personal", "Bebida alcoholica", "Lacteos", "Fideos", "Salsas",
-"Dulces", "Reposteria", "Detergentes", "Helados", "Descartables", "Cuadernos",
-"Cocina", "Velas", "Medicina", "Otros"
-]
-
 try:
-    from app.repository import list_products, insert_product_safe, update_product_safe, delete_product
-    from app.exporter import export_csv, export_xlsx, export_pdf, export_to, MissingDependencyError, ExportError
+    from app.repository import (
+        iter_products, count_products, get_product, insert_product_safe, update_product_safe,
+        update_products_safe, adjust_prices_safe, delete_products_safe, delete_products_where_safe,
+        adjust_stock_many_safe, set_tipo_stock_minimo_safe, InsufficientStockError, StaleProductError,
+    )
+    from app.exporter import export_to, MissingDependencyError, ExportError, ExportCancelled, CancelToken, FIELDNAMES, product_row
+    from app.metrics import registry as metrics
+    from app.categories import load_tipo_options
+    from app.stock_alerts import LowStockMonitor
 except ModuleNotFoundError:
     try:
-        from repository import list_products, insert_product_safe, update_product_safe, delete_product
-        from exporter import export_csv, export_xlsx, export_pdf, export_to, MissingDependencyError, ExportError
+        from repository import (
+            iter_products, count_products, get_product, insert_product_safe, update_product_safe,
+            update_products_safe, adjust_prices_safe, delete_products_safe, delete_products_where_safe,
+            adjust_stock_many_safe, set_tipo_stock_minimo_safe, InsufficientStockError, StaleProductError,
+        )
+        from exporter import export_to, MissingDependencyError, ExportError, ExportCancelled, CancelToken, FIELDNAMES, product_row
+        from metrics import registry as metrics
+        from categories import load_tipo_options
+        from stock_alerts import LowStockMonitor
     except Exception:
         traceback.print_exc()
         raise
 
+# Intervalo de comprobación de stock bajo (solo consulta filas modificadas)
+STOCK_ALERT_INTERVAL_MS = 30000
+# Filas leídas y pintadas por bloque al llenar la tabla (se repinta la ventana entre bloques)
+TABLE_CHUNK_ROWS = 500
+
+
+def changed_fields(product, data):
+    """Devuelve los campos de `data` (formulario) que difieren de los valores de `product`."""
+    changed = {}
+    for k, v in data.items():
+        old = getattr(product, k, None)
+        if k == 'precio':
+            if abs(float(old or 0.0) - float(v or 0.0)) < 0.005:
+                continue
+        elif (old or None) == (v or None):
+            continue
+        changed[k] = v
+    return changed
+
+
+class ExportWorker(QThread):
+    """Lee, convierte y exporta los productos en un hilo aparte; emite el avance (`ExportProgress`).
+
+    La lectura por bloques (`iter_products`) y la conversión (`product_row`) ocurren en este hilo
+    mientras `export_to` escribe, así que el diálogo de progreso y el `CancelToken` las cubren.
+    """
+    progressed = Signal(object)
+
+    def __init__(self, fmt, path, fieldnames, cancel, parent=None, **kwargs):
+        super().__init__(parent)
+        self.fmt = fmt
+        self.path = path
+        self.fieldnames = fieldnames
+        self.cancel = cancel
+        self.kwargs = kwargs
+        self.error = None
+
+    def run(self):
+        products = None
+        try:
+            total = count_products()
+            self.cancel.raise_if_cancelled()
+            products = iter_products()
+            export_to(self.fmt, self.path, (product_row(p) for p in products), self.fieldnames,
+                      progress=self.progressed.emit, cancel=self.cancel, total=total, **self.kwargs)
+        except Exception as e:
+            # se relanza en el hilo de la UI (ver MainWindow.run_export)
+            self.error = e
+        finally:
+            if products is not None:
+                # cancelada o fallida a mitad: cerrar ya la sesión de lectura del generador
+                products.close()
+
+
+class StockAlertWorker(QThread):
+    """Ejecuta `LowStockMonitor.poll()` fuera del hilo de la UI y emite `(cambiadas, resueltas)`."""
+    polled = Signal(object, object)
+
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+
+    def run(self):
+        try:
+            with metrics.timer("ui.stock_alerts") as span:
+                changed, removed = self.monitor.poll()
+                if span is not None:
+                    span['changed'] = len(changed)
+                    span['removed'] = len(removed)
+        except Exception:
+            # Sin conexión no se molesta al usuario cada intervalo; se reintenta en el siguiente
+            traceback.print_exc()
+            return
+        self.polled.emit(changed, removed)
+
 
 class ProductDialog(QDialog):
     def __init__(self, parent=None, product=None):
@@ -147,6 +213,28 @@ class ProductDialog(QDialog):
         else:
             self.date_edit.setDate(QDate.currentDate())
 
+    def set_data(self, data):
+        """Sobrescribe los campos del formulario con los valores de `data` (claves de `get_data`)."""
+        if 'name' in data:
+            self.name_edit.setText(data['name'] or "")
+        if 'tipo' in data and data['tipo']:
+            idx = self.tipo_edit.findText(data['tipo'])
+            if idx < 0:
+                self.tipo_edit.addItem(data['tipo'])
+                idx = self.tipo_edit.count() - 1
+            self.tipo_edit.setCurrentIndex(idx)
+        if 'descripcion' in data:
+            self.desc_edit.setText(data['descripcion'] or "")
+        if 'cantidad' in data:
+            self.cant_spin.setValue(data['cantidad'] or 0)
+        if 'Marca' in data:
+            self.marca_edit.setText(data['Marca'] or "")
+        if 'precio' in data:
+            self.precio_spin.setValue(float(data['precio'] or 0.0))
+        if data.get('Fecha_Vencimiento'):
+            d = data['Fecha_Vencimiento']
+            self.date_edit.setDate(QDate(d.year, d.month, d.day))
+
     def get_data(self):
         qd = self.date_edit.date()
         return {
@@ -175,9 +263,24 @@ class MainWindow(QMainWindow):
         self.table = QTableWidget(0, 9)
         self.table.setHorizontalHeaderLabels(["ID", "Nombre", "Tipo", "Descripción", "Cantidad", "Marca", "Precio", "Fecha Vencimiento", "Fecha Registro"]) 
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # Selección múltiple (Ctrl/Shift) para operaciones masivas
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         vbox.addWidget(self.table)
 
+        # Alertas de reposición (se actualizan por diferencias, sin recargar la tabla)
+        vbox.addWidget(QLabel("Reponer (stock bajo el mínimo):"))
+        self.alert_list = QListWidget()
+        self.alert_list.setMaximumHeight(110)
+        vbox.addWidget(self.alert_list)
+        self.alert_items = {}
+        self.stock_monitor = LowStockMonitor()
+        # el monitor solo se usa desde este worker (una comprobación a la vez)
+        self.alert_worker = StockAlertWorker(self.stock_monitor, parent=self)
+        self.alert_worker.polled.connect(self.apply_stock_alerts)
+        self.alert_worker.finished.connect(self._on_alert_poll_finished)
+        self._alert_poll_again = False
+
         # Botones
         hbox = QHBoxLayout()
         self.add_btn = QPushButton("Agregar")
@@ -185,9 +288,17 @@ class MainWindow(QMainWindow):
         self.del_btn = QPushButton("Eliminar")
         self.refresh_btn = QPushButton("Refrescar")
         self.export_btn = QPushButton("Exportar")
+        self.stock_btn = QPushButton("Ajustar stock")
+        self.price_btn = QPushButton("Ajustar precios")
+        self.expired_btn = QPushButton("Eliminar vencidos")
+        self.minimo_btn = QPushButton("Stock mínimo")
         hbox.addWidget(self.add_btn)
         hbox.addWidget(self.edit_btn)
         hbox.addWidget(self.del_btn)
+        hbox.addWidget(self.stock_btn)
+        hbox.addWidget(self.price_btn)
+        hbox.addWidget(self.expired_btn)
+        hbox.addWidget(self.minimo_btn)
         hbox.addWidget(self.refresh_btn)
         hbox.addWidget(self.export_btn)
         hbox.addStretch()
@@ -199,20 +310,52 @@ class MainWindow(QMainWindow):
         self.del_btn.clicked.connect(self.on_delete)
         self.refresh_btn.clicked.connect(self.load_products)
         self.export_btn.clicked.connect(self.on_export)
+        self.stock_btn.clicked.connect(self.on_adjust_stock)
+        self.price_btn.clicked.connect(self.on_adjust_prices)
+        self.expired_btn.clicked.connect(self.on_delete_expired)
+        self.minimo_btn.clicked.connect(self.on_set_stock_minimo)
+        self.alert_list.itemDoubleClicked.connect(self.on_alert_activated)
 
         self.load_products()
+        self.alert_timer = QTimer(self)
+        self.alert_timer.timeout.connect(self.check_stock_alerts)
+        self.alert_timer.start(STOCK_ALERT_INTERVAL_MS)
+
+    def closeEvent(self, event):
+        # no destruir la ventana con la comprobación de stock a medias
+        self.alert_timer.stop()
+        self._alert_poll_again = False
+        self.alert_worker.wait()
+        super().closeEvent(event)
 # Cargar productos en la tabla
     def load_products(self):
-        try:
-            products = list_products()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"No se pudo obtener productos:\n{e}")
-            return
+        """Llena la tabla leyendo los productos por bloques (`iter_products`), sin cargar la lista entera."""
+        with metrics.timer("ui.refresh") as span:
+            self.table.setRowCount(0)
+            rows = 0
+            try:
+                chunk = []
+                for p in iter_products(chunk_size=TABLE_CHUNK_ROWS):
+                    chunk.append(p)
+                    if len(chunk) >= TABLE_CHUNK_ROWS:
+                        rows = self._append_rows(rows, chunk)
+                        chunk = []
+                        # repintar entre bloques sin procesar clics/teclas (evita recargas anidadas)
+                        QApplication.processEvents(QEventLoop.ExcludeUserInputEvents)
+                rows = self._append_rows(rows, chunk)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"No se pudo obtener productos:\n{e}")
+                return
+            if span is not None:
+                span['rows'] = rows
+            self.table.resizeColumnsToContents()
+        # tras cada recarga (y por tanto tras cada escritura) revisar solo las filas cambiadas
+        self.check_stock_alerts()
 
-        self.table.setRowCount(0)
-        for p in products:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
+    def _append_rows(self, start, products):
+        """Añade `products` a la tabla a partir de la fila `start`; devuelve el nuevo total de filas."""
+        self.table.setRowCount(start + len(products))
+        for row, p in enumerate(products, start):
             self.table.setItem(row, 0, QTableWidgetItem(str(p.id)))
             self.table.setItem(row, 1, QTableWidgetItem(p.name or ""))
             self.table.setItem(row, 2, QTableWidgetItem(p.tipo or ""))
@@ -222,8 +365,49 @@ class MainWindow(QMainWindow):
             self.table.setItem(row, 6, QTableWidgetItem(f"{getattr(p, 'precio', 0.0):.2f}"))
             self.table.setItem(row, 7, QTableWidgetItem(p.Fecha_Vencimiento.isoformat() if p.Fecha_Vencimiento else ""))
             self.table.setItem(row, 8, QTableWidgetItem(p.Fecha_Registro.isoformat() if p.Fecha_Registro else ""))
+        return start + len(products)
+
+    def check_stock_alerts(self):
+        """Lanza la comprobación de stock bajo en segundo plano (`StockAlertWorker`).
+
+        Si ya hay una en curso se repite al terminar, para no perder los cambios de la última recarga.
+        """
+        if self.alert_worker.isRunning():
+            self._alert_poll_again = True
+            return
+        self._alert_poll_again = False
+        self.alert_worker.start()
+
+    def _on_alert_poll_finished(self):
+        if self._alert_poll_again:
+            self.check_stock_alerts()
 
-        self.table.resizeColumnsToContents()
+    def apply_stock_alerts(self, changed, removed):
+        """Aplica a la lista "Reponer" solo las alertas nuevas, cambiadas o resueltas."""
+        for pid in removed:
+            item = self.alert_items.pop(pid, None)
+            if item is not None:
+                self.alert_list.takeItem(self.alert_list.row(item))
+        for a in changed:
+            text = f"{a.name} ({a.tipo}): {a.cantidad if a.cantidad is not None else 0} / mínimo {a.umbral}"
+            item = self.alert_items.get(a.id)
+            if item is None:
+                item = QListWidgetItem(text)
+                item.setData(Qt.UserRole, a.id)
+                self.alert_list.addItem(item)
+                self.alert_items[a.id] = item
+            else:
+                item.setText(text)
+
+    def on_alert_activated(self, item):
+        """Selecciona en la tabla el producto de la alerta."""
+        pid = item.data(Qt.UserRole)
+        for row in range(self.table.rowCount()):
+            cell = self.table.item(row, 0)
+            if cell is not None and cell.text() == str(pid):
+                self.table.selectRow(row)
+                self.table.scrollToItem(cell)
+                return
 # Obtener ID del producto seleccionado
     def get_selected_product_id(self):
         sel = self.table.currentRow()
@@ -231,6 +415,15 @@ class MainWindow(QMainWindow):
             return None
         item = self.table.item(sel, 0)
         return int(item.text()) if item else None
+# Obtener IDs de todas las filas seleccionadas
+    def get_selected_product_ids(self):
+        rows = sorted({idx.row() for idx in self.table.selectionModel().selectedRows()})
+        ids = []
+        for r in rows:
+            item = self.table.item(r, 0)
+            if item:
+                ids.append(int(item.text()))
+        return ids
 
     def on_add(self):
         dlg = ProductDialog(self)
@@ -243,50 +436,112 @@ class MainWindow(QMainWindow):
             self.load_products()
 
     def on_edit(self):
+        ids = self.get_selected_product_ids()
+        if len(ids) > 1:
+            self.on_bulk_edit(ids)
+            return
         pid = self.get_selected_product_id()
         if not pid:
             QMessageBox.information(self, "Selecciona", "Selecciona un producto para editar.")
             return
-        # Cargar producto
-        products = list_products()
-        prod = next((x for x in products if x.id == pid), None)
+        # Cargar solo el producto seleccionado
+        try:
+            prod = get_product(pid)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo obtener el producto:\n{e}")
+            return
         if not prod:
             QMessageBox.critical(self, "Error", "Producto no encontrado.")
             return
         dlg = ProductDialog(self, product=prod)
         if dlg.exec() == QDialog.Accepted:
-            data = dlg.get_data()
+            self.save_product_edit(pid, prod, dlg.get_data())
+            self.load_products()
+
+    def save_product_edit(self, pid, original, data):
+        """Guarda la edición comprobando la versión leída.
+
+        Si otro usuario guardó antes, se ofrece recargar el producto (descartando lo editado) o
+        combinar: partir de la versión actual y volver a aplicar solo los campos cambiados aquí.
+        """
+        while True:
             try:
-                update_product_safe(pid, **data)
+                update_product_safe(pid, expected_version=original.version, **data)
+                return True
+            except StaleProductError as e:
+                current = e.current
+                if current is None:
+                    QMessageBox.information(self, "Info", "Otro usuario eliminó este producto.")
+                    return False
+                box = QMessageBox(self)
+                box.setWindowTitle("Conflicto de edición")
+                box.setText("Otro usuario modificó este producto mientras lo editabas.")
+                box.setInformativeText("¿Combinar tus cambios con la versión actual o recargarla y descartar tus cambios?")
+                btn_merge = box.addButton("Combinar", QMessageBox.AcceptRole)
+                btn_reload = box.addButton("Recargar", QMessageBox.ResetRole)
+                box.addButton(QMessageBox.Cancel)
+                box.exec()
+                clicked = box.clickedButton()
+                if clicked not in (btn_merge, btn_reload):
+                    return False
+                dlg = ProductDialog(self, product=current)
+                if clicked == btn_merge:
+                    dlg.set_data(changed_fields(original, data))
+                if dlg.exec() != QDialog.Accepted:
+                    return False
+                original, data = current, dlg.get_data()
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"No se pudo actualizar producto:\n{e}")
-            self.load_products()
+                return False
+
+    def run_export(self, fmt, path, fieldnames, **kwargs):
+        """Exporta los productos en un `ExportWorker` mostrando un QProgressDialog con opción de cancelar.
+
+        Bloquea hasta que termina (la UI sigue respondiendo) y relanza el error de la exportación,
+        de modo que `on_export` conserve su manejo de MissingDependencyError/ExportError.
+        """
+        token = CancelToken()
+        # El total lo cuenta el worker: el máximo llega con el primer ExportProgress
+        dlg = QProgressDialog(f"Exportando a {Path(path).name}...", "Cancelar", 0, 0, self)
+        dlg.setWindowTitle("Exportando")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(500)
+        dlg.setAutoClose(False)
+        dlg.setAutoReset(False)
+        dlg.canceled.connect(token.cancel)
+
+        def on_progress(p):
+            if token.cancelled:
+                return
+            dlg.setMaximum(p.total or 0)
+            dlg.setValue(min(p.done, p.total) if p.total else p.done)
+            fase = "Generando" if p.phase == 'render' else "Escribiendo"
+            dlg.setLabelText(f"{fase} {Path(path).name}: {p.done} de {p.total or '?'} filas ({p.rows_per_sec:.0f} filas/s)")
+
+        worker = ExportWorker(fmt, path, fieldnames, token, parent=self, **kwargs)
+        worker.progressed.connect(on_progress)
+        loop = QEventLoop()
+        worker.finished.connect(loop.quit)
+        worker.start()
+        loop.exec()
+        worker.wait()
+        dlg.close()
+        if worker.error is not None:
+            raise worker.error
 
     def on_export(self):
         try:
-            products = list_products()
-            data = []
-            for p in products:
-                data.append({
-                    'id': p.id,
-                    'name': p.name or '',
-                    'tipo': p.tipo or '',
-                    'descripcion': p.descripcion or '',
-                    'cantidad': p.cantidad,
-                    'Marca': p.Marca or '',
-                    'precio': float(getattr(p, 'precio', 0.0)),
-                    'Fecha_Vencimiento': p.Fecha_Vencimiento.isoformat() if p.Fecha_Vencimiento else '',
-                    'Fecha_Registro': p.Fecha_Registro.isoformat() if p.Fecha_Registro else ''
-                })
-            fieldnames = ['id','name','tipo','descripcion','cantidad','Marca','precio','Fecha_Vencimiento','Fecha_Registro']
-
-            # Pedir formato
+            fieldnames = list(FIELDNAMES)
+
+            # Pedir formato (antes de leer nada: si se cancela no se consulta la base)
             dlg = QMessageBox(self)
             dlg.setWindowTitle("Formato de exportación")
             dlg.setText("Selecciona el formato de exportación:")
             btn_csv = dlg.addButton("CSV", QMessageBox.AcceptRole)
             btn_pdf = dlg.addButton("PDF", QMessageBox.AcceptRole)
             btn_xlsx = dlg.addButton("Excel (.xlsx)", QMessageBox.AcceptRole)
+            btn_gz = dlg.addButton("CSV comprimido (.gz)", QMessageBox.AcceptRole)
+            btn_parquet = dlg.addButton("Parquet", QMessageBox.AcceptRole)
             dlg.addButton(QMessageBox.Cancel)
             dlg.exec()
             clicked = dlg.clickedButton()
@@ -296,6 +551,10 @@ class MainWindow(QMainWindow):
                 fmt = 'pdf'
             elif clicked == btn_xlsx:
                 fmt = 'xlsx'
+            elif clicked == btn_gz:
+                fmt = 'csv.gz'
+            elif clicked == btn_parquet:
+                fmt = 'parquet'
             else:
                 return
 
@@ -304,6 +563,10 @@ class MainWindow(QMainWindow):
                 path, _ = QFileDialog.getSaveFileName(self, "Guardar inventario", "inventario.pdf", "PDF Files (*.pdf)")
             elif fmt == 'xlsx':
                 path, _ = QFileDialog.getSaveFileName(self, "Guardar inventario", "inventario.xlsx", "Excel Files (*.xlsx)")
+            elif fmt == 'csv.gz':
+                path, _ = QFileDialog.getSaveFileName(self, "Guardar inventario", "inventario.csv.gz", "CSV gzip (*.csv.gz)")
+            elif fmt == 'parquet':
+                path, _ = QFileDialog.getSaveFileName(self, "Guardar inventario", "inventario.parquet", "Parquet Files (*.parquet)")
             else:
                 path, _ = QFileDialog.getSaveFileName(self, "Guardar inventario", "inventario.csv", "CSV Files (*.csv)")
             if not path:
@@ -332,17 +595,21 @@ class MainWindow(QMainWindow):
             # Intentar exportar con el módulo exportador
             try:
                 if fmt == 'pdf':
-                    export_to(fmt, path, data, fieldnames, logo_path=logo_path, logo_width=logo_width)
+                    self.run_export(fmt, path, fieldnames, logo_path=logo_path, logo_width=logo_width)
                 else:
-                    export_to(fmt, path, data, fieldnames)
+                    self.run_export(fmt, path, fieldnames)
                 QMessageBox.information(self, "Exportado", f"Datos exportados a: {path}")
+            except ExportCancelled:
+                QMessageBox.information(self, "Cancelado", "Exportación cancelada; no se guardó ningún archivo.")
             except MissingDependencyError as e:
                 resp = QMessageBox.question(self, "Dependencia faltante", f"{e}\n¿Guardar en CSV en su lugar?", QMessageBox.Yes | QMessageBox.No)
                 if resp == QMessageBox.Yes:
                     csv_path = path.rsplit('.',1)[0] + '.csv'
                     try:
-                        export_csv(csv_path, data, fieldnames)
+                        self.run_export('csv', csv_path, fieldnames)
                         QMessageBox.information(self, "Exportado", f"Datos exportados a: {csv_path}")
+                    except ExportCancelled:
+                        QMessageBox.information(self, "Cancelado", "Exportación cancelada; no se guardó ningún archivo.")
                     except Exception as ex:
                         QMessageBox.critical(self, "Error", f"No se pudo exportar a CSV:\n{ex}")
                 else:
@@ -354,16 +621,119 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo exportar:\n{e}")
 
+    def on_bulk_edit(self, ids):
+        """Cambia el tipo de todos los productos seleccionados con una sola actualización."""
+        try:
+            tipo_opts = load_tipo_options()
+        except Exception:
+            tipo_opts = []
+        tipo, ok = QInputDialog.getItem(self, "Editar selección", f"Nuevo tipo para {len(ids)} productos:", tipo_opts, 0, False)
+        if not ok:
+            return
+        try:
+            count = update_products_safe(ids, tipo=tipo)
+            QMessageBox.information(self, "Actualizado", f"Productos actualizados: {count}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron actualizar los productos:\n{e}")
+        self.load_products()
+
+    def on_adjust_stock(self):
+        """Suma/resta unidades a los productos seleccionados de forma atómica (ej. -1 por venta)."""
+        ids = self.get_selected_product_ids()
+        if not ids:
+            QMessageBox.information(self, "Selecciona", "Selecciona uno o más productos para ajustar su stock.")
+            return
+        delta, ok = QInputDialog.getInt(self, "Ajustar stock", f"Unidades a sumar (negativo para restar) en {len(ids)} productos:", 0, -1000000, 1000000)
+        if not ok or delta == 0:
+            return
+        try:
+            adjust_stock_many_safe({pid: delta for pid in ids})
+        except InsufficientStockError as e:
+            QMessageBox.warning(self, "Stock insuficiente", f"No se aplicó ningún ajuste:\n{e}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo ajustar el stock:\n{e}")
+        self.load_products()
+
+    def on_set_stock_minimo(self):
+        """Fija el stock mínimo de los productos seleccionados o, sin selección, de un tipo."""
+        ids = self.get_selected_product_ids()
+        if ids:
+            opts = ["Fijar mínimo propio", "Quitar mínimo propio (usar el del tipo)"]
+            choice, ok = QInputDialog.getItem(self, "Stock mínimo", f"{len(ids)} productos seleccionados:", opts, 0, False)
+            if not ok:
+                return
+            value = None
+            if choice == opts[0]:
+                value, ok = QInputDialog.getInt(self, "Stock mínimo", "Avisar cuando la cantidad sea menor que:", 5, 0, 1000000)
+                if not ok:
+                    return
+            try:
+                update_products_safe(ids, stock_minimo=value)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"No se pudo fijar el stock mínimo:\n{e}")
+        else:
+            try:
+                tipo_opts = load_tipo_options()
+            except Exception:
+                tipo_opts = []
+            tipo, ok = QInputDialog.getItem(self, "Stock mínimo", "Tipo:", tipo_opts, 0, False)
+            if not ok:
+                return
+            value, ok = QInputDialog.getInt(self, "Stock mínimo", f"Mínimo para '{tipo}' (0 = sin aviso):", 5, 0, 1000000)
+            if not ok:
+                return
+            try:
+                set_tipo_stock_minimo_safe(tipo, value or None)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"No se pudo fijar el stock mínimo:\n{e}")
+        self.load_products()
+
+    def on_adjust_prices(self):
+        """Ajusta precios en porcentaje: a la selección o, si no hay selección, a un tipo completo."""
+        ids = self.get_selected_product_ids()
+        tipo = None
+        if not ids:
+            try:
+                tipo_opts = load_tipo_options()
+            except Exception:
+                tipo_opts = []
+            tipo, ok = QInputDialog.getItem(self, "Ajustar precios", "Tipo a ajustar:", tipo_opts, 0, False)
+            if not ok:
+                return
+        target = f"{len(ids)} productos seleccionados" if ids else f"el tipo '{tipo}'"
+        percent, ok = QInputDialog.getDouble(self, "Ajustar precios", f"Porcentaje para {target} (ej. 10 o -5):", 0.0, -99.0, 1000.0, 2)
+        if not ok or percent == 0:
+            return
+        try:
+            count = adjust_prices_safe(percent, product_ids=ids or None, tipo=tipo)
+            QMessageBox.information(self, "Precios ajustados", f"Productos actualizados: {count}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron ajustar los precios:\n{e}")
+        self.load_products()
+
+    def on_delete_expired(self):
+        today = date.today()
+        ok = QMessageBox.question(self, "Confirmar", f"¿Eliminar todos los productos vencidos antes de {today.isoformat()}?", QMessageBox.Yes | QMessageBox.No)
+        if ok != QMessageBox.Yes:
+            return
+        try:
+            count = delete_products_where_safe(expired_before=today)
+            QMessageBox.information(self, "Eliminados", f"Productos vencidos eliminados: {count}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudieron eliminar los productos vencidos:\n{e}")
+        self.load_products()
+
     def on_delete(self):
-        pid = self.get_selected_product_id()
-        if not pid:
+        ids = self.get_selected_product_ids()
+        if not ids:
             QMessageBox.information(self, "Selecciona", "Selecciona un producto para eliminar.")
             return
-        ok = QMessageBox.question(self, "Confirmar", "¿Eliminar producto seleccionado?", QMessageBox.Yes | QMessageBox.No)
+        msg = "¿Eliminar producto seleccionado?" if len(ids) == 1 else f"¿Eliminar los {len(ids)} productos seleccionados?"
+        ok = QMessageBox.question(self, "Confirmar", msg, QMessageBox.Yes | QMessageBox.No)
         if ok != QMessageBox.Yes:
             return
         try:
-            deleted = delete_product(pid)
+            deleted = delete_products_safe(ids)
             if not deleted:
                 QMessageBox.information(self, "Info", "Producto no encontrado o ya eliminado.")
         except Exception as e:
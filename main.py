@@ -3,6 +3,7 @@
 Nota: `app.db` ejecuta `Base.metadata.create_all()` para crear tablas si no existen.
 En entornos controlados/producción es preferible aplicar migraciones con Alembic en lugar
 de confiar en `create_all()`.
+Con `LOCAL_REPLICA_PATH` definido se arranca además el hilo de sincronización de la réplica local.
 """
 
 # Importar el módulo db inicializador (asegura DB y crea tablas)
@@ -18,8 +19,13 @@ if __name__ == "__main__":
     from PySide6.QtWidgets import QApplication
     try:
         from app.ui import MainWindow
+        from app.local_replica import start_sync_worker
     except Exception:
         from ui import MainWindow
+        from local_replica import start_sync_worker
+
+    # Sincronización en segundo plano con el servidor central (solo si hay réplica local)
+    start_sync_worker()
 
     app = QApplication(sys.argv)
     win = MainWindow()
@@ -0,0 +1,74 @@
+"""Benchmark de formatos de exportación: tamaño y velocidad de escritura.
+
+Compara el CSV actual con CSV gzip/zstd y Parquet usando filas sintéticas (no toca la base):
+    python -m scripts.bench_export --rows 200000
+
+Los formatos cuya dependencia opcional falta (zstandard, pyarrow) se informan como omitidos.
+"""
+
+import argparse
+from datetime import date, timedelta
+import os
+import random
+import tempfile
+import time
+
+from app.exporter import FIELDNAMES, MissingDependencyError, export_to
+
+FORMATS = [('csv', '.csv'), ('csv.gz', '.csv.gz'), ('csv.zst', '.csv.zst'), ('parquet', '.parquet')]
+
+
+def synthetic_rows(n, seed=42):
+    rnd = random.Random(seed)
+    tipos = ["Bebida", "Condimento", "Enlatados", "Galletas", "Limpieza", "Lacteos", "Otros"]
+    base = date(2026, 1, 1)
+    for i in range(1, n + 1):
+        yield {
+            'id': i,
+            'name': f"Producto {i}",
+            'tipo': rnd.choice(tipos),
+            'descripcion': f"Descripcion del producto {i % 500}",
+            'cantidad': rnd.randint(0, 500),
+            'Marca': f"Marca{i % 40}",
+            'precio': round(rnd.uniform(0.5, 120.0), 2),
+            'Fecha_Vencimiento': (base + timedelta(days=rnd.randint(0, 900))).isoformat(),
+            'Fecha_Registro': (base - timedelta(days=rnd.randint(0, 365))).isoformat(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de exportación")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3, help="repeticiones (se informa la mejor)")
+    args = parser.parse_args(argv)
+
+    data = list(synthetic_rows(args.rows))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, suffix in FORMATS:
+            path = os.path.join(tmp, 'bench' + suffix)
+            best = None
+            try:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    export_to(fmt, path, iter(data), FIELDNAMES)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            except MissingDependencyError as e:
+                results.append((fmt, None, None, str(e)))
+                continue
+            results.append((fmt, os.path.getsize(path), best, None))
+
+    csv_size = next((r[1] for r in results if r[0] == 'csv'), None)
+    print(f"{args.rows} filas, mejor de {args.repeat}")
+    print(f"{'formato':<10}{'tamaño (KB)':>14}{'vs csv':>9}{'tiempo (s)':>12}{'filas/s':>12}")
+    for fmt, size, secs, error in results:
+        if error:
+            print(f"{fmt:<10}  omitido: {error}")
+            continue
+        ratio = f"{size / csv_size:.2f}x" if csv_size else '-'
+        print(f"{fmt:<10}{size / 1024:>14.1f}{ratio:>9}{secs:>12.3f}{args.rows / secs:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
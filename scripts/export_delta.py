@@ -0,0 +1,42 @@
+"""Exportación nocturna incremental del inventario.
+
+Uso:
+    python -m scripts.export_delta inventario.csv            # delta (o completa la primera vez)
+    python -m scripts.export_delta inventario.csv --append   # añade los cambios a inventario.delta.csv
+    python -m scripts.export_delta inventario.csv --compact  # fusiona los deltas en el CSV completo
+    python -m scripts.export_delta inventario.csv --full     # fuerza una exportación completa
+
+Conecta a la base configurada por `DATABASE_URL` (o a una réplica de `DATABASE_REPLICA_URLS`;
+el solapamiento de la marca de agua, 60 s por defecto, debe cubrir el retraso de replicación).
+"""
+
+import argparse
+
+from app.db import read_session
+from app.delta_export import export_delta, export_full, compact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportación delta del inventario con manifiesto")
+    parser.add_argument('path', help="CSV completo de referencia (el manifiesto se guarda a su lado)")
+    parser.add_argument('--append', action='store_true', help="añadir los cambios a un único archivo delta")
+    parser.add_argument('--full', action='store_true', help="forzar una exportación completa")
+    parser.add_argument('--compact', action='store_true', help="fusionar los deltas en el snapshot completo")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        print(f"Snapshot compactado: {compact(args.path)} filas")
+        return
+    session = read_session()
+    try:
+        if args.full:
+            result = export_full(session, args.path)
+        else:
+            result = export_delta(session, args.path, mode='append' if args.append else 'files')
+    finally:
+        session.close()
+    print(f"Altas/cambios: {result['upserts']}  bajas: {result['deletes']}  archivo: {result['file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,128 @@
-"""Pequeña utilidad para inspeccionar la estructura de la tabla `productos`.
+"""Diagnóstico de la base del inventario.
 
-Útil en desarrollo para comprobar tipos, nullability y defaults. No ejecutar en producción
-sin entender el entorno ya que conecta a la base configurada por `DATABASE_URL`.
+Uso:
+    python -m scripts.inspect_db                      # columnas, tamaños, índices, EXPLAIN y perfil
+    python -m scripts.inspect_db --explain            # solo los planes de ejecución
+    python -m scripts.inspect_db --profile --rounds 5 # solo las sentencias más lentas
+    python -m scripts.inspect_db --url sqlite:///copia.db
+
+Útil en desarrollo para comprobar tipos, nullability, defaults e índices, y para detectar
+recorridos completos de tabla antes de que lleguen a las tiendas. Conecta a la base configurada
+por `DATABASE_URL` (o a `--url`); no modifica datos, pero el perfil y los COUNT(*) cargan la base:
+en producción usar `--no-profile` y `--estimate`. `--explain` ejecuta una muestra de lecturas
+del repositorio y analiza el SQL capturado; los UPDATE/DELETE solo se analizan, no se ejecutan.
+Termina con código 1 si alguna consulta hace un recorrido completo inesperado.
 """
 
-from app.db import engine
-from sqlalchemy import inspect
-insp = inspect(engine)
-cols = insp.get_columns('productos')
-for c in cols:
-    print(c['name'], c['type'], 'nullable=' + str(c['nullable']), 'default=' + str(c.get('default')))
+import argparse
+import os
+import sys
+
+os.environ.setdefault('DB_ECHO', '0')
+
+
+def _size(value):
+    if value is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024.0
+
+
+def print_columns(engine, table='productos'):
+    from sqlalchemy import inspect
+    print(f"== Columnas de {table}")
+    for c in inspect(engine).get_columns(table):
+        print(' ', c['name'], c['type'], 'nullable=' + str(c['nullable']), 'default=' + str(c.get('default')))
+
+
+def print_tables(engine, exact=True):
+    from app.diagnostics import table_stats
+    print("== Tablas")
+    print(f"  {'tabla':<24}{'filas':>12}{'datos':>12}{'índices':>12}")
+    for st in table_stats(engine, exact=exact):
+        rows = '-' if st.rows is None else st.rows
+        print(f"  {st.table:<24}{rows:>12}{_size(st.data_bytes):>12}{_size(st.index_bytes):>12}")
+
+
+def print_indexes(engine):
+    from app.diagnostics import index_report
+    print("== Índices")
+    for ix in index_report(engine):
+        unique = ' único' if ix.unique else ''
+        print(f"  {ix.table}.{ix.name} ({', '.join(ix.columns)}){unique}  {_size(ix.bytes)}")
+
+
+def print_plans(engine, verbose=False):
+    from app.diagnostics import explain_queries, unexpected_full_scans
+    print("== EXPLAIN del SQL del repositorio (lecturas capturadas, escrituras sin ejecutar)")
+    plans = explain_queries(engine)
+    for p in plans:
+        if p.full_scans and not p.expected_full_scan:
+            mark = 'RECORRIDO COMPLETO'
+        elif p.full_scans:
+            mark = 'completo (esperado)'
+        else:
+            mark = 'ok'
+        print(f"  [{mark}] {p.name}: {' '.join(p.sql.split())[:60]}")
+        if verbose or (p.full_scans and not p.expected_full_scan):
+            for line in p.plan:
+                print(f"      {line}")
+    return unexpected_full_scans(plans)
+
+
+def print_profile(engine, rounds, sample, limit):
+    from app.diagnostics import profile_reads
+    print(f"== Sentencias más lentas ({rounds} rondas de lecturas, {sample} productos por ronda)")
+    slowest, operations = profile_reads(engine, rounds=rounds, sample=sample, limit=limit)
+    for sql, st in slowest:
+        avg = st['total_ms'] / st['count'] if st['count'] else 0.0
+        print(f"  max {st['max_ms']:8.2f} ms  media {avg:8.2f} ms  x{st['count']:<5} {' '.join(sql.split())[:100]}")
+    print("== Operaciones")
+    for name, st in sorted(operations.items(), key=lambda kv: kv[1]['max_ms'], reverse=True):
+        print(f"  {name:<32} x{st['count']:<5} max {st['max_ms']:8.2f} ms  sql {st['sql_count']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnóstico de la base del inventario")
+    parser.add_argument('--url', help="base a inspeccionar (por defecto DATABASE_URL)")
+    parser.add_argument('--columns', action='store_true', help="columnas de productos")
+    parser.add_argument('--tables', action='store_true', help="filas y tamaños por tabla")
+    parser.add_argument('--indexes', action='store_true', help="índices existentes")
+    parser.add_argument('--explain', action='store_true', help="planes de las consultas del repositorio")
+    parser.add_argument('--profile', action='store_true', help="muestreo de lecturas y sentencias más lentas")
+    parser.add_argument('--no-profile', action='store_true', help="omitir el muestreo al mostrar todo")
+    parser.add_argument('--estimate', action='store_true', help="filas estimadas en MySQL (sin COUNT(*))")
+    parser.add_argument('--verbose', '-v', action='store_true', help="mostrar el plan de todas las consultas")
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--sample', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.url:
+        from sqlalchemy import create_engine
+        from app.metrics import instrument_engine
+        engine = instrument_engine(create_engine(args.url))
+    else:
+        from app.db import engine
+
+    everything = not (args.columns or args.tables or args.indexes or args.explain or args.profile)
+    if everything or args.columns:
+        print_columns(engine)
+    if everything or args.tables:
+        print_tables(engine, exact=not args.estimate)
+    if everything or args.indexes:
+        print_indexes(engine)
+    unexpected = []
+    if everything or args.explain:
+        unexpected = print_plans(engine, verbose=args.verbose)
+    if (everything and not args.no_profile) or args.profile:
+        print_profile(engine, args.rounds, args.sample, args.limit)
+    if unexpected:
+        print(f"{len(unexpected)} consulta(s) con recorrido completo: {', '.join(p.name for p in unexpected)}")
+    return 1 if unexpected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
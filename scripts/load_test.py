@@ -0,0 +1,465 @@
+"""Prueba de carga y contención con varios terminales concurrentes.
+
+Simula N clientes (hilos, y opcionalmente varios procesos) que usan las funciones del repositorio
+contra una base SQLite local o un servidor compatible con MySQL:
+    python -m scripts.load_test --clients 8 --duration 30
+    python -m scripts.load_test --url mysql+mysqlconnector://u:p@host/inventory_test --clients 32 \\
+        --processes 4 --mix get=60,update=20,stock=15,insert=5 --stock-mode raw
+
+Operaciones (`--mix op=peso,...`):
+- list: `list_products` (lo que hace la UI al refrescar)    - get: `get_product` de un id al azar
+- update: lee la versión, espera `--think-ms` y guarda con `update_product(expected_version=...)`
+- stock: ±1 unidad sobre uno de los `--hot` productos calientes, según `--stock-mode`:
+  `atomic` (`adjust_stock`), `orm` (lectura + `update_product`, protegido por `version`) o
+  `raw` (lectura + UPDATE sin comprobar versión, como antes de la columna `version`)
+- insert: `insert_product`                                 - delete: `delete_product`
+
+Informe: percentiles de latencia por operación, throughput, errores clasificados (deadlock,
+espera de bloqueo, agotamiento del pool, conflictos de versión) y actualizaciones perdidas: al
+final se compara la `cantidad` de los productos calientes con la suma de los ajustes que cada
+cliente vio confirmados.
+
+Solo se tocan filas creadas por la prueba (nombre `Carga ...`); `--cleanup` las borra al final.
+Sin `--url` se usa una base SQLite temporal.
+"""
+
+import argparse
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+OPS = ('list', 'get', 'update', 'stock', 'insert', 'delete')
+DEFAULT_MIX = 'list=5,get=50,update=15,stock=20,insert=5,delete=5'
+STOCK_MODES = ('atomic', 'orm', 'raw')
+TIPOS = ["Bebida", "Condimento", "Enlatados", "Galletas", "Limpieza", "Lacteos", "Otros"]
+NAME_PREFIX = 'Carga'
+# Cantidad inicial de los productos calientes: los ajustes ±1 nunca la llevan a negativo
+HOT_STOCK = 1000000
+
+
+def parse_mix(spec):
+    """Parsea `op=peso,...` y devuelve `[(op, peso), ...]`."""
+    mix = []
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        op, _, weight = part.partition('=')
+        op = op.strip()
+        if op not in OPS:
+            raise ValueError(f"Operación desconocida en --mix: {op} (válidas: {', '.join(OPS)})")
+        weight = float(weight or 1)
+        if weight > 0:
+            mix.append((op, weight))
+    if not mix:
+        raise ValueError("--mix no tiene ninguna operación con peso > 0")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def classify_error(exc):
+    """Agrupa una excepción en una categoría del informe."""
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from sqlalchemy.orm.exc import StaleDataError
+    from app.repository import StaleProductError, InsufficientStockError
+
+    if isinstance(exc, PoolTimeoutError):
+        return 'pool_timeout'
+    if isinstance(exc, (StaleProductError, StaleDataError)):
+        return 'version_conflict'
+    if isinstance(exc, InsufficientStockError):
+        return 'insufficient_stock'
+    orig = getattr(exc, 'orig', None) or exc
+    code = getattr(orig, 'errno', None)
+    if code is None and getattr(orig, 'args', None) and isinstance(orig.args[0], int):
+        code = orig.args[0]
+    msg = str(orig).lower()
+    if code == 1213 or 'deadlock' in msg:
+        return 'deadlock'
+    if code == 1205 or 'lock wait timeout' in msg or 'database is locked' in msg:
+        return 'lock_timeout'
+    return type(exc).__name__
+
+
+def make_engine(config):
+    from sqlalchemy import create_engine, event
+
+    url = config['url']
+    kwargs = {'pool_size': config['pool_size'], 'max_overflow': config['max_overflow'],
+              'pool_timeout': config['pool_timeout'], 'pool_pre_ping': True}
+    if url.startswith('sqlite'):
+        kwargs['connect_args'] = {'check_same_thread': False, 'timeout': config['lock_timeout']}
+    engine = create_engine(url, **kwargs)
+    if url.startswith('sqlite'):
+        def _pragmas(dbapi_conn, record):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.close()
+        event.listen(engine, "connect", _pragmas)
+    return engine
+
+
+def seed(config):
+    """Crea el esquema si falta e inserta `--rows` productos de prueba. Devuelve sus ids."""
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base, Product
+    from app.categories import category_id
+
+    engine = make_engine(config)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(config['seed'])
+    with sessionmaker(bind=engine)() as s:
+        tipo_ids = [category_id(s, t) for t in TIPOS]
+        s.commit()
+        rows = []
+        for i in range(config['rows']):
+            hot = i < config['hot']
+            rows.append(Product(
+                name=f"{NAME_PREFIX} {'hot' if hot else 'row'} {i}",
+                tipo_id=rnd.choice(tipo_ids),
+                cantidad=HOT_STOCK if hot else rnd.randint(0, 500),
+                precio=round(rnd.uniform(0.5, 120.0), 2),
+                Fecha_Vencimiento=date(2030, 1, 1) + timedelta(days=rnd.randint(0, 900)),
+            ))
+        s.add_all(rows)
+        s.commit()
+        ids = [p.id for p in rows]
+    engine.dispose()
+    return ids
+
+
+class _Result:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.outcomes = Counter()
+        self.applied = Counter()
+        self.peak_connections = 0
+        self._lock = threading.Lock()
+
+    def merge(self, other):
+        with self._lock:
+            for op, values in other['latencies'].items():
+                self.latencies[op].extend(values)
+            self.errors.update(other['errors'])
+            self.outcomes.update(other['outcomes'])
+            self.applied.update({int(k): v for k, v in other['applied'].items()})
+            self.peak_connections = max(self.peak_connections, other['peak_connections'])
+
+    def as_dict(self):
+        return {'latencies': dict(self.latencies), 'errors': dict(self.errors),
+                'outcomes': dict(self.outcomes), 'applied': dict(self.applied),
+                'peak_connections': self.peak_connections}
+
+
+class _Client:
+    def __init__(self, client_id, config, factory, ids):
+        self.id = client_id
+        self.config = config
+        self.factory = factory
+        self.hot = ids[:config['hot']]
+        self.cold = ids[config['hot']:] or ids
+        self.rnd = random.Random(config['seed'] * 1000 + client_id)
+        self.inserted = 0
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.outcomes = Counter()
+        self.applied = Counter()
+
+    def _think(self):
+        if self.config['think_ms']:
+            time.sleep(self.config['think_ms'] / 1000.0)
+
+    def op_list(self):
+        from app.repository import list_products
+        with self.factory() as s:
+            list_products(s)
+
+    def op_get(self):
+        from app.repository import get_product
+        with self.factory() as s:
+            return 'found' if get_product(self.rnd.choice(self.cold), s) is not None else 'not_found'
+
+    def op_update(self):
+        from app.repository import get_product, update_product
+        pid = self.rnd.choice(self.hot + self.cold[:len(self.hot)] if self.hot else self.cold)
+        with self.factory() as s:
+            prod = get_product(pid, s)
+            if prod is None:
+                return 'not_found'
+            version = prod.version
+        # el usuario edita el formulario mientras otros terminales guardan
+        self._think()
+        with self.factory() as s:
+            update_product(s, pid, expected_version=version, precio=round(self.rnd.uniform(0.5, 120.0), 2))
+
+    def op_stock(self):
+        from sqlalchemy import select, update
+        from app.models import Product
+        from app.repository import adjust_stock, update_product
+        if not self.hot:
+            return 'no_hot_rows'
+        pid = self.rnd.choice(self.hot)
+        delta = self.rnd.choice((-1, 1))
+        mode = self.config['stock_mode']
+        with self.factory() as s:
+            if mode == 'atomic':
+                if not adjust_stock(s, pid, delta, allow_negative=True):
+                    return 'not_found'
+            elif mode == 'orm':
+                prod = s.get(Product, pid)
+                self._think()
+                update_product(s, pid, cantidad=(prod.cantidad or 0) + delta)
+            else:
+                qty = s.execute(select(Product.cantidad).where(Product.id == pid)).scalar()
+                self._think()
+                s.execute(update(Product).where(Product.id == pid).values(cantidad=(qty or 0) + delta)
+                          .execution_options(synchronize_session=False))
+                s.commit()
+        self.applied[pid] += delta
+
+    def op_insert(self):
+        from app.repository import insert_product
+        self.inserted += 1
+        with self.factory() as s:
+            insert_product(s, name=f"{NAME_PREFIX} {self.id}-{self.inserted}", tipo=self.rnd.choice(TIPOS),
+                           cantidad=self.rnd.randint(0, 100), Fecha_Vencimiento=date(2030, 1, 1))
+
+    def op_delete(self):
+        from app.repository import delete_product
+        with self.factory() as s:
+            return 'deleted' if delete_product(self.rnd.choice(self.cold), session=s) else 'not_found'
+
+    def run(self, mix, deadline, max_ops):
+        names = [op for op, _ in mix]
+        weights = [w for _, w in mix]
+        done = 0
+        while time.monotonic() < deadline and (not max_ops or done < max_ops):
+            op = self.rnd.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                outcome = getattr(self, 'op_' + op)()
+                if outcome:
+                    self.outcomes[f"{op}:{outcome}"] += 1
+            except Exception as e:
+                self.errors[f"{op}:{classify_error(e)}"] += 1
+            self.latencies[op].append((time.perf_counter() - start) * 1000.0)
+            done += 1
+
+
+def run_clients(config, client_ids, ids):
+    """Ejecuta `client_ids` en hilos de este proceso y devuelve los resultados (dict serializable)."""
+    from sqlalchemy import event
+    from sqlalchemy.orm import sessionmaker
+
+    engine = make_engine(config)
+    factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    checked_out = [0, 0]
+    lock = threading.Lock()
+
+    def _checkout(*_):
+        with lock:
+            checked_out[0] += 1
+            checked_out[1] = max(checked_out[1], checked_out[0])
+
+    def _checkin(*_):
+        with lock:
+            checked_out[0] -= 1
+
+    event.listen(engine, "checkout", _checkout)
+    event.listen(engine, "checkin", _checkin)
+
+    mix = parse_mix(config['mix'])
+    deadline = time.monotonic() + config['duration']
+    clients = [_Client(cid, config, factory, ids) for cid in client_ids]
+    threads = [threading.Thread(target=c.run, args=(mix, deadline, config['ops']), daemon=True) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    result = _Result()
+    for c in clients:
+        result.merge({'latencies': c.latencies, 'errors': c.errors, 'outcomes': c.outcomes,
+                      'applied': c.applied, 'peak_connections': 0})
+    result.peak_connections = checked_out[1]
+    return result.as_dict()
+
+
+def use_database(url):
+    """Apunta `app.db` (que crea su engine al importarse) a `url`, sin eco de SQL."""
+    os.environ['DATABASE_URL'] = url
+    os.environ.setdefault('DB_ECHO', '0')
+
+
+def _run_process(args):
+    # Proceso hijo (spawn): fijar la URL antes de que los clientes importen `app`
+    use_database(args[0]['url'])
+    return run_clients(*args)
+
+
+def lost_updates(config, ids, applied):
+    """Compara la cantidad final de los productos calientes con los ajustes confirmados."""
+    from sqlalchemy import select
+    from app.models import Product
+
+    hot = ids[:config['hot']]
+    if not hot:
+        return {}
+    engine = make_engine(config)
+    with engine.connect() as conn:
+        actual = dict(conn.execute(select(Product.id, Product.cantidad).where(Product.id.in_(hot))).all())
+    engine.dispose()
+    # Cada ajuste perdido es un ±1 sobrescrito: la diferencia neta es una cota inferior
+    return {pid: (HOT_STOCK + applied.get(pid, 0)) - actual.get(pid, HOT_STOCK) for pid in hot}
+
+
+def cleanup(config):
+    from sqlalchemy import delete
+    from app.models import Product
+
+    engine = make_engine(config)
+    with engine.begin() as conn:
+        count = conn.execute(delete(Product).where(Product.name.like(f"{NAME_PREFIX} %"))).rowcount
+    engine.dispose()
+    return count
+
+
+def run(config):
+    """Siembra, ejecuta la carga y devuelve el informe como dict."""
+    use_database(config['url'])
+    ids = seed(config)
+    clients = list(range(config['clients']))
+    started = time.perf_counter()
+    result = _Result()
+    processes = max(1, min(config['processes'], len(clients)))
+    if processes == 1:
+        result.merge(run_clients(config, clients, ids))
+    else:
+        groups = [clients[i::processes] for i in range(processes)]
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(processes) as pool:
+            for partial in pool.map(_run_process, [(config, g, ids) for g in groups]):
+                result.merge(partial)
+    elapsed = time.perf_counter() - started
+
+    ops = {}
+    total = 0
+    for op, values in sorted(result.latencies.items()):
+        values.sort()
+        total += len(values)
+        errors = sum(n for k, n in result.errors.items() if k.startswith(op + ':'))
+        ops[op] = {'count': len(values), 'errors': errors,
+                   'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95),
+                   'p99_ms': percentile(values, 99), 'max_ms': values[-1] if values else None}
+    lost = lost_updates(config, ids, result.applied)
+    errors_by_kind = Counter()
+    for key, n in result.errors.items():
+        errors_by_kind[key.split(':', 1)[1]] += n
+    report = {
+        'config': {k: v for k, v in config.items()},
+        'elapsed_s': elapsed,
+        'total_ops': total,
+        'throughput_ops_s': total / elapsed if elapsed > 0 else 0.0,
+        'ops': ops,
+        'errors': dict(result.errors),
+        'errors_by_kind': dict(errors_by_kind),
+        'outcomes': dict(result.outcomes),
+        'deadlocks': errors_by_kind.get('deadlock', 0),
+        'lock_timeouts': errors_by_kind.get('lock_timeout', 0),
+        'pool_timeouts': errors_by_kind.get('pool_timeout', 0),
+        'version_conflicts': errors_by_kind.get('version_conflict', 0),
+        'lost_updates': sum(abs(v) for v in lost.values()),
+        'lost_updates_by_product': {pid: v for pid, v in lost.items() if v},
+        'peak_connections': result.peak_connections,
+    }
+    if config['cleanup']:
+        report['cleaned_rows'] = cleanup(config)
+    return report
+
+
+def print_report(report):
+    cfg = report['config']
+    print(f"{cfg['clients']} clientes en {cfg['processes']} proceso(s), {report['elapsed_s']:.1f} s, "
+          f"mix {cfg['mix']}, stock {cfg['stock_mode']}")
+    print(f"{'operación':<10}{'n':>8}{'errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    fmt = lambda v: f"{v:>10.1f}" if v is not None else f"{'-':>10}"
+    for op, st in report['ops'].items():
+        print(f"{op:<10}{st['count']:>8}{st['errors']:>9}{fmt(st['p50_ms'])}{fmt(st['p95_ms'])}"
+              f"{fmt(st['p99_ms'])}{fmt(st['max_ms'])}")
+    print(f"throughput: {report['throughput_ops_s']:.1f} ops/s  ({report['total_ops']} operaciones)")
+    print(f"deadlocks: {report['deadlocks']}  esperas de bloqueo: {report['lock_timeouts']}  "
+          f"pool agotado: {report['pool_timeouts']}  conflictos de versión: {report['version_conflicts']}")
+    print(f"actualizaciones perdidas: {report['lost_updates']}  conexiones simultáneas (máx.): {report['peak_connections']}")
+    others = {k: v for k, v in report['errors_by_kind'].items()
+              if k not in ('deadlock', 'lock_timeout', 'pool_timeout', 'version_conflict')}
+    if others:
+        print("otros errores:", ", ".join(f"{k}={v}" for k, v in sorted(others.items())))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente del repositorio")
+    parser.add_argument('--url', help="URL de SQLAlchemy (por defecto una SQLite temporal)")
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=1, help="repartir los clientes en N procesos")
+    parser.add_argument('--duration', type=float, default=10.0, help="segundos de carga")
+    parser.add_argument('--ops', type=int, default=0, help="máximo de operaciones por cliente (0 = sin límite)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"pesos por operación (por defecto {DEFAULT_MIX})")
+    parser.add_argument('--stock-mode', choices=STOCK_MODES, default='atomic')
+    parser.add_argument('--rows', type=int, default=1000, help="productos sembrados para la prueba")
+    parser.add_argument('--hot', type=int, default=5, help="productos calientes (contención de stock/edición)")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="pausa entre leer y guardar (update/stock)")
+    parser.add_argument('--pool-size', type=int, default=5)
+    parser.add_argument('--max-overflow', type=int, default=10)
+    parser.add_argument('--pool-timeout', type=float, default=30.0)
+    parser.add_argument('--lock-timeout', type=float, default=5.0, help="espera de bloqueo en SQLite (s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cleanup', action='store_true', help="borrar las filas de prueba al terminar")
+    parser.add_argument('--json', help="guardar el informe completo en este archivo")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    parse_mix(args.mix)
+    tmp = None
+    url = args.url
+    if not url:
+        tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp.name, 'load_test.db')}"
+    config = {
+        'url': url, 'clients': args.clients, 'processes': args.processes, 'duration': args.duration,
+        'ops': args.ops, 'mix': args.mix, 'stock_mode': args.stock_mode, 'rows': args.rows,
+        'hot': min(args.hot, args.rows), 'think_ms': args.think_ms, 'pool_size': args.pool_size,
+        'max_overflow': args.max_overflow, 'pool_timeout': args.pool_timeout,
+        'lock_timeout': args.lock_timeout, 'seed': args.seed, 'cleanup': args.cleanup,
+    }
+    try:
+        report = run(config)
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1, default=str)
+    return report
+
+
+if __name__ == "__main__":
+    main()
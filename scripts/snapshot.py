@@ -0,0 +1,77 @@
+"""Snapshot binario y restauración del inventario.
+
+Uso:
+    python -m scripts.snapshot create inventario.invsnap
+    python -m scripts.snapshot info inventario.invsnap
+    python -m scripts.snapshot restore inventario.invsnap --url mysql+mysqlconnector://u:p@host/tienda2
+    python -m scripts.snapshot restore inventario.invsnap --replace   # reemplaza los productos existentes
+
+Sin `--url` usa la base configurada por `DATABASE_URL`. La base destino debe tener el esquema en
+la misma revisión de Alembic que el origen (`alembic upgrade head`); `--create-schema` crea las
+tablas con los modelos actuales (útil para bases de prueba). Las categorías que siembra la
+migración se reemplazan por las del snapshot; sin `--replace` la tabla productos debe estar vacía.
+"""
+
+import argparse
+import time
+
+
+def _engine(url):
+    if url:
+        from sqlalchemy import create_engine
+        return create_engine(url)
+    from app.db import engine
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot binario y restauración del inventario")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_create = sub.add_parser('create', help="guardar productos y categorías en un snapshot")
+    p_create.add_argument('path')
+    p_create.add_argument('--url', help="base de origen (por defecto DATABASE_URL)")
+    p_create.add_argument('--chunk-rows', type=int, default=None)
+    p_info = sub.add_parser('info', help="mostrar cabecera y filas de un snapshot")
+    p_info.add_argument('path')
+    p_restore = sub.add_parser('restore', help="cargar un snapshot en la base")
+    p_restore.add_argument('path')
+    p_restore.add_argument('--url', help="base destino (por defecto DATABASE_URL)")
+    p_restore.add_argument('--replace', action='store_true', help="borrar los productos actuales (las categorías se reemplazan siempre)")
+    p_restore.add_argument('--batch-size', type=int, default=None)
+    p_restore.add_argument('--force', action='store_true', help="permitir una revisión de Alembic distinta")
+    p_restore.add_argument('--create-schema', action='store_true', help="crear las tablas si no existen")
+    args = parser.parse_args(argv)
+
+    from app import snapshot
+
+    if args.command == 'info':
+        info = snapshot.snapshot_info(args.path)
+        print(f"formato {info['format']}  revisión {info['alembic_revision']}  creado {info['created_at']}")
+        for name, count in info['rows'].items():
+            print(f"  {name}: {count} filas")
+        return info
+
+    engine = _engine(args.url)
+    start = time.perf_counter()
+    if args.command == 'create':
+        kwargs = {'chunk_rows': args.chunk_rows} if args.chunk_rows else {}
+        result = snapshot.create_snapshot(engine, args.path, **kwargs)
+        counts = result['rows']
+        print(f"Snapshot {args.path} (revisión {result['alembic_revision']})")
+    else:
+        if args.create_schema:
+            from app.models import Base
+            Base.metadata.create_all(bind=engine)
+        kwargs = {'batch_size': args.batch_size} if args.batch_size else {}
+        counts = snapshot.restore_snapshot(engine, args.path, replace=args.replace,
+                                           allow_revision_mismatch=args.force, **kwargs)
+        print(f"Restaurado {args.path}")
+    elapsed = time.perf_counter() - start
+    for name, count in counts.items():
+        print(f"  {name}: {count} filas")
+    print(f"  {elapsed:.2f} s")
+    return counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Category
+from app.categories import TipoOptionsCache, category_id, normalize_tipo
+
+
+def test_options_reload_only_when_mtime_changes(tmp_path):
+    p = tmp_path / 'tipos.txt'
+    p.write_text("bebida\nOtros\n", encoding='utf-8')
+    reloads = []
+    cache = TipoOptionsCache([p], on_reload=lambda: reloads.append(1))
+    assert cache.get() == ['Bebida', 'Otros']
+    assert cache.get() == ['Bebida', 'Otros']
+    assert len(reloads) == 1
+    p.write_text("Lacteos\n", encoding='utf-8')
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get() == ['Lacteos']
+    assert len(reloads) == 2
+
+
+def test_category_id_creates_once_and_caches(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as s:
+        cid = category_id(s, 'bebida')
+        s.commit()
+        assert category_id(s, ' Bebida ') == cid
+        assert category_id(s, 'Nueva', create=False) is None
+        assert s.query(Category).count() == 1
+    assert normalize_tipo('aseo personal') == 'Aseo personal'
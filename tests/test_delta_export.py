@@ -0,0 +1,48 @@
+import csv
+from datetime import date
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.repository import insert_product, update_product, delete_product
+from app.delta_export import export_delta, compact, read_manifest
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    s = sessionmaker(bind=engine)()
+    yield s
+    s.close()
+
+
+def _read(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize('mode', ['files', 'append'])
+def test_delta_then_compact_matches_full_snapshot(session, tmp_path, mode):
+    out = tmp_path / 'inventario.csv'
+    ids = [insert_product(session, name=n, tipo='Bebida', cantidad=1, Fecha_Vencimiento=date(2030, 1, 1)).id
+           for n in ('A', 'B', 'C')]
+    first = export_delta(session, out, mode=mode)
+    assert first['full'] and first['rows'] == 3
+
+    # sin cambios no se escribe ningún delta
+    assert export_delta(session, out, mode=mode)['file'] is None
+
+    update_product(session, ids[0], cantidad=9)
+    delete_product(ids[1], session=session)
+    insert_product(session, name='D', tipo='Otros', Fecha_Vencimiento=date(2030, 1, 1))
+    result = export_delta(session, out, mode=mode)
+    assert (result['upserts'], result['deletes']) == (2, 1)
+    ops = sorted(r['_op'] for r in _read(result['file']))
+    assert ops == ['delete', 'upsert', 'upsert']
+
+    assert compact(out) == 3
+    rows = _read(out)
+    assert [r['name'] for r in rows] == ['A', 'C', 'D']
+    assert rows[0]['cantidad'] == '9'
+    assert read_manifest(out)['deltas'] == []
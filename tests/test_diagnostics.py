@@ -0,0 +1,64 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Product
+from app.metrics import instrument_engine, registry
+from app.repository import insert_product, update_product
+from app.diagnostics import (
+    table_stats, index_report, explain_queries, explain_statement, unexpected_full_scans, profile_reads,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = instrument_engine(create_engine(f"sqlite:///{tmp_path / 'inv.db'}"))
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as s:
+        for i in range(30):
+            insert_product(s, name=f"P{i}", tipo='Bebida' if i % 2 else 'Limpieza', cantidad=i,
+                           Fecha_Vencimiento=date(2030, 1, 1))
+    return engine
+
+
+def test_table_stats_and_indexes(engine):
+    stats = {st.table: st for st in table_stats(engine)}
+    assert stats['productos'].rows == 30 and stats['categorias'].rows == 2
+    names = {ix.name for ix in index_report(engine) if ix.table == 'productos'}
+    assert {'PRIMARY', 'ix_productos_tipo_id_cantidad', 'ix_productos_Fecha_Modificacion'} <= names
+
+
+def test_repository_queries_use_indexes(engine):
+    with sessionmaker(bind=engine)() as s:
+        update_product(s, 30, cantidad=5)
+    executed = []
+    event.listen(engine, "before_cursor_execute", lambda c, cur, sql, *a: executed.append(sql))
+    plans = explain_queries(engine)
+    assert not registry.enabled
+    by_name = {}
+    for p in plans:
+        by_name.setdefault(p.name, []).append(p)
+    listing = by_name['repository.list_products / iter_products'][0]
+    assert listing.full_scans == ['productos'] and listing.expected_full_scan
+    assert unexpected_full_scans(plans) == [], [(p.name, p.plan) for p in unexpected_full_scans(plans)]
+    # las escrituras solo se analizan: ningún UPDATE/DELETE/INSERT llega a ejecutarse
+    assert not [sql for sql in executed if sql.split(None, 1)[0].upper() in ('UPDATE', 'DELETE', 'INSERT')]
+    with engine.connect() as conn:
+        version = conn.execute(select(Product.version).where(Product.id == 30)).scalar()
+    update_sql = by_name['repository.update_product'][0].sql
+    assert version == 2 and update_sql.startswith('UPDATE') and "version = 2" in update_sql
+    for name in ('repository.delete_products_where(expired_before)', 'delta_export.export_delta',
+                 'stock_alerts.changed_since', 'repository.adjust_stock'):
+        assert name in by_name
+    with engine.connect() as conn:
+        plan = explain_statement(conn, 'marca', select(Product).where(Product.Marca == 'X'))
+    assert plan.full_scans == ['productos']
+    assert unexpected_full_scans([plan]) == [plan]
+
+
+def test_profile_reads_reports_slowest_statements(engine):
+    assert not registry.enabled
+    slowest, operations = profile_reads(engine, rounds=2, sample=5, seed=1)
+    assert slowest and all(st['count'] >= 1 for _sql, st in slowest)
+    assert operations['repository.get_product']['count'] == 10
+    assert not registry.enabled
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 import pytest
-from app.exporter import export_csv, export_xlsx, export_pdf, MissingDependencyError
+from app.exporter import export_csv, export_xlsx, export_pdf, export_parquet, export_to, MissingDependencyError
 
 SAMPLE_DATA = [
     {'id': 1, 'name': 'Producto A', 'tipo': 'Tipo1', 'descripcion': 'Desc', 'cantidad': 10, 'Marca': 'M', 'precio': 9.99, 'Fecha_Vencimiento': '2026-01-01', 'Fecha_Registro': '2026-01-01'},
@@ -37,3 +37,69 @@ def test_export_pdf(tmp_path):
     except MissingDependencyError:
         pytest.skip('reportlab missing')
     assert p.exists() and p.stat().st_size > 0
+
+
+def test_export_csv_gzip_streams_iterable(tmp_path):
+    import gzip
+    p = tmp_path / "out.csv.gz"
+    export_to('csv.gz', str(p), iter(SAMPLE_DATA), FIELDNAMES)
+    text = gzip.decompress(p.read_bytes()).decode('utf-8')
+    assert 'Producto B' in text and text.startswith('id,name')
+
+
+def test_export_csv_zstd(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    p = tmp_path / "out.csv.zst"
+    export_to('csv.zst', str(p), SAMPLE_DATA, FIELDNAMES)
+    with zstandard.ZstdDecompressor().stream_reader(p.open('rb')) as r:
+        assert 'Producto A' in r.read().decode('utf-8')
+
+
+def test_export_parquet_typed_columns(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    p = tmp_path / "out.parquet"
+    export_parquet(str(p), iter(SAMPLE_DATA), FIELDNAMES, row_group_size=1)
+    f = pq.ParquetFile(str(p))
+    assert f.metadata.num_row_groups == 2
+    table = f.read()
+    assert str(table.schema.field('precio').type) == 'double'
+    assert str(table.schema.field('Fecha_Vencimiento').type) == 'date32[day]'
+    assert table.column('cantidad').to_pylist() == [10, 5]
+
+
+def test_export_csv_reports_progress(tmp_path, monkeypatch):
+    import app.exporter as exporter
+    monkeypatch.setattr(exporter, 'CHUNK_SIZE', 1)
+    seen = []
+    export_csv(str(tmp_path / "out.csv"), iter(SAMPLE_DATA), FIELDNAMES, progress=seen.append, total=2)
+    assert [(p.done, p.total, p.phase) for p in seen] == [(1, 2, 'write'), (2, 2, 'write')]
+    assert all(p.rows_per_sec >= 0 for p in seen)
+
+
+def test_cancelled_export_removes_partial_file(tmp_path):
+    from app.exporter import CancelToken, ExportCancelled
+    p = tmp_path / "out.csv.gz"
+    token = CancelToken()
+
+    def on_progress(progress):
+        token.cancel()
+
+    with pytest.raises(ExportCancelled):
+        export_to('csv.gz', str(p), SAMPLE_DATA * 600, FIELDNAMES, progress=on_progress, cancel=token)
+    assert not p.exists()
+
+
+def test_export_xlsx_records_convert_phase(tmp_path, monkeypatch):
+    pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+    from app.metrics import MemorySink, registry
+    monkeypatch.setattr('app.exporter.CHUNK_SIZE', 1)
+    sink = MemorySink()
+    registry.configure(sink)
+    try:
+        export_xlsx(str(tmp_path / "out.xlsx"), SAMPLE_DATA, FIELDNAMES)
+    finally:
+        registry.disable()
+    phases = {r['metric']: r for r in sink.records}
+    assert phases['export.convert']['rows'] == 2 and phases['export.convert']['format'] == 'xlsx'
+    assert phases['export.write']['rows'] == 2
@@ -0,0 +1,24 @@
+import pytest
+from scripts.load_test import parse_mix, percentile, run
+
+
+def test_parse_mix_and_percentiles():
+    assert parse_mix('get=3,stock=1,delete=0') == [('get', 3.0), ('stock', 1.0)]
+    with pytest.raises(ValueError):
+        parse_mix('vender=1')
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 100)) == (50, 95, 100)
+
+
+def test_atomic_stock_adjustments_lose_nothing(tmp_path):
+    config = {
+        'url': f"sqlite:///{tmp_path / 'load.db'}", 'clients': 4, 'processes': 1, 'duration': 5.0,
+        'ops': 40, 'mix': 'get=1,stock=3,update=1', 'stock_mode': 'atomic', 'rows': 50, 'hot': 3,
+        'think_ms': 0, 'pool_size': 4, 'max_overflow': 0, 'pool_timeout': 5.0, 'lock_timeout': 5.0,
+        'seed': 1, 'cleanup': True,
+    }
+    report = run(config)
+    assert report['total_ops'] == 160
+    assert report['ops']['stock']['count'] > 0 and report['ops']['stock']['errors'] == 0
+    assert report['lost_updates'] == 0 and report['deadlocks'] == 0
+    assert report['cleaned_rows'] >= 50
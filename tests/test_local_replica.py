@@ -0,0 +1,226 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine, event, select, update
+from sqlalchemy.exc import OperationalError
+from app.models import Base, Product, Category
+from app.local_replica import LocalReplica
+from app.repository import insert_product, update_product, delete_product, adjust_prices, adjust_stock
+
+
+def _make(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+    event.listen(primary, "connect", lambda c, r: c.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=primary)
+    # el central ya tiene categorías con ids distintos a los que creará la réplica
+    with primary.begin() as conn:
+        conn.execute(Category.__table__.insert(), [{'nombre': 'Lacteos'}, {'nombre': 'Otros'}])
+    replica = LocalReplica(str(tmp_path / 'local.db'), primary=primary, batch_size=10)
+    return primary, replica
+
+
+def _central_rows(primary):
+    with primary.connect() as conn:
+        return {r.id: r for r in conn.execute(select(Product.__table__))}
+
+
+def test_local_writes_are_synced(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        prod = insert_product(s, name='Agua', tipo='Bebida', cantidad=3, Fecha_Vencimiento=date(2030, 1, 1))
+        assert prod.id < 0
+    assert replica.pending_count() == 1
+    assert replica.sync() is True
+    assert replica.pending_count() == 0
+    rows = _central_rows(primary)
+    assert len(rows) == 1
+    (pid, row), = rows.items()
+    assert row.name == 'Agua' and row.Fecha_Registro is not None
+    with primary.connect() as conn:
+        assert conn.execute(select(Category.nombre).where(Category.id == row.tipo_id)).scalar() == 'Bebida'
+    # la copia local usa ya el id definitivo
+    with replica.SessionLocal() as s:
+        assert s.get(Product, pid).name == 'Agua'
+        update_product(s, pid, cantidad=7)
+    delete_product(pid, session=replica.SessionLocal())
+    replica.sync()
+    assert _central_rows(primary) == {}
+
+
+def test_stale_update_is_reported_as_conflict(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Arroz', tipo='Otros', cantidad=10, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    (pid, _), = _central_rows(primary).items()
+    # otro terminal modifica la fila en el central
+    with primary.begin() as conn:
+        conn.execute(update(Product.__table__).where(Product.__table__.c.id == pid).values(cantidad=4))
+    with replica.SessionLocal() as s:
+        update_product(s, pid, cantidad=9)
+    replica.sync_once()
+    assert _central_rows(primary)[pid].cantidad == 4
+    conflicts = replica.conflicts()
+    assert len(conflicts) == 1 and 'cantidad' in conflicts[0].error
+
+
+def test_bulk_statements_are_captured_per_row(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        for name in ('A', 'B'):
+            insert_product(s, name=name, tipo='Bebida', precio=10.0, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    with replica.SessionLocal() as s:
+        assert adjust_prices(s, 10, tipo='Bebida') == 2
+    assert replica.pending_count() == 2
+    replica.sync()
+    assert sorted(r.precio for r in _central_rows(primary).values()) == [11.0, 11.0]
+
+
+def test_stock_adjustments_sync_as_increments(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Pan', tipo='Otros', cantidad=10, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    (pid, _), = _central_rows(primary).items()
+    # otro terminal vende 2 unidades en el central mientras aquí se venden 3
+    with primary.begin() as conn:
+        conn.execute(update(Product.__table__).where(Product.__table__.c.id == pid).values(cantidad=8))
+    with replica.SessionLocal() as s:
+        assert adjust_stock(s, pid, -3)
+    replica.sync()
+    assert _central_rows(primary)[pid].cantidad == 5
+    assert replica.conflicts() == []
+
+
+def test_version_bump_in_central_is_a_conflict(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Te', tipo='Bebida', Marca='A', Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    (pid, _), = _central_rows(primary).items()
+    # otro terminal guarda el mismo valor: solo cambia la versión
+    with primary.begin() as conn:
+        t = Product.__table__
+        conn.execute(update(t).where(t.c.id == pid).values(Marca='A', version=t.c.version + 1))
+    with replica.SessionLocal() as s:
+        update_product(s, pid, Marca='B')
+    replica.sync_once()
+    assert _central_rows(primary)[pid].Marca == 'A'
+    assert 'version' in replica.conflicts()[0].error
+
+
+def _local_rows(replica):
+    with replica.engine.connect() as conn:
+        return {r.id: r for r in conn.execute(select(Product.__table__))}
+
+
+def test_refresh_pulls_only_changed_rows_and_deletes(tmp_path):
+    primary, _ = _make(tmp_path)
+    replica = LocalReplica(str(tmp_path / 'inc.db'), primary=primary, overlap_seconds=0)
+    with replica.SessionLocal() as s:
+        for name in ('A', 'B', 'D'):
+            insert_product(s, name=name, tipo='Bebida', cantidad=1, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    ids = {r.name: pid for pid, r in _central_rows(primary).items()}
+    t = Product.__table__
+    with primary.begin() as conn:
+        conn.execute(update(t).values(Fecha_Modificacion=datetime(2000, 1, 1)))
+        # la marca de agua es la fila más reciente del central (inclusive)
+        conn.execute(update(t).where(t.c.id == ids['B']).values(Fecha_Modificacion=datetime(2000, 1, 2)))
+    assert replica.refresh_from_primary()
+    # copia local alterada a mano: como la fila no cambió en el central no se vuelve a traer
+    with replica.engine.begin() as conn:
+        conn.execute(update(t).where(t.c.id == ids['A']).values(name='Local'))
+    with primary.begin() as conn:
+        conn.execute(update(t).where(t.c.id == ids['B']).values(cantidad=99, Fecha_Modificacion=datetime(2099, 1, 1)))
+        conn.execute(t.delete().where(t.c.id == ids['D']))
+        tipo_id = conn.execute(select(t.c.tipo_id).where(t.c.id == ids['A'])).scalar()
+        conn.execute(t.insert().values(name='C', tipo_id=tipo_id, Fecha_Vencimiento=date(2030, 1, 1),
+                                       Fecha_Modificacion=datetime(2099, 1, 1)))
+    assert replica.refresh_from_primary()
+    local = {r.name: r for r in _local_rows(replica).values()}
+    assert sorted(local) == ['B', 'C', 'Local']
+    assert local['B'].cantidad == 99
+
+
+def test_replayed_entries_are_not_applied_twice(tmp_path, monkeypatch):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Agua', tipo='Bebida', cantidad=5, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    (pid, _), = _central_rows(primary).items()
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Pan', tipo='Otros', cantidad=1, Fecha_Vencimiento=date(2030, 1, 1))
+        adjust_stock(s, pid, -2)
+
+    # el central confirma pero el marcado local se pierde (conexión caída)
+    def _lost(*args, **kwargs):
+        raise OperationalError("UPDATE outbox", {}, Exception("disk I/O error"))
+    monkeypatch.setattr(replica.engine, 'begin', _lost)
+    with pytest.raises(OperationalError):
+        replica.sync_once()
+    monkeypatch.undo()
+    assert replica.sync() is True
+    rows = _central_rows(primary)
+    assert sorted(r.name for r in rows.values()) == ['Agua', 'Pan']
+    assert rows[pid].cantidad == 3
+
+
+def test_sync_worker_purges_old_tokens_periodically(tmp_path):
+    from datetime import timedelta
+    from sqlalchemy import func, inspect
+    from app.local_replica import SyncWorker, sync_tokens
+    primary, replica = _make(tmp_path)
+    assert not inspect(replica.engine).has_table('sync_tokens')
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Agua', tipo='Bebida', cantidad=5, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    with primary.begin() as conn:
+        now = conn.execute(select(func.now())).scalar()
+        conn.execute(sync_tokens.insert().values(token='viejo', product_id=1, created_at=now - timedelta(days=30)))
+    worker = SyncWorker(replica, token_purge_interval=3600)
+    worker._purge_tokens_if_due()
+    with primary.connect() as conn:
+        assert conn.execute(select(sync_tokens.c.token).where(sync_tokens.c.token == 'viejo')).scalar() is None
+        assert conn.execute(select(func.count()).select_from(sync_tokens)).scalar() == 1
+    # no vuelve a purgar hasta que pase el intervalo
+    with primary.begin() as conn:
+        conn.execute(sync_tokens.insert().values(token='otro', product_id=1, created_at=now - timedelta(days=30)))
+    worker._purge_tokens_if_due()
+    with primary.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(sync_tokens)).scalar() == 2
+
+
+def test_failed_entry_does_not_block_outbox(tmp_path):
+    primary, replica = _make(tmp_path)
+    with primary.begin() as conn:
+        conn.exec_driver_sql("CREATE UNIQUE INDEX ux_productos_name ON productos (name)")
+        conn.execute(Product.__table__.insert().values(name='Agua', tipo_id=1, Fecha_Vencimiento=date(2030, 1, 1)))
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Agua', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1))
+        insert_product(s, name='Pan', tipo='Otros', Fecha_Vencimiento=date(2030, 1, 1))
+    assert replica.sync() is True
+    assert replica.pending_count() == 0
+    failures = replica.failures()
+    assert len(failures) == 1 and 'IntegrityError' in failures[0].error
+    assert sorted(r.name for r in _central_rows(primary).values()) == ['Agua', 'Pan']
+    # la copia local vuelve a coincidir con el central
+    assert sorted(r.name for r in _local_rows(replica).values()) == ['Agua', 'Pan']
+
+
+def test_stock_adjustment_cannot_oversell_central(tmp_path):
+    primary, replica = _make(tmp_path)
+    with replica.SessionLocal() as s:
+        insert_product(s, name='Pan', tipo='Otros', cantidad=5, Fecha_Vencimiento=date(2030, 1, 1))
+    replica.sync()
+    (pid, _), = _central_rows(primary).items()
+    # otro terminal vendió 4 unidades: en el central solo queda 1
+    with primary.begin() as conn:
+        conn.execute(update(Product.__table__).where(Product.__table__.c.id == pid).values(cantidad=1))
+    with replica.SessionLocal() as s:
+        assert adjust_stock(s, pid, -3)
+    replica.sync()
+    assert _central_rows(primary)[pid].cantidad == 1
+    assert 'Stock insuficiente' in replica.conflicts()[0].error
+    # la copia local vuelve a la cantidad del central
+    assert _local_rows(replica)[pid].cantidad == 1
@@ -0,0 +1,49 @@
+import json
+from sqlalchemy import create_engine, text
+from app.metrics import MetricsRegistry, MemorySink, JsonLinesSink, instrument_engine, sink_from_spec
+
+
+def test_disabled_registry_records_nothing():
+    reg = MetricsRegistry()
+    with reg.timer("op") as span:
+        assert span is None
+    assert reg.snapshot() == {}
+
+
+def test_timer_counts_sql_statements():
+    sink = MemorySink()
+    reg = MetricsRegistry(sink)
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, reg)
+    with reg.timer("repository.list_products", rows=0):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    assert len(sink.records) == 1
+    rec = sink.records[0]
+    assert rec['metric'] == 'repository.list_products'
+    assert rec['sql_count'] == 2
+    assert rec['duration_ms'] >= rec['sql_ms'] >= 0
+    assert reg.snapshot()['repository.list_products']['count'] == 1
+    assert reg.slowest_statements(1)[0][1]['count'] >= 1
+
+
+def test_capture_sql_records_statements_and_parameters():
+    reg = MetricsRegistry(MemorySink())
+    engine = instrument_engine(create_engine("sqlite://"), reg)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 0"))
+        with reg.capture_sql() as captured, reg.timer("op"):
+            conn.execute(text("SELECT :x"), {'x': 5})
+        conn.execute(text("SELECT 2"))
+    assert captured == [('op', 'SELECT ?', (5,))]
+
+
+def test_jsonl_sink(tmp_path):
+    p = tmp_path / "metrics.jsonl"
+    reg = MetricsRegistry(sink_from_spec(f"jsonl:{p}"))
+    assert isinstance(reg.sink, JsonLinesSink)
+    with reg.timer("export.write", format='csv'):
+        pass
+    line = json.loads(p.read_text(encoding='utf-8').strip())
+    assert line['metric'] == 'export.write' and line['format'] == 'csv'
@@ -0,0 +1,28 @@
+import importlib.util
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+VERSIONS = Path(__file__).resolve().parent.parent / 'alembic' / 'versions'
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(name, VERSIONS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_categorias_backfill_uses_normalized_names():
+    migration = _load('d4e5f6a7b8c9_add_categorias_table')
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE productos (id INTEGER PRIMARY KEY, tipo VARCHAR(255), tipo_id INTEGER)"))
+        conn.execute(text("CREATE TABLE categorias (id INTEGER PRIMARY KEY, nombre VARCHAR(255) UNIQUE)"))
+        conn.execute(text("INSERT INTO productos (tipo) VALUES ('bebida'), ('  Bebida'), ('Lacteos'), (''), ('nuevo ')"))
+        names = migration._seed_names(conn)
+        assert names.count('Bebida') == 1 and 'Nuevo' in names
+        conn.execute(text("INSERT INTO categorias (nombre) VALUES (:n)"), [{'n': n} for n in names])
+        migration._assign_tipo_ids(conn)
+        rows = conn.execute(text(
+            "SELECT p.tipo, c.nombre FROM productos p JOIN categorias c ON c.id = p.tipo_id ORDER BY p.id")).all()
+    assert [n for _t, n in rows] == ['Bebida', 'Bebida', 'Lacteos', 'Otros', 'Nuevo']
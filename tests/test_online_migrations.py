@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import create_engine, select, func, table, column, Integer
+
+from app.online_migrations import backfill, job_status
+
+
+def _make(tmp_path, n=25):
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE productos (id INTEGER PRIMARY KEY, cantidad INTEGER, stock_minimo INTEGER)")
+        conn.exec_driver_sql("INSERT INTO productos (id, cantidad) VALUES " + ", ".join(f"({i}, {i})" for i in range(1, n + 1)))
+    t = table('productos', column('id', Integer), column('cantidad', Integer), column('stock_minimo', Integer))
+    return engine, t
+
+
+def _pending(engine, t):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(t).where(t.c.stock_minimo.is_(None))).scalar()
+
+
+def test_backfill_in_batches_reports_progress(tmp_path):
+    engine, t = _make(tmp_path)
+    seen = []
+    result = backfill(engine, t, {'stock_minimo': t.c.cantidad // 5}, where=t.c.stock_minimo.is_(None),
+                      job='stock_minimo', batch_size=10, pause=0, progress=seen.append)
+    assert [p.last_id for p in seen] == [10, 20, 25]
+    assert result.done and result.rows == 25
+    assert _pending(engine, t) == 0
+    assert job_status(engine, 'stock_minimo')['done']
+
+
+def test_interrupted_backfill_resumes(tmp_path):
+    engine, t = _make(tmp_path)
+
+    def stop_after_first(p):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        backfill(engine, t, {'stock_minimo': 0}, where=t.c.stock_minimo.is_(None),
+                 job='job', batch_size=10, pause=0, progress=stop_after_first)
+    assert _pending(engine, t) == 15
+    assert job_status(engine, 'job')['last_id'] == 10
+
+    result = backfill(engine, t, {'stock_minimo': 0}, where=t.c.stock_minimo.is_(None), job='job', batch_size=10, pause=0)
+    assert result.batches == 2 and result.rows == 25
+    assert _pending(engine, t) == 0
+    # un trabajo terminado no vuelve a recorrer la tabla
+    assert backfill(engine, t, {'stock_minimo': 1}, job='job', pause=0).batches == 0
+
+
+def test_connection_inside_transaction_is_rejected(tmp_path):
+    engine, t = _make(tmp_path)
+    with engine.begin() as conn:
+        with pytest.raises(ValueError):
+            backfill(conn, t, {'stock_minimo': 0}, pause=0)
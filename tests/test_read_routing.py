@@ -0,0 +1,56 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import ReadRouter, ReadOnlySessionError
+from app.models import Base, Product
+from app.repository import insert_product, list_products, update_products
+
+
+def _make(tmp_path, window=60):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for e in (primary, replica):
+        Base.metadata.create_all(bind=e)
+    factory = sessionmaker(bind=primary)
+    router = ReadRouter(factory, [replica], window=window)
+    router.track(factory)
+    return primary, replica, factory, router
+
+
+def test_reads_go_to_replica_until_a_local_write(tmp_path):
+    primary, replica, factory, router = _make(tmp_path)
+    with router.session() as s:
+        assert s.get_bind() is replica
+    # una sesión de escritura que solo lee no cambia el enrutado
+    with factory() as s:
+        list_products(s)
+        s.commit()
+    assert not router.recently_wrote()
+
+    with factory() as s:
+        insert_product(s, name='Agua', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1))
+    with router.session() as s:
+        assert s.get_bind() is primary
+        assert [p.name for p in list_products(s)] == ['Agua']
+
+
+def test_bulk_updates_count_as_writes(tmp_path):
+    primary, replica, factory, router = _make(tmp_path)
+    with factory() as s:
+        pid = insert_product(s, name='Sal', tipo='Otros', Fecha_Vencimiento=date(2030, 1, 1)).id
+    router._last_write = None
+    with factory() as s:
+        update_products(s, [pid], Marca='X')
+    assert router.recently_wrote()
+
+
+def test_window_expires_and_replica_sessions_are_read_only(tmp_path):
+    primary, replica, factory, router = _make(tmp_path, window=0)
+    with factory() as s:
+        insert_product(s, name='Te', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1))
+    with router.session() as s:
+        assert s.get_bind() is replica
+        s.add(Product(name='X', tipo_id=1, Fecha_Vencimiento=date(2030, 1, 1)))
+        with pytest.raises(ReadOnlySessionError):
+            s.flush()
@@ -0,0 +1,178 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Product
+from app.repository import (
+    insert_product, update_product, update_products, adjust_prices, delete_products, delete_products_where,
+    adjust_stock, adjust_stock_many, count_products, InsufficientStockError, StaleProductError,
+)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    s = sessionmaker(bind=engine)()
+    yield s
+    s.close()
+
+
+def _seed(session):
+    ids = []
+    for name, tipo, precio, venc in [
+        ('Agua', 'Bebida', 1.0, date(2020, 1, 1)),
+        ('Jugo', 'Bebida', 2.5, date(2030, 1, 1)),
+        ('Sal', 'Condimento', 0.8, date(2030, 1, 1)),
+    ]:
+        ids.append(insert_product(session, name=name, tipo=tipo, precio=precio, Fecha_Vencimiento=venc).id)
+    return ids
+
+
+def test_update_products_sets_fields_on_all_ids(session):
+    ids = _seed(session)
+    assert update_products(session, ids[:2], Marca='X') == 2
+    assert [p.Marca for p in session.query(Product).order_by(Product.id)] == ['X', 'X', None]
+    with pytest.raises(ValueError):
+        update_products(session, ids, no_existe=1)
+
+
+def test_count_products(session):
+    assert count_products(session) == 0
+    ids = _seed(session)
+    delete_products(session, ids[:1])
+    assert count_products(session) == 2
+
+
+def test_adjust_prices_by_tipo_and_ids(session):
+    ids = _seed(session)
+    assert adjust_prices(session, 10, tipo='Bebida') == 2
+    assert adjust_prices(session, -50, product_ids=[ids[2]]) == 1
+    precios = [p.precio for p in session.query(Product).order_by(Product.id)]
+    assert precios == pytest.approx([1.1, 2.75, 0.4])
+
+
+def test_delete_products_and_delete_by_filter(session):
+    ids = _seed(session)
+    assert delete_products_where(session, expired_before=date(2025, 1, 1)) == 1
+    assert delete_products(session, [ids[1], 999]) == 1
+    assert [p.name for p in session.query(Product)] == ['Sal']
+
+
+def test_adjust_stock_is_atomic_and_guarded(session):
+    ids = _seed(session)
+    session.query(Product).update({Product.cantidad: 5})
+    session.commit()
+    assert adjust_stock(session, ids[0], -3) is True
+    with pytest.raises(InsufficientStockError):
+        adjust_stock(session, ids[0], -3)
+    assert adjust_stock(session, 999, 1) is False
+    assert adjust_stock_many(session, [(ids[1], -2), (ids[2], 4), (ids[1], -1)]) == 2
+    with pytest.raises(InsufficientStockError):
+        adjust_stock_many(session, {ids[0]: -1, ids[1]: -10})
+    session.expire_all()
+    assert [p.cantidad for p in session.query(Product).order_by(Product.id)] == [2, 2, 9]
+
+
+def test_update_product_detects_stale_version(session):
+    ids = _seed(session)
+    prod = session.get(Product, ids[0])
+    assert prod.version == 1
+    update_product(session, ids[0], expected_version=1, cantidad=3)
+    assert prod.version == 2
+    with pytest.raises(StaleProductError) as exc:
+        update_product(session, ids[0], expected_version=1, cantidad=4)
+    assert exc.value.current.cantidad == 3
+    # las operaciones masivas también incrementan la versión
+    update_products(session, [ids[0]], Marca='Y')
+    session.expire_all()
+    assert session.get(Product, ids[0]).version == 3
+
+
+def test_concurrent_writer_raises_stale_product_error(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'v.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as s:
+        pid = insert_product(s, name='Agua', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1)).id
+    a, b = Session(), Session()
+    stale = a.get(Product, pid)
+    assert stale.version == 1
+    update_product(b, pid, cantidad=1)
+    # `a` todavía tiene la versión 1 en memoria: el UPDATE no encuentra la fila esperada
+    with pytest.raises(StaleProductError) as exc:
+        update_product(a, pid, cantidad=2)
+    assert exc.value.current.cantidad == 1
+    a.close(); b.close()
+
+
+def test_unit_of_work_groups_changes_in_one_transaction(session):
+    from app.repository import UnitOfWork
+    ids = _seed(session)
+    with UnitOfWork(session) as uow:
+        assert len(uow.get_many(ids)) == 3
+        before = uow.round_trips
+        uow.add(name='Te', tipo='Bebida', Fecha_Vencimiento='2030-01-01')
+        uow.update(ids[0], expected_version=1, cantidad=7)
+        uow.delete(ids[2])
+        # nada se envía hasta confirmar y update/delete no vuelven a leer las filas
+        assert uow.round_trips == before
+    assert uow.operations == 3
+    assert uow.round_trips == before + 3  # INSERT + UPDATE + DELETE, sin releer filas
+    names = {p.name: p for p in session.query(Product)}
+    assert set(names) == {'Agua', 'Jugo', 'Te'}
+    assert names['Agua'].cantidad == 7 and names['Agua'].version == 2
+
+
+def test_unit_of_work_rolls_back_everything_on_error(session):
+    from app.repository import UnitOfWork
+    ids = _seed(session)
+    with pytest.raises(StaleProductError):
+        with UnitOfWork(session) as uow:
+            uow.delete(ids[1])
+            uow.update(ids[0], expected_version=99, cantidad=1)
+    session.expire_all()
+    assert session.query(Product).count() == 3
+
+
+def test_insert_without_expiring_skips_refresh(session):
+    from app.metrics import MetricsRegistry, MemorySink, instrument_engine
+    session.expire_on_commit = False
+    reg = MetricsRegistry(MemorySink())
+    instrument_engine(session.get_bind(), metrics=reg)
+    insert_product(session, name='Sal', tipo='Condimento', Fecha_Vencimiento=date(2030, 1, 1))
+    statements = [sql.split()[0] for sql in reg.sql_stats]
+    assert 'INSERT' in statements
+    assert not any(sql.startswith('SELECT productos') for sql in reg.sql_stats)
+
+
+def test_safe_wrappers_return_complete_objects(tmp_path, monkeypatch):
+    from app.repository import insert_product_safe, update_product_safe, UnitOfWork
+    from app.metrics import MemorySink, instrument_engine, registry
+    engine = instrument_engine(create_engine(f"sqlite:///{tmp_path / 'inv.db'}"))
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr('app.repository.new_session', sessionmaker(bind=engine))
+    insert_product_safe(name='Agua', tipo='Bebida', Fecha_Vencimiento='2030-01-01')
+    insert_product_safe(name='Te', tipo='Lacteos', Fecha_Vencimiento='2030-01-01')
+    from app.categories import category_id
+    with sessionmaker(bind=engine)() as s:  # las altas confirmadas entran en la caché al leerse
+        category_id(s, 'Bebida'), category_id(s, 'Lacteos')
+    registry.configure(MemorySink())
+    try:
+        # categorías ya en caché: una sola sentencia por alta, ningún SELECT de categorías
+        with registry.capture_sql() as captured:
+            prod = insert_product_safe(name='Leche', tipo='Bebida', Fecha_Vencimiento='2030-01-01')
+        assert [sql.split()[0] for _op, sql, _p in captured] == ['INSERT']
+        with registry.capture_sql() as captured:
+            updated = update_product_safe(prod.id, tipo='Lacteos', cantidad=4)
+        assert [sql.split()[0] for _op, sql, _p in captured] == ['SELECT', 'UPDATE']
+        with registry.capture_sql() as captured:
+            with UnitOfWork() as uow:
+                added = [uow.add(name=n, tipo='Lacteos', Fecha_Vencimiento='2030-01-01') for n in ('Queso', 'Yogur', 'Nata')]
+        assert [sql.split()[0] for _op, sql, _p in captured] == ['INSERT'] * 3
+    finally:
+        registry.disable()
+    # sesión ya cerrada: los valores deben estar cargados sin releer
+    assert prod.tipo == 'Bebida'
+    assert updated.tipo == 'Lacteos' and updated.tipo_id != prod.tipo_id and updated.version == 2
+    assert all(p.tipo == 'Lacteos' and p.id is not None for p in added)
\ No newline at end of file
@@ -0,0 +1,83 @@
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Product, Category
+from app.repository import insert_product, update_product
+from app.snapshot import create_snapshot, restore_snapshot, snapshot_info, SnapshotError
+
+
+def _engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(select(Product.__table__).order_by(Product.id))]
+
+
+def test_snapshot_roundtrip_in_chunks(tmp_path):
+    src = _engine(tmp_path / 'src.db')
+    with sessionmaker(bind=src)() as s:
+        for i in range(25):
+            insert_product(s, name=f"P{i}", tipo='Bebida' if i % 2 else 'Otros', cantidad=i, precio=i * 1.5,
+                           Fecha_Vencimiento=date(2030, 1, 1 + i % 28))
+        update_product(s, 3, Marca='X')
+    snap = tmp_path / 'inv.snap'
+    result = create_snapshot(src, snap, chunk_rows=10)
+    assert result['rows'] == {'categorias': 2, 'productos': 25}
+
+    info = snapshot_info(snap)
+    assert info['rows'] == result['rows'] and info['alembic_revision'] == result['alembic_revision']
+
+    dst = _engine(tmp_path / 'dst.db')
+    assert restore_snapshot(dst, snap, batch_size=7) == {'categorias': 2, 'productos': 25}
+    assert _rows(dst) == _rows(src)
+    with pytest.raises(SnapshotError):
+        restore_snapshot(dst, snap)
+    assert restore_snapshot(dst, snap, replace=True)['productos'] == 25
+    with dst.connect() as conn:
+        assert conn.execute(select(Category.nombre).order_by(Category.id)).scalars().all() == ['Otros', 'Bebida']
+
+
+def test_restore_into_database_with_seeded_categories(tmp_path):
+    src = _engine(tmp_path / 'src.db')
+    with sessionmaker(bind=src)() as s:
+        insert_product(s, name='Agua', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1))
+        insert_product(s, name='Sal', tipo='Otros', Fecha_Vencimiento=date(2030, 1, 1))
+    snap = tmp_path / 'inv.snap'
+    create_snapshot(src, snap)
+
+    # como tras `alembic upgrade head`: categorías sembradas con otros ids
+    dst = _engine(tmp_path / 'dst.db')
+    with dst.begin() as conn:
+        conn.execute(Category.__table__.insert(), [{'nombre': 'Otros'}, {'nombre': 'Lacteos'}, {'nombre': 'Bebida'}])
+    assert restore_snapshot(dst, snap) == {'categorias': 2, 'productos': 2}
+    with dst.connect() as conn:
+        rows = conn.execute(select(Product.name, Category.nombre).join(Category, Category.id == Product.tipo_id)
+                            .order_by(Product.id)).all()
+        assert [tuple(r) for r in rows] == [('Agua', 'Bebida'), ('Sal', 'Otros')]
+        assert conn.execute(select(func.count()).select_from(Category.__table__)).scalar() == 2
+
+
+def test_damaged_or_mismatched_snapshots_are_rejected(tmp_path):
+    src = _engine(tmp_path / 'src.db')
+    with sessionmaker(bind=src)() as s:
+        insert_product(s, name='Agua', tipo='Bebida', Fecha_Vencimiento=date(2030, 1, 1))
+    snap = tmp_path / 'inv.snap'
+    create_snapshot(src, snap)
+
+    truncated = tmp_path / 'cut.snap'
+    truncated.write_bytes(snap.read_bytes()[:-20])
+    with pytest.raises(SnapshotError):
+        snapshot_info(truncated)
+
+    dst = _engine(tmp_path / 'dst.db')
+    with dst.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('0000')"))
+    with pytest.raises(SnapshotError):
+        restore_snapshot(dst, snap)
+    assert restore_snapshot(dst, snap, allow_revision_mismatch=True)['productos'] == 1
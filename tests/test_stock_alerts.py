@@ -0,0 +1,122 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Product
+from app.local_replica import LocalReplica
+from app.repository import insert_product, update_products, adjust_stock, delete_product, set_tipo_stock_minimo
+from app.stock_alerts import low_stock_products, low_stock_statement, LowStockMonitor
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'inv.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def _seed(s):
+    ids = {}
+    for name, tipo, cantidad in [('Agua', 'Bebida', 2), ('Jugo', 'Bebida', 20), ('Sal', 'Condimento', 1), ('Te', 'Bebida', 5)]:
+        ids[name] = insert_product(s, name=name, tipo=tipo, cantidad=cantidad, Fecha_Vencimiento=date(2030, 1, 1)).id
+    return ids
+
+
+def test_product_threshold_overrides_tipo(factory):
+    with factory() as s:
+        ids = _seed(s)
+        assert low_stock_products(s) == []
+        set_tipo_stock_minimo(s, 'Bebida', 6)
+        update_products(s, [ids['Te']], stock_minimo=3)
+        update_products(s, [ids['Sal']], stock_minimo=4)
+        alerts = low_stock_products(s)
+    assert [(a.name, a.cantidad, a.umbral) for a in alerts] == [('Agua', 2, 6), ('Sal', 1, 4)]
+
+
+def test_query_uses_indexes(factory):
+    with factory() as s:
+        _seed(s)
+        stmt = low_stock_statement({1: 5})
+        compiled = stmt.compile(s.get_bind(), compile_kwargs={'literal_binds': True})
+        plan = ' '.join(str(r[-1]) for r in s.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+    assert 'ix_productos_stock_minimo_cantidad' in plan and 'ix_productos_tipo_id_cantidad' in plan
+    assert 'SCAN productos' not in plan
+
+
+def test_monitor_only_reports_changes(factory):
+    with factory() as s:
+        ids = _seed(s)
+        set_tipo_stock_minimo(s, 'Bebida', 6)
+    monitor = LowStockMonitor(factory)
+    changed, removed = monitor.refresh()
+    assert sorted(a.name for a in changed) == ['Agua', 'Te'] and removed == []
+
+    with factory() as s:
+        adjust_stock(s, ids['Agua'], 10)
+        adjust_stock(s, ids['Jugo'], -15)
+        delete_product(ids['Te'], session=s)
+    changed, removed = monitor.poll()
+    assert [(a.name, a.cantidad) for a in changed] == [('Jugo', 5)]
+    assert sorted(removed) == sorted([ids['Agua'], ids['Te']])
+    assert set(monitor.alerts) == {ids['Jugo']}
+
+    with factory() as s:
+        set_tipo_stock_minimo(s, 'Bebida', None)
+    changed, removed = monitor.poll()
+    assert changed == [] and removed == [ids['Jugo']]
+
+
+def test_monitor_matches_full_query(factory):
+    with factory() as s:
+        ids = _seed(s)
+        set_tipo_stock_minimo(s, 'Bebida', 6)
+    monitor = LowStockMonitor(factory)
+    monitor.refresh()
+    with factory() as s:
+        # mínimo propio 0: sin alerta aunque la cantidad sea NULL o negativa
+        update_products(s, [ids['Agua']], stock_minimo=0, cantidad=None)
+        update_products(s, [ids['Sal']], stock_minimo=0, cantidad=-1)
+        update_products(s, [ids['Jugo']], cantidad=3)
+    monitor.poll()
+    with factory() as s:
+        full = low_stock_products(s)
+    assert monitor.sorted_alerts() == full
+    assert [a.name for a in full] == ['Jugo', 'Te']
+
+
+def test_monitor_on_replica_uses_central_clock(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+    Base.metadata.create_all(bind=primary)
+    replica = LocalReplica(str(tmp_path / 'local.db'), primary=primary)
+    with replica.SessionLocal() as s:
+        ids = _seed(s)
+    # las escrituras locales quedan sin marca hasta que el central las confirma
+    with replica.SessionLocal() as s:
+        assert s.get(Product, ids['Agua']).Fecha_Modificacion is None
+    replica.sync_once()
+    with sessionmaker(bind=primary)() as s:
+        set_tipo_stock_minimo(s, 'Bebida', 6)
+    # el central marca con su hora local, horas por detrás del UTC del SQLite local
+    central_now = datetime.utcnow() - timedelta(hours=5)
+    table = Product.__table__
+    with primary.begin() as conn:
+        conn.execute(update(table).values(Fecha_Modificacion=central_now))
+    replica.refresh_from_primary()
+    with replica.SessionLocal() as s:
+        # tras sincronizar las altas llevan el id del central
+        ids = {p.name: p.id for p in s.query(Product)}
+    monitor = LowStockMonitor(replica.SessionLocal)
+    monitor.refresh()
+    assert set(monitor.alerts) == {ids['Agua'], ids['Te']}
+
+    with primary.begin() as conn:
+        conn.execute(update(table).where(table.c.id == ids['Jugo'])
+                     .values(cantidad=1, Fecha_Modificacion=central_now + timedelta(minutes=1)))
+    replica.refresh_from_primary()
+    changed, removed = monitor.poll()
+    assert [(a.name, a.cantidad) for a in changed] == [('Jugo', 1)] and removed == []
+
+    with replica.SessionLocal() as s:
+        adjust_stock(s, ids['Agua'], 10)
+    changed, removed = monitor.poll()
+    assert changed == [] and removed == [ids['Agua']]